@@ -260,6 +260,8 @@ EMAIL_BACKEND = env(
 )
 NEWSLETTER_API_URL = env("NEWSLETTER_API_URL", default="none")
 NUKI_API_TOKEN = env("NUKI_API_TOKEN", default="")
+# Days, starting today, whose booking codes are provisioned on the smartlocks
+NUKI_PROVISIONING_DAYS = env.int("NUKI_PROVISIONING_DAYS", default=2)
 
 # BUCHHALTUNGSBUTLER
 # ------------------------------------------------------------------------------
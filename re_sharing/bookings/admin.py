@@ -26,6 +26,8 @@ from .models import Booking
 from .models import BookingGroup
 from .models import BookingMessage
 from .models import BookingSeries
+from .services import record_booking_changes
+from .services_booking_series import bulk_cancel_bookings
 from .services_booking_series import generate_bookings
 from .services_booking_series import max_future_booking_date
 
@@ -224,6 +226,7 @@ class BookingSeriesAdmin(ImportExportMixin, admin.ModelAdmin):
                 bookings,
                 ["organization", "user", "compensation", "total_amount", "title"],
             )
+            record_booking_changes({booking.resource_id for booking in bookings})
 
             if previous.rrule != obj.rrule:
                 if "COUNT" not in obj.rrule and "UNTIL" not in obj.rrule:
@@ -264,9 +267,9 @@ class BookingSeriesAdmin(ImportExportMixin, admin.ModelAdmin):
 
     @admin.action(description=_("Delete bookings"))
     def delete_bookings(self, request, queryset):
-        for booking_series in queryset:
-            with set_actor(request.user):
-                Booking.objects.filter(booking_series=booking_series).delete()
+        bulk_cancel_bookings(
+            request.user, Booking.objects.filter(booking_series__in=queryset)
+        )
 
     @admin.action(description=_("Activate reminder mails"))
     def activate_reminder_mails(self, request, queryset):
@@ -1,3 +1,5 @@
+import contextlib
+
 from django.apps import AppConfig
 from django.utils.translation import gettext_lazy as _
 
@@ -6,3 +8,7 @@ class BookingsConfig(AppConfig):
     name = "re_sharing.bookings"
     verbose_name = _("Bookings")
     default_auto_field = "django.db.models.BigAutoField"
+
+    def ready(self):
+        with contextlib.suppress(ImportError):
+            import re_sharing.bookings.signals  # noqa: F401
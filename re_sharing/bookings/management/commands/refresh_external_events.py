@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from re_sharing.bookings.services import refresh_external_events
+
+
+class Command(BaseCommand):
+    help = "Fetch the external events ICS feed shown on the info screens"
+
+    def handle(self, *args, **kwargs):
+        if not settings.EXTERNAL_EVENTS_ICS_URL:
+            self.stdout.write(self.style.WARNING("EXTERNAL_EVENTS_ICS_URL is not set"))
+            return
+
+        events = refresh_external_events(settings.EXTERNAL_EVENTS_ICS_URL)
+        if events is None:
+            self.stdout.write(
+                self.style.ERROR("Failed to refresh external events, kept old ones")
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Stored {len(events)} events"))
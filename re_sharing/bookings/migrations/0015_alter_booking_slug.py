@@ -0,0 +1,19 @@
+# Generated by Django 6.0.3 on 2026-10-16 23:01
+
+import re_sharing.utils.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0014_invoice_address_to_jsonfield'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='slug',
+            field=re_sharing.utils.fields.BulkAutoSlugField(blank=True, editable=False, populate_from=['start_date', 'title']),
+        ),
+    ]
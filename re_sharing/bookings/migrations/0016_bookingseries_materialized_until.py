@@ -0,0 +1,28 @@
+# Generated by Django 6.0.3 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0015_alter_booking_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingseries',
+            name='materialized_until',
+            field=models.DateField(blank=True, null=True, verbose_name='Bookings generated until'),
+        ),
+        # Start existing series at their latest generated booking; the extension
+        # skips occurrences that already exist, so re-scanning a few days is safe.
+        migrations.RunSQL(
+            sql="""UPDATE bookings_bookingseries
+                   SET materialized_until = (
+                       SELECT MAX(start_date) FROM bookings_booking
+                       WHERE bookings_booking.booking_series_id = bookings_bookingseries.id
+                   )""",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.3 on 2026-10-16 23:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0016_bookingseries_materialized_until'),
+        ('organizations', '0024_alter_organization_status'),
+        ('resources', '0019_remove_accesscode'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['created', 'id'], name='bookings_bo_created_7d2b4f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['timespan', 'id'], name='bookings_bo_timespa_fae448_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.3 on 2026-10-16 23:37
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0017_booking_bookings_bo_created_7d2b4f_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExternalEventsFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Updated')),
+                ('url', models.URLField(max_length=500, unique=True, verbose_name='URL')),
+                ('events', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Events')),
+            ],
+            options={
+                'verbose_name': 'External events feed',
+                'verbose_name_plural': 'External events feeds',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.3 on 2026-10-16 23:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0018_externaleventsfeed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceBundleRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Updated')),
+                ('einvoice', models.BooleanField(default=False, verbose_name='E-invoice')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Organizations')),
+                ('succeeded', models.PositiveIntegerField(default=0, verbose_name='Succeeded')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Failed')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Finished')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='invoicebundleruns_of_user', related_query_name='invoicebundlerun_of_user', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Invoice bundle run',
+                'verbose_name_plural': 'Invoice bundle runs',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
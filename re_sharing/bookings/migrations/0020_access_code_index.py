@@ -0,0 +1,21 @@
+# Generated by Django 6.0.3 on 2026-10-17 00:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0019_invoicebundlerun'),
+        ('organizations', '0024_alter_organization_status'),
+        ('resources', '0022_smartlock_mirror'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['access_code'], name='bookings_bo_access__bf7f82_idx'),
+        ),
+    ]
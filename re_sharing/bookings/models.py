@@ -1,4 +1,3 @@
-import random
 import uuid
 
 from auditlog.models import AuditlogHistoryField
@@ -8,6 +7,7 @@ from django.contrib.postgres.constraints import ExclusionConstraint
 from django.contrib.postgres.fields import DateTimeRangeField
 from django.contrib.postgres.fields import RangeOperators
 from django.contrib.postgres.indexes import GistIndex
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import CASCADE
 from django.db.models import PROTECT
 from django.db.models import BooleanField
@@ -23,6 +23,7 @@ from django.db.models import PositiveIntegerField
 from django.db.models import Q
 from django.db.models import TextField
 from django.db.models import TimeField
+from django.db.models import URLField
 from django.db.models import UUIDField
 from django.urls import reverse
 from django.utils import formats
@@ -34,10 +35,12 @@ from django_extensions.db.fields import AutoSlugField
 from re_sharing.organizations.models import Organization
 from re_sharing.resources.models import Compensation
 from re_sharing.resources.models import Resource
+from re_sharing.resources.services_access_codes import generate_access_code
 from re_sharing.users.models import User
 from re_sharing.utils.dicts import RRULE_DAILY_INTERVAL
 from re_sharing.utils.dicts import RRULE_MONTHLY_INTERVAL
 from re_sharing.utils.dicts import RRULE_WEEKLY_INTERVAL
+from re_sharing.utils.fields import BulkAutoSlugField
 from re_sharing.utils.models import BookingStatus
 from re_sharing.utils.models import TimeStampedModel
 
@@ -74,6 +77,9 @@ class BookingSeries(TimeStampedModel):
     rrule = TextField(_("Recurrence rule"))
     first_booking_date = DateField(_("Date of first booking"))
     last_booking_date = DateField(_("Date of last booking"), blank=True, null=True)
+    # Date up to which the bookings of the series have been generated, so that
+    # extend_booking_series() can catch up on missed days without duplicates.
+    materialized_until = DateField(_("Bookings generated until"), blank=True, null=True)
     # These fields are only stored for potential DST (Dailight Saving Time) problems.
     start_time = TimeField(_("Start Time"))
     end_time = TimeField(_("End Time"))
@@ -281,28 +287,37 @@ class BookingGroup(TimeStampedModel):
         self.status = BookingStatus.CONFIRMED
         self.save()
         self.bookings_of_bookinggroup.update(status=BookingStatus.CONFIRMED)
+        self._record_booking_changes()
 
     def cancel_all_bookings(self):
         """Cancel all bookings in the group."""
         self.status = BookingStatus.CANCELLED
         self.save()
         self.bookings_of_bookinggroup.update(status=BookingStatus.CANCELLED)
+        self._record_booking_changes()
+
+    def _record_booking_changes(self):
+        # update() sends no post_save
+        from re_sharing.bookings.services import record_booking_changes
+
+        record_booking_changes(
+            set(self.bookings_of_bookinggroup.values_list("resource_id", flat=True))
+        )
 
 
 def _generate_booking_access_code() -> str:
-    """Generate a random 6-digit access code (no zeros, cannot start with '12')."""
-    digits = "123456789"
-    while True:
-        code = "".join(random.choices(digits, k=6))  # noqa: S311
-        if not code.startswith("12"):
-            return code
+    """
+    Generate a random access code. Bookings created by the services get a code
+    that is free on the smartlocks of the resource from allocate_access_codes().
+    """
+    return generate_access_code()
 
 
 class Booking(TimeStampedModel):
     uuid = UUIDField(default=uuid.uuid4, editable=False)
     history = AuditlogHistoryField()
     title = CharField(_("Title"), max_length=160)
-    slug = AutoSlugField(populate_from=["start_date", "title"], editable=False)
+    slug = BulkAutoSlugField(populate_from=["start_date", "title"], editable=False)
     organization = ForeignKey(
         Organization,
         verbose_name=_("Booking Organization"),
@@ -411,6 +426,11 @@ class Booking(TimeStampedModel):
             Index(fields=["organization"]),
             Index(fields=["booking_series"]),
             Index(fields=["booking_group"]),
+            # lookup of the codes in use on a smartlock
+            Index(fields=["access_code"]),
+            # keyset pagination of the manager lists
+            Index(fields=["created", "id"]),
+            Index(fields=["timespan", "id"]),
         ]
 
         constraints = [
@@ -490,6 +510,55 @@ class BookingMessage(TimeStampedModel):
         return reverse("bookings:show-booking", kwargs={"booking": self.booking.slug})
 
 
+class InvoiceBundleRun(TimeStampedModel):
+    """Progress of creating bundled invoices for all organizations at once."""
+
+    user = ForeignKey(
+        User,
+        verbose_name=_("User"),
+        on_delete=PROTECT,
+        related_name="invoicebundleruns_of_user",
+        related_query_name="invoicebundlerun_of_user",
+    )
+    einvoice = BooleanField(_("E-invoice"), default=False)
+    total = PositiveIntegerField(_("Organizations"), default=0)
+    succeeded = PositiveIntegerField(_("Succeeded"), default=0)
+    failed = PositiveIntegerField(_("Failed"), default=0)
+    finished = DateTimeField(_("Finished"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Invoice bundle run")
+        verbose_name_plural = _("Invoice bundle runs")
+        ordering = ["-created"]
+
+    def __str__(self):
+        return f"{self.created:%Y-%m-%d %H:%M} ({self.processed}/{self.total})"
+
+    @property
+    def processed(self):
+        return self.succeeded + self.failed
+
+    @property
+    def percent(self):
+        if not self.total:
+            return 100
+        return round(100 * self.processed / self.total)
+
+
+class ExternalEventsFeed(TimeStampedModel):
+    """Upcoming events of an external ICS feed, refreshed by a background task."""
+
+    url = URLField(_("URL"), max_length=500, unique=True)
+    events = JSONField(_("Events"), default=list, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        verbose_name = _("External events feed")
+        verbose_name_plural = _("External events feeds")
+
+    def __str__(self):
+        return self.url
+
+
 auditlog.register(Booking, exclude_fields=["created, updated"])
 auditlog.register(BookingSeries, exclude_fields=["created, updated"])
 auditlog.register(BookingGroup, exclude_fields=["created, updated"])
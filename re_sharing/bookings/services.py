@@ -1,3 +1,7 @@
+import copy
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 from datetime import time
 from datetime import timedelta
@@ -5,11 +9,17 @@ from http import HTTPStatus
 from zoneinfo import ZoneInfo
 
 from auditlog.context import set_actor
+from auditlog.models import LogEntry
 from dateutil import parser
 from dateutil.parser import isoparse
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
+from django.db import connection
+from django.db import transaction
+from django.db.models import Exists
+from django.db.models import OuterRef
 from django.shortcuts import get_list_or_404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
@@ -18,6 +28,7 @@ from django.utils.translation import gettext_lazy as _
 from re_sharing.bookings.models import Booking
 from re_sharing.bookings.models import BookingMessage
 from re_sharing.bookings.models import BookingSeries
+from re_sharing.bookings.models import InvoiceBundleRun
 from re_sharing.bookings.services_booking_series import create_rrule
 from re_sharing.organizations.mails import send_booking_cancellation_email
 from re_sharing.organizations.mails import send_booking_confirmation_email
@@ -30,31 +41,45 @@ from re_sharing.organizations.services import (
     organizations_with_confirmed_bookingpermission,
 )
 from re_sharing.organizations.services import user_has_bookingpermission
+from re_sharing.resources.models import Access
 from re_sharing.resources.models import Compensation
 from re_sharing.resources.models import Location
 from re_sharing.resources.models import Resource
+from re_sharing.resources.services import bump_resource_bookings_version
 from re_sharing.resources.services import get_access_code
+from re_sharing.resources.services_access_codes import allocate_access_codes
 from re_sharing.users.models import User
+from re_sharing.utils.audit import bulk_log_changes
+from re_sharing.utils.cache import RESOURCES
+from re_sharing.utils.cache import CacheNamespace
+from re_sharing.utils.exports import EXPORT_CHUNK_SIZE
 from re_sharing.utils.models import BookingStatus
 from re_sharing.utils.models import get_booking_status
 
 
-def _enqueue_smartlock_sync_if_today(booking) -> None:
-    """Enqueue a NUKI smartlock sync for all smartlocks if the booking starts today."""
-    from re_sharing.resources.services_nuki import sync_all_smartlock_codes
+def _starts_within_smartlock_provisioning(booking) -> bool:
+    from re_sharing.resources.services_nuki import get_provisioning_window
 
-    if booking.timespan.lower.date() != timezone.now().date():
+    start, end = get_provisioning_window()
+    return start <= booking.timespan.lower < end
+
+
+def _enqueue_smartlock_sync_if_upcoming(booking) -> None:
+    """Request a sync of the booking's smartlocks if its code is provisioned."""
+    from re_sharing.resources.services_nuki import request_smartlock_sync
+
+    if not _starts_within_smartlock_provisioning(booking):
         return
 
     access = booking.resource.access
     if not access:
         return
 
-    # Only enqueue if this access has a smartlock configured
-    if access.smartlock_id or (
-        access.parent_access and access.parent_access.smartlock_id
-    ):
-        sync_all_smartlock_codes.enqueue()
+    # The codes of an access also open the smartlock of its parent access
+    smartlock_ids = [access.smartlock_id]
+    if access.parent_access:
+        smartlock_ids.append(access.parent_access.smartlock_id)
+    request_smartlock_sync(smartlock_ids)
 
 
 class InvalidBookingOperationError(Exception):
@@ -230,19 +255,28 @@ def save_booking(user, booking):
     ):
         raise PermissionDenied
 
+    if booking.pk is None:
+        booking.access_code = allocate_access_codes(
+            Access.objects.filter(resource_of_access=booking.resource)
+        )[0]
     booking.save()
     # re-retrieve booking object, to be able to call timespan.lower
     booking.refresh_from_db()
     if booking.status == BookingStatus.PENDING:
         send_manager_new_booking_email.enqueue(booking.id)
     elif booking.status == BookingStatus.CONFIRMED:
-        _enqueue_smartlock_sync_if_today(booking)
+        _enqueue_smartlock_sync_if_upcoming(booking)
 
     return booking
 
 
 def show_booking(user, booking_slug):
-    booking = get_object_or_404(Booking, slug=booking_slug)
+    booking = get_object_or_404(
+        Booking.objects.select_related(
+            "resource__access__parent_access", "organization"
+        ),
+        slug=booking_slug,
+    )
 
     if not user_has_bookingpermission(user, booking):
         raise PermissionDenied
@@ -303,16 +337,76 @@ def cancel_booking(user, booking_slug):
             booking.save()
 
         if was_confirmed:
-            _enqueue_smartlock_sync_if_today(booking)
+            _enqueue_smartlock_sync_if_upcoming(booking)
 
         return booking
 
     raise InvalidBookingOperationError
 
 
-def process_field_changes(field, values):  # noqa: C901, PLR0912, PLR0915
-    """Process specific field changes and return formatted details."""
+# Foreign key fields of a booking whose auditlog changes store the primary key
+RELATED_FIELD_MODELS = {
+    "user": User,
+    "resource": Resource,
+    "compensation": Compensation,
+    "organization": Organization,
+}
+RELATED_FIELD_LABELS = {
+    "user": _("User"),
+    "resource": _("Resource"),
+    "compensation": _("Compensation"),
+    "organization": _("Organization"),
+}
+
+
+def _parse_related_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_related_objects(changes, actor_ids=()):
+    """
+    Load the objects referenced by auditlog changes with one query per model.
+
+    changes is an iterable of (field, (old_value, new_value)) pairs. The actors of
+    the log entries are loaded in the same query as the changed users.
+    """
+    ids = defaultdict(set)
+    ids["user"].update(actor_ids)
+    for field, values in changes:
+        if field in RELATED_FIELD_MODELS:
+            ids[field].update(_parse_related_id(value) for value in values)
+    return {
+        field: RELATED_FIELD_MODELS[field].objects.in_bulk(field_ids - {None})
+        for field, field_ids in ids.items()
+        if field_ids - {None}
+    }
+
+
+def _get_related_object_display(field, value, related_objects):
+    related_id = _parse_related_id(value)
+    if related_id is None:
+        return value
+    related_object = related_objects.get(field, {}).get(related_id)
+    if related_object is None:
+        return _("(deleted)")
+    if field == "user":
+        return f"{related_object.first_name} {related_object.last_name}"
+    return related_object.name
+
+
+def process_field_changes(field, values, related_objects=None):
+    """
+    Process specific field changes and return formatted details.
+
+    related_objects are the objects from get_related_objects(); they are loaded
+    for this single change if omitted.
+    """
     old_value, new_value = values
+    if related_objects is None:
+        related_objects = get_related_objects([(field, values)])
 
     # Generic structure for change details:
     change_details = {
@@ -322,24 +416,16 @@ def process_field_changes(field, values):  # noqa: C901, PLR0912, PLR0915
     }
 
     # Handle field-specific cases
-    if field == "user":
-        try:
-            old_user = User.objects.get(id=int(old_value))
-            old_user_display = f"{old_user.first_name} {old_user.last_name}"
-        except User.DoesNotExist:
-            old_user_display = _("(deleted)")
-
-        try:
-            new_user = User.objects.get(id=int(new_value))
-            new_user_display = f"{new_user.first_name} {new_user.last_name}"
-        except User.DoesNotExist:
-            new_user_display = _("(deleted)")
-
+    if field in RELATED_FIELD_MODELS:
         change_details.update(
             {
-                "field": _("User"),
-                "old_value": old_user_display,
-                "new_value": new_user_display,
+                "field": RELATED_FIELD_LABELS[field],
+                "old_value": _get_related_object_display(
+                    field, old_value, related_objects
+                ),
+                "new_value": _get_related_object_display(
+                    field, new_value, related_objects
+                ),
             }
         )
     elif field == "start_date":
@@ -354,66 +440,6 @@ def process_field_changes(field, values):  # noqa: C901, PLR0912, PLR0915
                 ),
             }
         )
-    elif field == "resource":
-        try:
-            old_resource = Resource.objects.get(id=int(old_value))
-            old_resource_display = old_resource.name
-        except Resource.DoesNotExist:
-            old_resource_display = _("(deleted)")
-
-        try:
-            new_resource = Resource.objects.get(id=int(new_value))
-            new_resource_display = new_resource.name
-        except Resource.DoesNotExist:
-            new_resource_display = _("(deleted)")
-
-        change_details.update(
-            {
-                "field": _("Resource"),
-                "old_value": old_resource_display,
-                "new_value": new_resource_display,
-            }
-        )
-    elif field == "compensation":
-        try:
-            old_compensation = Compensation.objects.get(id=int(old_value))
-            old_compensation_display = old_compensation.name
-        except Compensation.DoesNotExist:
-            old_compensation_display = _("(deleted)")
-
-        try:
-            new_compensation = Compensation.objects.get(id=int(new_value))
-            new_compensation_display = new_compensation.name
-        except Compensation.DoesNotExist:
-            new_compensation_display = _("(deleted)")
-
-        change_details.update(
-            {
-                "field": _("Compensation"),
-                "old_value": old_compensation_display,
-                "new_value": new_compensation_display,
-            }
-        )
-    elif field == "organization":
-        try:
-            old_organization = Organization.objects.get(id=int(old_value))
-            old_organization_display = old_organization.name
-        except Organization.DoesNotExist:
-            old_organization_display = _("(deleted)")
-
-        try:
-            new_organization = Organization.objects.get(id=int(new_value))
-            new_organization_display = new_organization.name
-        except Organization.DoesNotExist:
-            new_organization_display = _("(deleted)")
-
-        change_details.update(
-            {
-                "field": _("Organization"),
-                "old_value": old_organization_display,
-                "new_value": new_organization_display,
-            }
-        )
     elif field == "status":
         old_value_text = dict(BookingStatus.choices).get(int(old_value))
         new_value_text = dict(BookingStatus.choices).get(int(new_value))
@@ -446,7 +472,15 @@ def process_field_changes(field, values):  # noqa: C901, PLR0912, PLR0915
 
 def get_booking_activity_stream(booking):
     activity_stream = []
-    booking_logs = booking.history.filter(action=1)
+    booking_logs = list(booking.history.filter(action=1))
+    related_objects = get_related_objects(
+        (
+            (field, values)
+            for log_entry in booking_logs
+            for field, values in log_entry.changes.items()
+        ),
+        actor_ids={log_entry.actor_id for log_entry in booking_logs},
+    )
     for log_entry in booking_logs:
         changes = log_entry.changes  # Access all changes
         change_details = []
@@ -454,14 +488,11 @@ def get_booking_activity_stream(booking):
         for field, values in changes.items():
             if field in {"end_date", "timespan"}:
                 continue
-            processed_change = process_field_changes(field, values)
+            processed_change = process_field_changes(field, values, related_objects)
             change_details.append(processed_change)
 
         # Get actor, handling deleted users
-        try:
-            actor = User.objects.get(id=log_entry.actor_id)
-        except User.DoesNotExist:
-            actor = None
+        actor = related_objects.get("user", {}).get(log_entry.actor_id)
 
         # Append information for this log entry to the activity stream
         activity_stream.append(
@@ -474,7 +505,7 @@ def get_booking_activity_stream(booking):
         )
 
     # Retrieve associated booking messages
-    messages = BookingMessage.objects.filter(booking=booking)
+    messages = BookingMessage.objects.filter(booking=booking).select_related("user")
     for message in messages:
         message_dict = {
             "date": message.created,
@@ -515,16 +546,84 @@ def filter_bookings_list(  # noqa: PLR0913
     return bookings, organizations
 
 
+# The info screens show resource and location names as well
+BOOKINGS_WEBVIEW_CACHE = CacheNamespace("bookings_webview", invalidated_by=[RESOURCES])
+
+
+def get_bookings_webview_version(location_id):
+    """Return the version of the info screen bookings of a location (or "all")."""
+    return BOOKINGS_WEBVIEW_CACHE.version(scope=location_id)
+
+
+def bump_bookings_webview_version(resource_ids):
+    """
+    Invalidate the cached info screens showing bookings of the given resources.
+
+    Only rooms are shown on the info screens, so changes of other resources keep the
+    cached pages. The locations are looked up with a single query.
+    """
+    if not resource_ids:
+        return
+    location_ids = set(
+        Location.objects.filter(
+            resource_of_location__id__in=resource_ids,
+            resource_of_location__type=Resource.ResourceTypeChoices.ROOM,
+        ).values_list("id", flat=True)
+    )
+    if not location_ids:
+        return
+    for location_id in [*location_ids, "all"]:
+        BOOKINGS_WEBVIEW_CACHE.invalidate(scope=location_id)
+
+
+_collected_resource_ids = ContextVar("collected_resource_ids", default=None)
+
+
+def record_booking_changes(resource_ids):
+    """
+    Invalidate everything built from the confirmed bookings of the given resources.
+
+    Increments the bookings version of the resources (used by the calendar feeds)
+    and the versions of the info screens of their locations.
+    """
+    collected_resource_ids = _collected_resource_ids.get()
+    if collected_resource_ids is not None:
+        collected_resource_ids.update(resource_ids)
+        return
+    if not resource_ids:
+        return
+    bump_resource_bookings_version(resource_ids)
+    bump_bookings_webview_version(resource_ids)
+
+
+@contextmanager
+def collect_booking_changes():
+    """
+    Record the changes of all bookings changed inside the block at once.
+
+    Deleting many bookings sends post_delete for each of them; collecting the
+    resources avoids two queries per booking.
+    """
+    resource_ids = set()
+    token = _collected_resource_ids.set(resource_ids)
+    try:
+        yield
+    finally:
+        _collected_resource_ids.reset(token)
+    record_booking_changes(resource_ids)
+
+
 def bookings_webview(location="all"):
     bookings = Booking.objects.filter(
         resource__type=Resource.ResourceTypeChoices.ROOM,
         status=BookingStatus.CONFIRMED,
         organization__show_bookings_on_info_screens=True,
-    )
+    ).select_related("organization", "resource")
 
-    # Filter by location if not "all"
+    # Filter by location (a Location or its slug) if not "all"
     if location != "all":
-        location = get_object_or_404(Location, slug=location)
+        if not isinstance(location, Location):
+            location = get_object_or_404(Location, slug=location)
         bookings = bookings.filter(resource__location=location)
 
     bookings = bookings.filter(
@@ -601,7 +700,7 @@ def manager_filter_bookings_list(  # noqa: PLR0913
         )
         bookings = bookings.filter(timespan__startswith__lte=end_of_until_date)
 
-    bookings = bookings.order_by("created")
+    bookings = bookings.order_by("created", "id")
 
     return bookings, resources, locations
 
@@ -616,7 +715,7 @@ def manager_cancel_booking(user, booking_slug):
             booking.save()
         send_booking_cancellation_email.enqueue(booking.id)
         if was_confirmed:
-            _enqueue_smartlock_sync_if_today(booking)
+            _enqueue_smartlock_sync_if_upcoming(booking)
 
         return booking
 
@@ -645,7 +744,7 @@ def manager_confirm_booking(user, booking_slug):
                 booking.status = BookingStatus.CONFIRMED
                 booking.save()
             send_booking_confirmation_email.enqueue(booking.id)
-            _enqueue_smartlock_sync_if_today(booking)
+            _enqueue_smartlock_sync_if_upcoming(booking)
 
         return booking
 
@@ -654,28 +753,67 @@ def manager_confirm_booking(user, booking_slug):
 
 def manager_confirm_booking_series(user, booking_series_uuid):
     booking_series = get_object_or_404(BookingSeries, uuid=booking_series_uuid)
-    bookings = get_list_or_404(Booking, booking_series=booking_series)
+    # Find the occurrences that overlap other confirmed bookings in the same query
+    # that loads them, instead of one exists() query per occurrence
+    overlapping_bookings = Booking.objects.filter(
+        status=BookingStatus.CONFIRMED,
+        resource=OuterRef("resource"),
+        timespan__overlap=OuterRef("timespan"),
+    ).exclude(id=OuterRef("id"))
+    bookings = get_list_or_404(
+        Booking.objects.select_related("resource__access__parent_access").annotate(
+            is_overlapping=Exists(overlapping_bookings)
+        ),
+        booking_series=booking_series,
+    )
     booking_series.status = BookingStatus.CONFIRMED
     booking_series.save()
+
+    changed_bookings = []
     for booking in bookings:
-        if booking.status != BookingStatus.CANCELLED:
-            overlapping_bookings = Booking.objects.filter(
-                status=BookingStatus.CONFIRMED,
-                resource=booking.resource,
-                timespan__overlap=booking.timespan,
-            ).exclude(id=booking.id)
-            with set_actor(user):
-                if overlapping_bookings.exists():
-                    booking.status = BookingStatus.UNAVAILABLE
-                else:
-                    booking.status = BookingStatus.CONFIRMED
-                booking.save()
+        if booking.status == BookingStatus.CANCELLED:
+            continue
+        old_booking = copy.copy(booking)
+        booking.status = (
+            BookingStatus.UNAVAILABLE
+            if booking.is_overlapping
+            else BookingStatus.CONFIRMED
+        )
+        if booking.status != old_booking.status:
+            changed_bookings.append((old_booking, booking))
+
+    now = timezone.now()
+    for status in (BookingStatus.CONFIRMED, BookingStatus.UNAVAILABLE):
+        booking_ids = [
+            booking.id
+            for _old_booking, booking in changed_bookings
+            if booking.status == status
+        ]
+        if booking_ids:
+            Booking.objects.filter(id__in=booking_ids).update(
+                status=status, updated=now
+            )
+    with set_actor(user):
+        bulk_log_changes(LogEntry.Action.UPDATE, changed_bookings)
+    record_booking_changes(
+        {booking.resource_id for _old_booking, booking in changed_bookings}
+    )
 
     send_booking_series_confirmation_email.enqueue(booking_series.id)
 
-    for booking in bookings:
-        if booking.status == BookingStatus.CONFIRMED:
-            _enqueue_smartlock_sync_if_today(booking)
+    # All bookings of a series share the resource and so the smartlocks, so one
+    # confirmed booking with a provisioned code is enough to decide
+    upcoming_booking = next(
+        (
+            booking
+            for booking in bookings
+            if booking.status == BookingStatus.CONFIRMED
+            and _starts_within_smartlock_provisioning(booking)
+        ),
+        None,
+    )
+    if upcoming_booking:
+        _enqueue_smartlock_sync_if_upcoming(upcoming_booking)
 
     return booking_series
 
@@ -721,11 +859,56 @@ def manager_filter_invoice_bookings_list(  # noqa: PLR0913
     if timespan_filter == "past":
         bookings = bookings.filter(timespan__endswith__lt=timezone.now())
 
-    bookings = bookings.order_by("timespan")
+    bookings = bookings.order_by("timespan", "id")
 
     return bookings, resources
 
 
+def get_booking_export_rows(bookings):
+    """
+    Return the header and the rows of an export of the bookings.
+
+    The rows are read with a server-side cursor in chunks, so exporting the
+    bookings of a whole year keeps the memory use constant.
+    """
+    header = [
+        str(_("Date")),
+        str(_("Start")),
+        str(_("End")),
+        str(_("Resource")),
+        str(_("Organization")),
+        str(_("Title")),
+        str(_("Compensation")),
+        str(_("Total amount")),
+        str(_("Invoice number")),
+        str(_("Booking")),
+    ]
+    values = (
+        bookings.prefetch_related(None)
+        .values_list(
+            "timespan",
+            "resource__name",
+            "organization__name",
+            "title",
+            "compensation__name",
+            "total_amount",
+            "invoice_number",
+            "slug",
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    rows = (
+        [
+            f"{timezone.localtime(timespan.lower):%Y-%m-%d}",
+            f"{timezone.localtime(timespan.lower):%H:%M}",
+            f"{timezone.localtime(timespan.upper):%H:%M}",
+            *fields,
+        ]
+        for timespan, *fields in values
+    )
+    return header, rows
+
+
 def _format_single_price(total_amount, duration_hours: float) -> str:
     """Return total_amount/duration_hours as a clean string like "15" or "12.5"."""
     if not duration_hours or not total_amount:
@@ -859,13 +1042,9 @@ def build_einvoice_payload(booking: "Booking") -> dict:
     return payload
 
 
-def get_organizations_with_bundleable_bookings(
-    organization_search=None,
-) -> list[dict]:
-    """Get organizations that have past uninvoiced bookings eligible for bundling."""
-    from django.db.models import Count
-
-    bookings_qs = (
+def get_bundleable_bookings():
+    """Return the past uninvoiced bookings that are eligible for bundled invoices."""
+    return (
         Booking.objects.filter(
             status=BookingStatus.CONFIRMED,
             total_amount__gt=0,
@@ -876,6 +1055,15 @@ def get_organizations_with_bundleable_bookings(
         .exclude(invoice_address__contains={"single_invoice": True})
     )
 
+
+def get_organizations_with_bundleable_bookings(
+    organization_search=None,
+) -> list[dict]:
+    """Get organizations that have past uninvoiced bookings eligible for bundling."""
+    from django.db.models import Count
+
+    bookings_qs = get_bundleable_bookings()
+
     if organization_search:
         bookings_qs = bookings_qs.filter(
             organization__name__icontains=organization_search
@@ -892,6 +1080,40 @@ def get_organizations_with_bundleable_bookings(
     return list(orgs_with_counts)
 
 
+# A run without progress for this long is considered aborted
+INVOICE_BUNDLE_RUN_TIMEOUT = timedelta(minutes=30)
+
+
+def start_invoice_bundle_run(user, *, einvoice) -> tuple[InvoiceBundleRun, bool]:
+    """
+    Return the run creating bundled invoices for all organizations and whether it
+    was started by this call.
+
+    Only one run is active at a time, concurrent runs would invoice the same
+    bookings twice at BuchhaltungsButler. Starting a run takes a transaction-level
+    advisory lock, which exists even before the first run, so concurrent requests
+    wait for each other and then find the active run.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext(%s))",
+                [InvoiceBundleRun._meta.db_table],  # noqa: SLF001
+            )
+        active_run = InvoiceBundleRun.objects.filter(
+            finished__isnull=True,
+            updated__gte=timezone.now() - INVOICE_BUNDLE_RUN_TIMEOUT,
+        ).first()
+        if active_run is not None:
+            return active_run, False
+        run = InvoiceBundleRun.objects.create(
+            user=user,
+            einvoice=einvoice,
+            total=len(get_organizations_with_bundleable_bookings()),
+        )
+    return run, True
+
+
 def build_org_invoice_payload(
     organization: "Organization", bookings: list["Booking"]
 ) -> dict:
@@ -1028,71 +1250,139 @@ def build_org_einvoice_payload(
     }
 
 
-def get_external_events(ics_url: str, cache_key: str = "external_events") -> list[dict]:
-    """
-    Fetch and parse events from an external ICS calendar feed.
+EXTERNAL_EVENTS_MAX_AGE = timedelta(hours=24)
+EXTERNAL_EVENTS_CACHE = CacheNamespace("external_events", timeout=60 * 5)
+
 
-    Returns a list of upcoming events sorted by start date.
-    Results are cached for 24 hours.
+def fetch_external_events(ics_url: str) -> list[dict]:
     """
-    import logging
+    Fetch and parse the upcoming events of an external ICS calendar feed.
 
+    Returns a list of upcoming events sorted by start date. Raises
+    requests.RequestException if the feed cannot be fetched and ValueError if it
+    cannot be parsed.
+    """
     import requests
-    from django.core.cache import cache
     from icalendar import Calendar
 
-    logger = logging.getLogger(__name__)
+    response = requests.get(ics_url, timeout=10)
+    response.raise_for_status()
 
-    # Try cache first
-    cached_events = cache.get(cache_key)
-    if cached_events is not None:
-        return cached_events
+    cal = Calendar.from_ical(response.content)
+    today = timezone.now().date()
 
     events = []
-    try:
-        response = requests.get(ics_url, timeout=10)
-        response.raise_for_status()
-
-        cal = Calendar.from_ical(response.content)
-        today = timezone.now().date()
-
-        for component in cal.walk():
-            if component.name == "VEVENT":
-                dtstart = component.get("dtstart")
-                if dtstart is None:
-                    continue
-
-                # Get start date (handle both date and datetime)
-                start_dt = dtstart.dt
-                start_date = start_dt.date() if hasattr(start_dt, "date") else start_dt
-
-                # Skip past events
-                if start_date < today:
-                    continue
-
-                # Get end date/time
-                dtend = component.get("dtend")
-                end_dt = dtend.dt if dtend else None
-
-                events.append(
-                    {
-                        "title": str(component.get("summary", "")),
-                        "start": start_dt,
-                        "end": end_dt,
-                        "location": str(component.get("location", "")),
-                        "description": str(component.get("description", "")),
-                        "url": str(component.get("url", "")),
-                    }
-                )
-
-        # Sort by start date
-        events.sort(key=lambda x: x["start"])
+    for component in cal.walk():
+        if component.name == "VEVENT":
+            dtstart = component.get("dtstart")
+            if dtstart is None:
+                continue
+
+            # Get start date (handle both date and datetime)
+            start_dt = dtstart.dt
+            start_date = start_dt.date() if hasattr(start_dt, "date") else start_dt
 
+            # Skip past events
+            if start_date < today:
+                continue
+
+            # Get end date/time
+            dtend = component.get("dtend")
+            end_dt = dtend.dt if dtend else None
+
+            events.append(
+                {
+                    "title": str(component.get("summary", "")),
+                    "start": start_dt,
+                    "end": end_dt,
+                    "location": str(component.get("location", "")),
+                    "description": str(component.get("description", "")),
+                    "url": str(component.get("url", "")),
+                }
+            )
+
+    # Sort by start date
+    events.sort(key=lambda x: x["start"])
+    return events
+
+
+def refresh_external_events(ics_url: str) -> list[dict] | None:
+    """
+    Fetch an external ICS feed and store its upcoming events.
+
+    If the feed cannot be fetched or parsed, the previously stored events are kept
+    and None is returned.
+    """
+    import logging
+
+    import requests
+
+    from re_sharing.bookings.models import ExternalEventsFeed
+
+    logger = logging.getLogger(__name__)
+
+    try:
+        events = fetch_external_events(ics_url)
     except requests.RequestException:
         logger.exception("Failed to fetch external events from %s", ics_url)
+        return None
     except Exception:
         logger.exception("Failed to parse ICS feed from %s", ics_url)
+        return None
+
+    ExternalEventsFeed.objects.update_or_create(
+        url=ics_url, defaults={"events": events}
+    )
+    EXTERNAL_EVENTS_CACHE.invalidate()
+    return events
+
+
+def _decode_external_event_datetime(value):
+    if value is None:
+        return None
+    if "T" in value:
+        return datetime.fromisoformat(value)
+    return datetime.fromisoformat(value).date()
+
+
+def get_external_events(ics_url: str, cache_key: str = "external_events") -> list[dict]:
+    """
+    Return the upcoming events of an external ICS calendar feed.
+
+    The feed is fetched by the refresh_external_events task and never on the
+    request path: the stored events are served even if they are outdated, and a
+    refresh is enqueued if they are older than EXTERNAL_EVENTS_MAX_AGE (or the feed
+    was never fetched). The decoded events are cached for a few minutes.
+    """
+    from re_sharing.bookings.models import ExternalEventsFeed
+    from re_sharing.bookings.tasks import refresh_external_events_feed
+
+    key = EXTERNAL_EVENTS_CACHE.key(cache_key)
+    cached_events = cache.get(key)
+    if cached_events is not None:
+        return cached_events
+
+    feed = ExternalEventsFeed.objects.filter(url=ics_url).first()
+    if (
+        feed is None or feed.updated < timezone.now() - EXTERNAL_EVENTS_MAX_AGE
+    ) and cache.add(f"{key}:refreshing", value=True, timeout=60 * 5):
+        refresh_external_events_feed.enqueue(ics_url)
+
+    today = timezone.now().date()
+    events = []
+    for event in feed.events if feed else []:
+        start = _decode_external_event_datetime(event["start"])
+        # The stored events were upcoming when the feed was fetched
+        start_date = start.date() if isinstance(start, datetime) else start
+        if start_date < today:
+            continue
+        events.append(
+            {
+                **event,
+                "start": start,
+                "end": _decode_external_event_datetime(event["end"]),
+            }
+        )
 
-    # Cache for 24 hours
-    cache.set(cache_key, events, 60 * 60 * 24)
+    cache.set(key, events, EXTERNAL_EVENTS_CACHE.timeout)
     return events
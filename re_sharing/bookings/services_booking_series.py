@@ -1,11 +1,15 @@
-import concurrent
+import copy
+import heapq
 import re
+from collections import defaultdict
 from datetime import UTC
 from datetime import datetime
 from datetime import time
 from datetime import timedelta
 
+from auditlog.context import disable_auditlog
 from auditlog.context import set_actor
+from auditlog.models import LogEntry
 from dateutil.parser import isoparse
 from dateutil.rrule import DAILY
 from dateutil.rrule import FR
@@ -20,6 +24,9 @@ from dateutil.rrule import WEEKLY
 from dateutil.rrule import rrule
 from dateutil.rrule import rrulestr
 from django.core.exceptions import PermissionDenied
+from django.db import IntegrityError
+from django.db import transaction
+from django.db.models import F
 from django.db.models import Q
 from django.shortcuts import get_list_or_404
 from django.shortcuts import get_object_or_404
@@ -35,9 +42,12 @@ from re_sharing.organizations.services import (
     organizations_with_confirmed_bookingpermission,
 )
 from re_sharing.organizations.services import user_has_bookingpermission
+from re_sharing.resources.models import Access
 from re_sharing.resources.models import Compensation
 from re_sharing.resources.models import Resource
+from re_sharing.resources.services_access_codes import allocate_access_codes
 from re_sharing.users.models import User
+from re_sharing.utils.audit import bulk_log_changes
 from re_sharing.utils.models import BookingStatus
 from re_sharing.utils.models import get_booking_status
 
@@ -167,12 +177,71 @@ def create_booking_series_and_bookings(booking_data):
         datetime.combine(max_booking_date, bs.end_time)
     ).astimezone(UTC)
     bookings = generate_bookings(bs, bs.first_booking_date, max_booking_datetime)
+    bs.materialized_until = max_booking_date
 
     # Determine if resource is at least once bookable
     bookable = any(booking.status != BookingStatus.UNAVAILABLE for booking in bookings)
     return bookings, bs, bookable
 
 
+OVERLAP_CONSTRAINT_NAME = "exclude_overlapping_reservations"
+
+
+def bulk_save_bookings(bookings):
+    """
+    Insert unsaved bookings with a few bulk queries instead of one save() per booking.
+
+    Slugs are allocated with one query and the auditlog entries are written as one
+    batch. If confirmed bookings violate the exclude_overlapping_reservations
+    constraint (e.g. a booking confirmed after the series was generated), the
+    overlapping ones are stored as UNAVAILABLE instead of aborting the whole series.
+    Any other integrity error is raised.
+    """
+    from re_sharing.bookings.services import record_booking_changes
+
+    if not bookings:
+        return bookings
+
+    Booking._meta.get_field("slug").allocate_slugs(bookings)  # noqa: SLF001
+    access_codes = allocate_access_codes(
+        Access.objects.filter(
+            resource_of_access__in={booking.resource_id for booking in bookings}
+        ),
+        len(bookings),
+    )
+    for booking, access_code in zip(bookings, access_codes, strict=True):
+        booking.access_code = access_code
+    confirmed_bookings = [
+        booking for booking in bookings if booking.status == BookingStatus.CONFIRMED
+    ]
+    other_bookings = [
+        booking for booking in bookings if booking.status != BookingStatus.CONFIRMED
+    ]
+
+    Booking.objects.bulk_create(other_bookings)
+    if confirmed_bookings:
+        try:
+            with transaction.atomic():
+                Booking.objects.bulk_create(confirmed_bookings)
+        except IntegrityError as error:
+            diag = getattr(error.__cause__, "diag", None)
+            if getattr(diag, "constraint_name", None) != OVERLAP_CONSTRAINT_NAME:
+                raise
+            _mark_overlapping_bookings_unavailable(confirmed_bookings)
+            Booking.objects.bulk_create(confirmed_bookings)
+
+    bulk_log_changes(LogEntry.Action.CREATE, [(None, booking) for booking in bookings])
+    # bulk_create() does not send post_save, so record the changes here
+    record_booking_changes(
+        {
+            booking.resource_id
+            for booking in bookings
+            if booking.status == BookingStatus.CONFIRMED
+        }
+    )
+    return bookings
+
+
 def save_booking_series(user, bookings, booking_series):
     if not user_has_bookingpermission(user, bookings[0]):
         raise PermissionDenied
@@ -182,12 +251,97 @@ def save_booking_series(user, bookings, booking_series):
     booking_series.save()
     for booking in bookings:
         booking.user = booking_series.user
-        booking.save()
+        booking.booking_series = booking_series
+    bulk_save_bookings(bookings)
     send_manager_new_booking_series_email.enqueue(booking_series.id)
 
     return bookings, booking_series
 
 
+def _get_smartlock_bookings_to_provision(bookings):
+    """
+    Return the confirmed bookings of the provisioning days at a resource with a
+    smartlock.
+    """
+    from re_sharing.resources.services_nuki import get_provisioning_window
+
+    start, end = get_provisioning_window()
+    # smartlock_id is blank instead of NULL when no smartlock is configured
+    return bookings.filter(
+        status=BookingStatus.CONFIRMED,
+        timespan__startswith__gte=start,
+        timespan__startswith__lt=end,
+    ).filter(
+        Q(resource__access__smartlock_id__gt="")
+        | Q(resource__access__parent_access__smartlock_id__gt="")
+    )
+
+
+def bulk_cancel_bookings(user, bookings):
+    """
+    Delete the future bookings of the queryset and cancel the past ones.
+
+    Future bookings are removed with one DELETE and past pending or confirmed
+    bookings are cancelled with one UPDATE. The auditlog entries are written as a
+    single batch attributed to user, and the smartlocks of affected confirmed
+    bookings with provisioned codes are synced.
+    """
+    from re_sharing.bookings.services import collect_booking_changes
+    from re_sharing.bookings.services import record_booking_changes
+    from re_sharing.resources.services_nuki import request_smartlock_sync
+
+    now = timezone.now()
+    smartlock_ids_to_sync = {
+        smartlock_id
+        for smartlock_ids in _get_smartlock_bookings_to_provision(bookings).values_list(
+            "resource__access__smartlock_id",
+            "resource__access__parent_access__smartlock_id",
+        )
+        for smartlock_id in smartlock_ids
+        if smartlock_id
+    }
+    future_bookings = []
+    past_bookings = []
+    for booking in bookings:
+        if booking.timespan.lower > now:
+            future_bookings.append(booking)
+        elif booking.status in [BookingStatus.PENDING, BookingStatus.CONFIRMED]:
+            past_bookings.append(booking)
+
+    cancelled_bookings = []
+    for booking in past_bookings:
+        cancelled_booking = copy.copy(booking)
+        cancelled_booking.status = BookingStatus.CANCELLED
+        cancelled_bookings.append((booking, cancelled_booking))
+
+    with transaction.atomic(), collect_booking_changes():
+        with set_actor(user):
+            bulk_log_changes(
+                LogEntry.Action.DELETE,
+                [(booking, None) for booking in future_bookings],
+            )
+            bulk_log_changes(LogEntry.Action.UPDATE, cancelled_bookings)
+        # The entries are written above, so skip auditlog's per-instance receivers
+        with disable_auditlog():
+            Booking.objects.filter(
+                id__in=[booking.id for booking in future_bookings]
+            ).delete()
+        Booking.objects.filter(id__in=[booking.id for booking in past_bookings]).update(
+            status=BookingStatus.CANCELLED, updated=now
+        )
+        # update() sends no post_save, the deleted bookings are collected by the
+        # post_delete receiver
+        record_booking_changes(
+            {
+                booking.resource_id
+                for booking in past_bookings
+                if booking.status == BookingStatus.CONFIRMED
+            }
+        )
+
+    request_smartlock_sync(smartlock_ids_to_sync)
+
+
 def cancel_bookings_of_booking_series(user, booking_series_uuid):
     bs = get_object_or_404(BookingSeries, uuid=booking_series_uuid)
     bookings = get_list_or_404(Booking, booking_series=bs)
@@ -198,12 +352,13 @@ def cancel_bookings_of_booking_series(user, booking_series_uuid):
     bs.status = BookingStatus.CANCELLED
     bs.save()
 
-    now = timezone.now()
-    for booking in bookings:
-        # Delete future bookings, keep past bookings
-        if booking.timespan.lower > now:
-            with set_actor(user):
-                booking.delete()
+    # Delete future bookings, keep past bookings
+    bulk_cancel_bookings(
+        user,
+        Booking.objects.filter(
+            booking_series=bs, timespan__startswith__gt=timezone.now()
+        ),
+    )
     return bs
 
 
@@ -244,92 +399,181 @@ def manager_filter_booking_series_list(
 
 
 def manager_cancel_booking_series(user, booking_series_uuid):
-    from re_sharing.resources.services_nuki import sync_all_smartlock_codes
-
     booking_series = get_object_or_404(BookingSeries, uuid=booking_series_uuid)
-    bookings = get_list_or_404(Booking, booking_series=booking_series)
+    get_list_or_404(Booking, booking_series=booking_series)
     booking_series.status = BookingStatus.CANCELLED
     booking_series.save()
 
-    # Check if any today's confirmed bookings have smartlock access
-    today = timezone.now().date()
-    should_sync_smartlocks = False
-    for booking in bookings:
-        if (
-            booking.status == BookingStatus.CONFIRMED
-            and booking.timespan.lower.date() == today
-            and booking.resource.access
-        ):
-            access = booking.resource.access
-            if access.smartlock_id or (
-                access.parent_access and access.parent_access.smartlock_id
-            ):
-                should_sync_smartlocks = True
-                break
-
-    now = timezone.now()
-    for booking in bookings:
-        if booking.is_cancelable():
-            # Delete future bookings, keep past bookings
-            if booking.timespan.upper and booking.timespan.upper > now:
-                with set_actor(user):
-                    booking.delete()
-            else:
-                # Past bookings are just cancelled, not deleted
-                with set_actor(user):
-                    booking.status = BookingStatus.CANCELLED
-                    booking.save()
+    # Delete the cancelable (future) bookings, keep past bookings
+    bulk_cancel_bookings(
+        user,
+        Booking.objects.filter(
+            booking_series=booking_series, timespan__startswith__gt=timezone.now()
+        ).exclude(status__in=[BookingStatus.CANCELLED, BookingStatus.UNAVAILABLE]),
+    )
 
     send_booking_series_cancellation_email.enqueue(booking_series.id)
 
-    if should_sync_smartlocks:
-        sync_all_smartlock_codes.enqueue()
-
     return booking_series
 
 
-def extend_booking_series():
-    max_booking_date = timezone.now().date() + timedelta(
-        days=max_future_booking_date + 1
+def _get_existing_occurrences(booking_series_ids, start_date, end_date):
+    """Return the (booking series id, start date) pairs that already have a booking."""
+    return set(
+        Booking.objects.filter(
+            booking_series_id__in=booking_series_ids,
+            start_date__gte=start_date,
+            start_date__lte=end_date,
+        ).values_list("booking_series_id", "start_date")
     )
-    first_second = time(hour=0, minute=0, second=0)
-    start_new_bookings_at = datetime.combine(max_booking_date, first_second, tzinfo=UTC)
 
+
+def _extend_booking_series_chunk(booking_series_chunk, today, target_date):
     last_second = time(hour=23, minute=59, second=59)
-    end_new_bookings_at = datetime.combine(max_booking_date, last_second, tzinfo=UTC)
+    end_new_bookings_at = datetime.combine(target_date, last_second, tzinfo=UTC)
+
+    bookings = []
+    start_dates = []
+    for bs in booking_series_chunk:
+        start_date = max(
+            (bs.materialized_until + timedelta(days=1))
+            if bs.materialized_until
+            else bs.first_booking_date,
+            today,
+        )
+        start_dates.append(start_date)
+        start_new_bookings_at = datetime.combine(start_date, time(), tzinfo=UTC)
+        bookings += _build_bookings(bs, start_new_bookings_at, end_new_bookings_at)
+
+    # Skip occurrences that were already generated, e.g. by an earlier run that
+    # was interrupted before the watermark was stored
+    existing_occurrences = _get_existing_occurrences(
+        [bs.id for bs in booking_series_chunk], min(start_dates), target_date
+    )
+    bookings = [
+        booking
+        for booking in bookings
+        if (booking.booking_series_id, booking.start_date) not in existing_occurrences
+    ]
+
+    if bookings:
+        _mark_overlapping_bookings_unavailable(bookings)
+        bulk_save_bookings(bookings)
+
+    for bs in booking_series_chunk:
+        bs.materialized_until = target_date
+    BookingSeries.objects.bulk_update(booking_series_chunk, ["materialized_until"])
+    return bookings
+
+
+def extend_booking_series(chunk_size=100):
+    """
+    Generate the bookings of all open-ended booking series up to the booking horizon.
+
+    Every series remembers up to which date its bookings were generated
+    (materialized_until), so a run after missed days generates all occurrences
+    since then. The series are processed in chunks of chunk_size, each with a
+    constant number of queries and its own transaction.
+    """
+    today = timezone.now().date()
+    target_date = today + timedelta(days=max_future_booking_date + 1)
 
-    bs_set = BookingSeries.objects.filter(
-        Q(last_booking_date=None) | Q(last_booking_date__gte=start_new_bookings_at)
-    ).filter(status__in=[BookingStatus.PENDING, BookingStatus.CONFIRMED])
-    bs_set = bs_set.order_by("created")
+    bs_set = (
+        BookingSeries.objects.filter(
+            status__in=[BookingStatus.PENDING, BookingStatus.CONFIRMED]
+        )
+        .filter(Q(materialized_until=None) | Q(materialized_until__lt=target_date))
+        .filter(
+            Q(last_booking_date=None)
+            | Q(materialized_until=None)
+            | Q(last_booking_date__gt=F("materialized_until"))
+        )
+        .filter(Q(last_booking_date=None) | Q(last_booking_date__gte=today))
+        .select_related("resource", "user", "organization", "compensation")
+        .order_by("id")
+    )
     new_bookings = []
-    for bs in bs_set:
-        # generate bookings that are after max booking date and before target date
-        bookings = generate_bookings(bs, start_new_bookings_at, end_new_bookings_at)
-        for current_booking in bookings:
-            # Determine if the current booking stems from the same booking_series and "
-            # thus should not be saved
-            is_same_booking_series = (
-                current_booking.status == BookingStatus.UNAVAILABLE
-                and Booking.objects.filter(resource=bs.resource)
-                .filter(timespan__overlap=current_booking.timespan)
-                .filter(booking_series=bs)
-                .exists()
+    last_id = 0
+    while True:
+        booking_series_chunk = list(bs_set.filter(id__gt=last_id)[:chunk_size])
+        if not booking_series_chunk:
+            break
+        with transaction.atomic():
+            new_bookings += _extend_booking_series_chunk(
+                booking_series_chunk, today, target_date
             )
-            if not is_same_booking_series:
-                current_booking.save()
-                new_bookings.append(current_booking)
+        last_id = booking_series_chunk[-1].id
 
     return new_bookings
 
 
-def generate_bookings(booking_series, start, end):
-    last_occurrence_before_end = rrulestr(booking_series.rrule).before(end, inc=True)
-    occurrences = list(
-        rrulestr(booking_series.rrule).between(
-            start, last_occurrence_before_end, inc=True
+def _get_confirmed_timespans(resource_ids, start, end):
+    """Return the timespans of confirmed bookings in the range, grouped by resource."""
+    confirmed_timespans = defaultdict(list)
+    bookings = (
+        Booking.objects.filter(
+            resource_id__in=resource_ids,
+            status=BookingStatus.CONFIRMED,
+            timespan__overlap=(start, end),
         )
+        .order_by("timespan")
+        .values_list("resource_id", "timespan")
+    )
+    for resource_id, timespan in bookings:
+        confirmed_timespans[resource_id].append(timespan)
+    return confirmed_timespans
+
+
+def _mark_overlapping_bookings_unavailable(bookings):
+    """
+    Set the status of every unsaved booking that overlaps a confirmed booking to
+    UNAVAILABLE, with one query for all bookings.
+    """
+    confirmed_timespans = _get_confirmed_timespans(
+        {booking.resource_id for booking in bookings},
+        min(booking.timespan[0] for booking in bookings),
+        max(booking.timespan[1] for booking in bookings),
     )
+    bookings_by_resource = defaultdict(list)
+    for booking in bookings:
+        bookings_by_resource[booking.resource_id].append(booking)
+    for resource_id, resource_bookings in bookings_by_resource.items():
+        resource_bookings.sort(key=lambda booking: booking.timespan[0])
+        _mark_unavailable_bookings(resource_bookings, confirmed_timespans[resource_id])
+
+
+def _mark_unavailable_bookings(bookings, confirmed_timespans):
+    """
+    Set the status of every booking that overlaps a confirmed timespan to UNAVAILABLE.
+
+    Both lists have to be sorted by their start. The sweep keeps a min-heap of the
+    ends of all confirmed timespans that started before the current booking ends and
+    drops those that ended before it starts, so every booking is checked in
+    O(log n) instead of one database query per booking.
+    """
+    active_ends = []
+    position = 0
+    for booking in bookings:
+        booking_start, booking_end = booking.timespan
+        while (
+            position < len(confirmed_timespans)
+            and confirmed_timespans[position].lower < booking_end
+        ):
+            heapq.heappush(active_ends, confirmed_timespans[position].upper)
+            position += 1
+        while active_ends and active_ends[0] <= booking_start:
+            heapq.heappop(active_ends)
+        if active_ends:
+            booking.status = BookingStatus.UNAVAILABLE
+
+
+def _build_bookings(booking_series, start, end):
+    """Return the unsaved bookings of all occurrences in the range, sorted by start."""
+    rule = rrulestr(booking_series.rrule)
+    last_occurrence_before_end = rule.before(end, inc=True)
+    if last_occurrence_before_end is None:
+        return []
+    occurrences = rule.between(start, last_occurrence_before_end, inc=True)
 
     # Helper function to create a booking
     def create_booking_series_booking(occurrence):
@@ -340,7 +584,7 @@ def generate_bookings(booking_series, start, end):
             datetime.combine(occurrence, booking_series.end_time)
         )
         timespan = (booking_start, booking_end)
-        booking = Booking(
+        return Booking(
             title=booking_series.title,
             user=booking_series.user,
             resource=booking_series.resource,
@@ -358,10 +602,24 @@ def generate_bookings(booking_series, start, end):
             invoice_address=booking_series.invoice_address,
             activity_description=booking_series.activity_description,
         )
-        if booking.resource.is_booked(booking.timespan):
-            booking.status = BookingStatus.UNAVAILABLE
-        return booking
 
-    # Create bookings in parallel
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        return list(executor.map(create_booking_series_booking, occurrences))
+    bookings = [create_booking_series_booking(occurrence) for occurrence in occurrences]
+    bookings.sort(key=lambda booking: booking.timespan[0])
+    return bookings
+
+
+def generate_bookings(booking_series, start, end):
+    bookings = _build_bookings(booking_series, start, end)
+    if not bookings:
+        return bookings
+
+    # Load all confirmed bookings of the whole series range with a single query
+    confirmed_timespans = _get_confirmed_timespans(
+        [booking_series.resource_id],
+        bookings[0].timespan[0],
+        max(booking.timespan[1] for booking in bookings),
+    )
+    _mark_unavailable_bookings(
+        bookings, confirmed_timespans[booking_series.resource_id]
+    )
+    return bookings
@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+BUCHHALTUNGSBUTLER_TIMEOUT = 30
+# Requests in flight at the same time and minimum seconds between two requests
+# (per process)
+BUCHHALTUNGSBUTLER_MAX_CONCURRENCY = 4
+BUCHHALTUNGSBUTLER_MIN_INTERVAL = 0.2
+# Invoices must not be created twice, so only requests that certainly did not
+# reach the API are retried: connection errors. An error status, even 429 or 503
+# from a proxy, does not guarantee that the invoice was not created.
+BUCHHALTUNGSBUTLER_RETRY = Retry(
+    total=3,
+    connect=3,
+    read=0,
+    status=0,
+    other=0,
+    allowed_methods=frozenset({"POST"}),
+    backoff_factor=1,
+    raise_on_status=False,
+)
+
+_session = None
+_session_lock = threading.Lock()
+_request_slots = threading.BoundedSemaphore(BUCHHALTUNGSBUTLER_MAX_CONCURRENCY)
+_rate_limit_lock = threading.Lock()
+_next_request_at = 0.0
+
+
+def _get_session() -> requests.Session:
+    """Return the keep-alive session shared by all requests of the process."""
+    global _session  # noqa: PLW0603
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_maxsize=BUCHHALTUNGSBUTLER_MAX_CONCURRENCY,
+                max_retries=BUCHHALTUNGSBUTLER_RETRY,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(
+                {"Content-Type": "application/json", "Accept": "application/json"}
+            )
+            _session = session
+    return _session
+
+
+def _wait_for_rate_limit() -> None:
+    global _next_request_at  # noqa: PLW0603
+    with _rate_limit_lock:
+        now = time.monotonic()
+        wait = _next_request_at - now
+        _next_request_at = max(now, _next_request_at) + BUCHHALTUNGSBUTLER_MIN_INTERVAL
+    if wait > 0:
+        time.sleep(wait)
+
+
+def post(path: str, payload: dict) -> requests.Response:
+    """
+    POST a payload to a BuchhaltungsButler endpoint, e.g. "/invoices/create/draft".
+
+    The API key and credentials are added from the settings. Raises
+    requests.RequestException if the request fails or returns an error status.
+    """
+    with _request_slots:
+        _wait_for_rate_limit()
+        response = _get_session().post(
+            f"{settings.BUCHHALTUNGSBUTLER_BASE_URL}{path}",
+            json={**payload, "api_key": settings.BUCHHALTUNGSBUTLER_API_KEY},
+            auth=(
+                settings.BUCHHALTUNGSBUTLER_API_CLIENT,
+                settings.BUCHHALTUNGSBUTLER_API_SECRET,
+            ),
+            timeout=BUCHHALTUNGSBUTLER_TIMEOUT,
+        )
+    if not response.ok:
+        logger.error(
+            "BuchhaltungsButler returned %s for %s: %s",
+            response.status_code,
+            path,
+            response.text,
+        )
+    response.raise_for_status()
+    return response
+
+
+def post_many(requests_by_key: dict):
+    """
+    POST many payloads concurrently, given as {key: (path, payload)}.
+
+    Yields (key, response, exception) in the order the requests finish; exception
+    is None on success. Only the HTTP requests run in threads, so the caller can
+    safely use the database while iterating.
+    """
+    with ThreadPoolExecutor(max_workers=BUCHHALTUNGSBUTLER_MAX_CONCURRENCY) as executor:
+        futures = {
+            executor.submit(post, path, payload): key
+            for key, (path, payload) in requests_by_key.items()
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except requests.RequestException as e:
+                yield futures[future], None, e
@@ -16,8 +16,10 @@ from re_sharing.bookings.models import BookingGroup
 from re_sharing.organizations.models import Organization
 from re_sharing.organizations.services import user_has_normal_bookingpermission
 from re_sharing.providers.models import LendingTimeSlot
+from re_sharing.resources.models import Access
 from re_sharing.resources.models import Resource
-from re_sharing.resources.models import ResourceRestriction
+from re_sharing.resources.services_access_codes import allocate_access_codes
+from re_sharing.resources.services_restrictions import get_restriction_set
 from re_sharing.users.models import User
 from re_sharing.utils.models import BookingStatus
 
@@ -156,25 +158,8 @@ def is_date_restricted_for_items(date):
     For items, we only check if the date falls on a restricted day,
     ignoring the time component.
     """
-    lendable_items = get_lendable_items()
-    restrictions = ResourceRestriction.objects.filter(
-        resources__in=lendable_items,
-        is_active=True,
-    ).distinct()
-
-    for restriction in restrictions:
-        # Check date range
-        if restriction.start_date and date < restriction.start_date:
-            continue
-        if restriction.end_date and date > restriction.end_date:
-            continue
-
-        # Check day of week
-        days = [int(d.strip()) for d in restriction.days_of_week.split(",")]
-        if date.weekday() in days:
-            return True
-
-    return False
+    lendable_item_ids = get_lendable_items().values_list("id", flat=True)
+    return get_restriction_set(lendable_item_ids).matches_date(date) is not None
 
 
 def calculate_booking_days(pickup_date, return_date):
@@ -383,6 +368,9 @@ def create_item_booking_group(
             number_of_attendees=1,
             activity_description=_("Equipment loan"),
             is_item_booking=True,
+            access_code=allocate_access_codes(
+                Access.objects.filter(resource_of_access=resource)
+            )[0],
         )
 
     return booking_group
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from re_sharing.bookings.models import Booking
+from re_sharing.bookings.services import record_booking_changes
+from re_sharing.utils.models import BookingStatus
+
+
+@receiver(post_save, sender=Booking)
+def record_booking_changes_on_save(sender, instance, **kwargs):
+    # Pending bookings are not shown, but a confirmed booking that is cancelled or
+    # unavailable has to disappear from the info screens and calendar feeds
+    if instance.status != BookingStatus.PENDING:
+        record_booking_changes([instance.resource_id])
+
+
+@receiver(post_delete, sender=Booking)
+def record_booking_changes_on_delete(sender, instance, **kwargs):
+    if instance.status == BookingStatus.CONFIRMED:
+        record_booking_changes([instance.resource_id])
@@ -1,13 +1,18 @@
-import base64
 import logging
+from collections import defaultdict
 
 import requests
-from django.conf import settings
+from django.db.models import F
 from django.tasks import task
 from django.utils import timezone
 
+from re_sharing.bookings import services_buchhaltungsbutler
+
 logger = logging.getLogger(__name__)
 
+DRAFT_INVOICE_PATH = "/invoices/create/draft"
+EINVOICE_PATH = "/invoices/create/einvoice"
+
 
 @task(queue_name="default")
 def create_draft_invoice(booking_id: int) -> dict:
@@ -19,34 +24,10 @@ def create_draft_invoice(booking_id: int) -> dict:
         "organization", "user", "resource", "compensation"
     ).get(id=booking_id)
 
-    payload = build_invoice_payload(booking)
-    payload["api_key"] = settings.BUCHHALTUNGSBUTLER_API_KEY
-
-    credentials = base64.b64encode(
-        f"{settings.BUCHHALTUNGSBUTLER_API_CLIENT}:{settings.BUCHHALTUNGSBUTLER_API_SECRET}".encode()
-    ).decode()
-
-    url = f"{settings.BUCHHALTUNGSBUTLER_BASE_URL}/invoices/create/draft"
-
     try:
-        response = requests.post(
-            url,
-            json=payload,
-            headers={
-                "Authorization": f"Basic {credentials}",
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-            timeout=30,
+        services_buchhaltungsbutler.post(
+            DRAFT_INVOICE_PATH, build_invoice_payload(booking)
         )
-        if not response.ok:
-            logger.error(
-                "BuchhaltungsButler returned %s for booking %s: %s",
-                response.status_code,
-                booking_id,
-                response.text,
-            )
-        response.raise_for_status()
     except requests.RequestException:
         logger.exception("Failed to create draft invoice for booking %s", booking_id)
         return {"booking_id": booking_id, "status": "error"}
@@ -65,34 +46,10 @@ def create_einvoice(booking_id: int) -> dict:
         "organization", "user", "resource", "compensation"
     ).get(id=booking_id)
 
-    payload = build_einvoice_payload(booking)
-    payload["api_key"] = settings.BUCHHALTUNGSBUTLER_API_KEY
-
-    credentials = base64.b64encode(
-        f"{settings.BUCHHALTUNGSBUTLER_API_CLIENT}:{settings.BUCHHALTUNGSBUTLER_API_SECRET}".encode()
-    ).decode()
-
-    url = f"{settings.BUCHHALTUNGSBUTLER_BASE_URL}/invoices/create/einvoice"
-
     try:
-        response = requests.post(
-            url,
-            json=payload,
-            headers={
-                "Authorization": f"Basic {credentials}",
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-            timeout=30,
+        response = services_buchhaltungsbutler.post(
+            EINVOICE_PATH, build_einvoice_payload(booking)
         )
-        if not response.ok:
-            logger.error(
-                "BuchhaltungsButler returned %s for booking %s: %s",
-                response.status_code,
-                booking_id,
-                response.text,
-            )
-        response.raise_for_status()
         data = response.json()
     except requests.RequestException:
         logger.exception("Failed to create e-invoice for booking %s", booking_id)
@@ -121,67 +78,24 @@ def create_einvoice(booking_id: int) -> dict:
     return {"booking_id": booking_id, "status": "error", "message": data.get("message")}
 
 
-@task(queue_name="default")
-def create_org_draft_invoice(organization_id: int) -> dict:
-    """Create a bundled draft invoice for all uninvoiced bookings of an org."""
+def _handle_org_invoice_response(organization_id, bookings, einvoice, response, error):
+    """Return the result of a bundled invoice and save its invoice number."""
     from re_sharing.bookings.models import Booking
-    from re_sharing.bookings.services import build_org_invoice_payload
-    from re_sharing.organizations.models import Organization
-    from re_sharing.utils.models import BookingStatus
-
-    organization = Organization.objects.get(id=organization_id)
-
-    bookings = list(
-        Booking.objects.filter(
-            organization=organization,
-            status=BookingStatus.CONFIRMED,
-            total_amount__gt=0,
-            invoice_number="",
-            timespan__endswith__lt=timezone.now(),
-        )
-        .exclude(invoice_address__contains={"single_invoice": True})
-        .exclude(resource__type="lendable_item")
-        .select_related("resource", "compensation")
-        .order_by("timespan")
-    )
-
-    if not bookings:
-        return {"organization_id": organization_id, "status": "no_bookings"}
-
-    payload = build_org_invoice_payload(organization, bookings)
-    payload["api_key"] = settings.BUCHHALTUNGSBUTLER_API_KEY
-
-    credentials = base64.b64encode(
-        f"{settings.BUCHHALTUNGSBUTLER_API_CLIENT}:{settings.BUCHHALTUNGSBUTLER_API_SECRET}".encode()
-    ).decode()
-
-    url = f"{settings.BUCHHALTUNGSBUTLER_BASE_URL}/invoices/create/draft"
-
-    try:
-        response = requests.post(
-            url,
-            json=payload,
-            headers={
-                "Authorization": f"Basic {credentials}",
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-            timeout=30,
-        )
-        if not response.ok:
-            logger.error(
-                "BuchhaltungsButler returned %s for org %s: %s",
-                response.status_code,
-                organization_id,
-                response.text,
-            )
-        response.raise_for_status()
-    except requests.RequestException:
-        logger.exception(
-            "Failed to create org draft invoice for org %s", organization_id
+    from re_sharing.bookings.services import record_booking_changes
+
+    kind = "e-invoice" if einvoice else "draft invoice"
+    if error is None and einvoice:
+        try:
+            data = response.json()
+        except requests.RequestException as e:
+            error = e
+    if error is not None:
+        logger.error(
+            "Failed to create org %s for org %s: %s", kind, organization_id, error
         )
         return {"organization_id": organization_id, "status": "error"}
-    else:
+
+    if not einvoice:
         logger.info(
             "Org draft invoice created for org %s (%d bookings)",
             organization_id,
@@ -193,72 +107,13 @@ def create_org_draft_invoice(organization_id: int) -> dict:
             "booking_count": len(bookings),
         }
 
-
-@task(queue_name="default")
-def create_org_einvoice(organization_id: int) -> dict:
-    """Create a bundled e-invoice for all uninvoiced bookings of an org."""
-    from re_sharing.bookings.models import Booking
-    from re_sharing.bookings.services import build_org_einvoice_payload
-    from re_sharing.organizations.models import Organization
-    from re_sharing.utils.models import BookingStatus
-
-    organization = Organization.objects.get(id=organization_id)
-
-    bookings = list(
-        Booking.objects.filter(
-            organization=organization,
-            status=BookingStatus.CONFIRMED,
-            total_amount__gt=0,
-            invoice_number="",
-            timespan__endswith__lt=timezone.now(),
-        )
-        .exclude(invoice_address__contains={"single_invoice": True})
-        .exclude(resource__type="lendable_item")
-        .select_related("resource", "compensation")
-        .order_by("timespan")
-    )
-
-    if not bookings:
-        return {"organization_id": organization_id, "status": "no_bookings"}
-
-    payload = build_org_einvoice_payload(organization, bookings)
-    payload["api_key"] = settings.BUCHHALTUNGSBUTLER_API_KEY
-
-    credentials = base64.b64encode(
-        f"{settings.BUCHHALTUNGSBUTLER_API_CLIENT}:{settings.BUCHHALTUNGSBUTLER_API_SECRET}".encode()
-    ).decode()
-
-    url = f"{settings.BUCHHALTUNGSBUTLER_BASE_URL}/invoices/create/einvoice"
-
-    try:
-        response = requests.post(
-            url,
-            json=payload,
-            headers={
-                "Authorization": f"Basic {credentials}",
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-            timeout=30,
-        )
-        if not response.ok:
-            logger.error(
-                "BuchhaltungsButler returned %s for org %s: %s",
-                response.status_code,
-                organization_id,
-                response.text,
-            )
-        response.raise_for_status()
-        data = response.json()
-    except requests.RequestException:
-        logger.exception("Failed to create org e-invoice for org %s", organization_id)
-        return {"organization_id": organization_id, "status": "error"}
-
     if data.get("success"):
         invoice_number = data.get("invoicenumber", "")
         Booking.objects.filter(id__in=[b.id for b in bookings]).update(
             invoice_number=invoice_number
         )
+        # update() sends no post_save, the reporting rollups follow the version
+        record_booking_changes({b.resource_id for b in bookings})
         logger.info(
             "Org e-invoice created for org %s (%d bookings), invoice number: %s",
             organization_id,
@@ -282,3 +137,114 @@ def create_org_einvoice(organization_id: int) -> dict:
         "status": "error",
         "message": data.get("message"),
     }
+
+
+def _create_org_invoices(organization_ids, *, einvoice, on_result=None) -> list[dict]:
+    """
+    Create one bundled invoice per organization for its uninvoiced bookings.
+
+    The bookings of all organizations are loaded with one query and the invoices
+    are sent concurrently; on_result is called with the result of every
+    organization as soon as it is known.
+    """
+    from re_sharing.bookings.services import build_org_einvoice_payload
+    from re_sharing.bookings.services import build_org_invoice_payload
+    from re_sharing.bookings.services import get_bundleable_bookings
+
+    bookings_by_organization = defaultdict(list)
+    for booking in (
+        get_bundleable_bookings()
+        .filter(organization_id__in=organization_ids)
+        .select_related("organization", "resource", "compensation")
+        .order_by("timespan")
+    ):
+        bookings_by_organization[booking.organization_id].append(booking)
+
+    build_payload = (
+        build_org_einvoice_payload if einvoice else build_org_invoice_payload
+    )
+    path = EINVOICE_PATH if einvoice else DRAFT_INVOICE_PATH
+    invoice_requests = {
+        organization_id: (path, build_payload(bookings[0].organization, bookings))
+        for organization_id, bookings in bookings_by_organization.items()
+    }
+
+    results = [
+        {"organization_id": organization_id, "status": "no_bookings"}
+        for organization_id in organization_ids
+        if organization_id not in bookings_by_organization
+    ]
+    for result in results:
+        if on_result:
+            on_result(result)
+    for organization_id, response, error in services_buchhaltungsbutler.post_many(
+        invoice_requests
+    ):
+        result = _handle_org_invoice_response(
+            organization_id,
+            bookings_by_organization[organization_id],
+            einvoice,
+            response,
+            error,
+        )
+        if on_result:
+            on_result(result)
+        results.append(result)
+    return results
+
+
+@task(queue_name="default")
+def create_org_draft_invoice(organization_id: int) -> dict:
+    """Create a bundled draft invoice for all uninvoiced bookings of an org."""
+    return _create_org_invoices([organization_id], einvoice=False)[0]
+
+
+@task(queue_name="default")
+def create_org_einvoice(organization_id: int) -> dict:
+    """Create a bundled e-invoice for all uninvoiced bookings of an org."""
+    return _create_org_invoices([organization_id], einvoice=True)[0]
+
+
+@task(queue_name="default")
+def create_all_org_invoices(run_id: int) -> dict:
+    """Create bundled invoices for all organizations with uninvoiced bookings."""
+    from re_sharing.bookings.models import InvoiceBundleRun
+    from re_sharing.bookings.services import get_organizations_with_bundleable_bookings
+
+    run = InvoiceBundleRun.objects.get(id=run_id)
+    organization_ids = [
+        org["organization__id"] for org in get_organizations_with_bundleable_bookings()
+    ]
+    # Updating "updated" as well keeps the run active, see start_invoice_bundle_run
+    InvoiceBundleRun.objects.filter(id=run_id).update(
+        total=len(organization_ids), updated=timezone.now()
+    )
+
+    def record_progress(result):
+        field = "failed" if result["status"] == "error" else "succeeded"
+        InvoiceBundleRun.objects.filter(id=run_id).update(
+            **{field: F(field) + 1}, updated=timezone.now()
+        )
+
+    results = _create_org_invoices(
+        organization_ids, einvoice=run.einvoice, on_result=record_progress
+    )
+    InvoiceBundleRun.objects.filter(id=run_id).update(finished=timezone.now())
+    failed = [r["organization_id"] for r in results if r["status"] == "error"]
+    logger.info(
+        "Bundled invoices created for %d organizations, %d failed",
+        len(results) - len(failed),
+        len(failed),
+    )
+    return {"run_id": run_id, "status": "success", "failed": failed}
+
+
+@task(queue_name="default")
+def refresh_external_events_feed(ics_url: str) -> dict:
+    """Fetch an external ICS feed and store its upcoming events."""
+    from re_sharing.bookings.services import refresh_external_events
+
+    events = refresh_external_events(ics_url)
+    if events is None:
+        return {"url": ics_url, "status": "error"}
+    return {"url": ics_url, "status": "success", "events": len(events)}
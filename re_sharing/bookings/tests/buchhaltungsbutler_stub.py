@@ -0,0 +1,81 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+
+class BuchhaltungsButlerStub:
+    """
+    Local HTTP server answering like the BuchhaltungsButler API.
+
+    Every POST is recorded in `requests` as (path, authorization header, payload).
+    Queued responses are returned first, afterwards every request succeeds with a
+    new invoice number. `max_in_flight` is the highest number of requests that were
+    handled at the same time.
+    """
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.requests = []
+        self.queued_responses = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def queue_response(self, status, body):
+        self.queued_responses.append((status, body))
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _respond(self, path, authorization, payload):
+        with self._lock:
+            self.requests.append((path, authorization, payload))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            if self.queued_responses:
+                response = self.queued_responses.pop(0)
+            else:
+                response = (
+                    200,
+                    {"success": True, "invoicenumber": f"RE-{len(self.requests)}"},
+                )
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return response
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                status, body = stub._respond(
+                    self.path,
+                    self.headers.get("Authorization"),
+                    json.loads(self.rfile.read(length)),
+                )
+                content = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):  # noqa: A002
+                pass
+
+        return Handler
@@ -1,3 +1,4 @@
+from datetime import timedelta
 from unittest.mock import MagicMock
 from unittest.mock import patch
 
@@ -209,8 +210,19 @@ def test_save_model_existing_record(booking_series_admin_setup):
 def test_delete_bookings(booking_series_admin_setup):
     # Create a booking series with some bookings
     booking_series = BookingSeriesFactory()
-    BookingFactory(booking_series=booking_series)
-    BookingFactory(booking_series=booking_series)
+    BookingFactory(
+        booking_series=booking_series,
+        start_date=timezone.now().date() + timedelta(days=5),
+    )
+    BookingFactory(
+        booking_series=booking_series,
+        start_date=timezone.now().date() + timedelta(days=10),
+    )
+    past_booking = BookingFactory(
+        booking_series=booking_series,
+        start_date=timezone.now().date() - timedelta(days=5),
+        status=BookingStatus.CONFIRMED,
+    )
 
     # Mock the queryset
     queryset = BookingSeries.objects.filter(id=booking_series.id)
@@ -220,8 +232,10 @@ def test_delete_bookings(booking_series_admin_setup):
         booking_series_admin_setup["request"], queryset
     )
 
-    # Check that all bookings for the booking series were deleted
-    assert Booking.objects.filter(booking_series=booking_series).count() == 0
+    # Check that the future bookings were deleted and the past one cancelled
+    assert list(Booking.objects.filter(booking_series=booking_series)) == [past_booking]
+    past_booking.refresh_from_db()
+    assert past_booking.status == BookingStatus.CANCELLED
 
 
 @pytest.mark.django_db()
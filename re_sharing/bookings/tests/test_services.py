@@ -1,4 +1,5 @@
 import datetime
+import threading
 import zoneinfo
 from datetime import timedelta
 from unittest import skip
@@ -6,10 +7,17 @@ from unittest.mock import Mock
 from unittest.mock import patch
 
 import pytest
+from auditlog.models import LogEntry
 from dateutil.rrule import rrulestr
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
+from django.db import IntegrityError
+from django.db import connection
+from django.db import transaction
 from django.http import Http404
 from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from freezegun import freeze_time
 from psycopg.types.range import Range
@@ -17,18 +25,24 @@ from psycopg.types.range import Range
 from re_sharing.bookings.models import Booking
 from re_sharing.bookings.models import BookingMessage
 from re_sharing.bookings.models import BookingSeries
+from re_sharing.bookings.models import ExternalEventsFeed
+from re_sharing.bookings.models import InvoiceBundleRun
+from re_sharing.bookings.services import EXTERNAL_EVENTS_CACHE
 from re_sharing.bookings.services import InvalidBookingOperationError
 from re_sharing.bookings.services import bookings_webview
 from re_sharing.bookings.services import build_einvoice_payload
 from re_sharing.bookings.services import build_invoice_payload
 from re_sharing.bookings.services import build_org_einvoice_payload
 from re_sharing.bookings.services import build_org_invoice_payload
+from re_sharing.bookings.services import bump_bookings_webview_version
 from re_sharing.bookings.services import cancel_booking
 from re_sharing.bookings.services import create_booking_data
 from re_sharing.bookings.services import create_bookingmessage
+from re_sharing.bookings.services import fetch_external_events
 from re_sharing.bookings.services import filter_bookings_list
 from re_sharing.bookings.services import generate_booking
 from re_sharing.bookings.services import get_booking_activity_stream
+from re_sharing.bookings.services import get_bookings_webview_version
 from re_sharing.bookings.services import get_external_events
 from re_sharing.bookings.services import is_bookable_by_organization
 from re_sharing.bookings.services import manager_cancel_booking
@@ -37,10 +51,14 @@ from re_sharing.bookings.services import manager_confirm_booking_series
 from re_sharing.bookings.services import manager_filter_bookings_list
 from re_sharing.bookings.services import manager_filter_invoice_bookings_list
 from re_sharing.bookings.services import process_field_changes
+from re_sharing.bookings.services import refresh_external_events
 from re_sharing.bookings.services import save_booking
 from re_sharing.bookings.services import save_bookingmessage
 from re_sharing.bookings.services import set_initial_booking_data
 from re_sharing.bookings.services import show_booking
+from re_sharing.bookings.services import start_invoice_bundle_run
+from re_sharing.bookings.services_booking_series import bulk_cancel_bookings
+from re_sharing.bookings.services_booking_series import bulk_save_bookings
 from re_sharing.bookings.services_booking_series import (
     cancel_bookings_of_booking_series,
 )
@@ -48,6 +66,8 @@ from re_sharing.bookings.services_booking_series import (
     create_booking_series_and_bookings,
 )
 from re_sharing.bookings.services_booking_series import create_rrule
+from re_sharing.bookings.services_booking_series import extend_booking_series
+from re_sharing.bookings.services_booking_series import generate_bookings
 from re_sharing.bookings.services_booking_series import manager_cancel_booking_series
 from re_sharing.bookings.services_booking_series import save_booking_series
 from re_sharing.bookings.tests.factories import BookingFactory
@@ -118,7 +138,7 @@ class TestCancelBooking(TestCase):
 
         assert self.booking.status == BookingStatus.CANCELLED
 
-    @patch("re_sharing.bookings.services._enqueue_smartlock_sync_if_today")
+    @patch("re_sharing.bookings.services._enqueue_smartlock_sync_if_upcoming")
     def test_cancel_confirmed_booking_enqueues_smartlock_sync(self, mock_sync):
         BookingPermissionFactory(
             organization=self.organization,
@@ -133,7 +153,7 @@ class TestCancelBooking(TestCase):
 
         mock_sync.assert_called_once()
 
-    @patch("re_sharing.bookings.services._enqueue_smartlock_sync_if_today")
+    @patch("re_sharing.bookings.services._enqueue_smartlock_sync_if_upcoming")
     def test_cancel_pending_booking_does_not_enqueue_smartlock_sync(self, mock_sync):
         BookingPermissionFactory(
             organization=self.organization,
@@ -944,10 +964,322 @@ class TestSaveBookingSeries(TestCase):
         with pytest.raises(PermissionDenied):
             save_booking_series(another_user, self.bookings, self.booking_series)
 
+    def test_save_booking_series_allocates_unique_slugs_and_logs(self):
+        BookingPermissionFactory(
+            user=self.user,
+            organization=self.organization,
+            status=BookingPermission.Status.CONFIRMED,
+        )
+        existing_booking = BookingFactory(title="Recurring Meeting")
+        existing_booking.slug = self.bookings[0].start_date.isoformat() + (
+            "-recurring-meeting"
+        )
+        existing_booking.save()
+
+        bookings, booking_series = save_booking_series(
+            self.user, self.bookings, self.booking_series
+        )
+
+        slugs = [booking.slug for booking in bookings]
+        assert len(set(slugs)) == len(bookings)
+        assert existing_booking.slug not in slugs
+        assert slugs[0] == existing_booking.slug + "-2"
+        for booking in Booking.objects.filter(booking_series=booking_series):
+            assert booking.history.filter(action=LogEntry.Action.CREATE).count() == 1
+
+    def test_save_booking_series_marks_conflicting_bookings_unavailable(self):
+        BookingPermissionFactory(
+            user=self.user,
+            organization=self.organization,
+            status=BookingPermission.Status.CONFIRMED,
+        )
+        for booking in self.bookings:
+            booking.status = BookingStatus.CONFIRMED
+        conflicting_booking = self.bookings[2]
+        BookingFactory(
+            resource=self.resource,
+            timespan=conflicting_booking.timespan,
+            start_date=conflicting_booking.start_date,
+            end_date=conflicting_booking.end_date,
+            status=BookingStatus.CONFIRMED,
+        )
+
+        bookings, booking_series = save_booking_series(
+            self.user, self.bookings, self.booking_series
+        )
+
+        saved_bookings = Booking.objects.filter(booking_series=booking_series)
+        assert saved_bookings.count() == len(bookings)
+        assert all(booking.pk for booking in bookings)
+        assert saved_bookings.get(pk=conflicting_booking.pk).status == (
+            BookingStatus.UNAVAILABLE
+        )
+        assert (
+            saved_bookings.filter(status=BookingStatus.CONFIRMED).count()
+            == len(bookings) - 1
+        )
+
+
+class TestBulkSaveBookings(TestCase):
+    def setUp(self):
+        self.resource = ResourceFactory()
+        booking_series = BookingSeriesFactory(
+            resource=self.resource,
+            rrule="DTSTART:20300107T000000Z\nRRULE:FREQ=DAILY;COUNT=3",
+            start_time=datetime.time(10, 0),
+            end_time=datetime.time(12, 0),
+            status=BookingStatus.CONFIRMED,
+        )
+        self.bookings = generate_bookings(
+            booking_series,
+            datetime.datetime(2030, 1, 1, tzinfo=datetime.UTC),
+            datetime.datetime(2030, 12, 31, tzinfo=datetime.UTC),
+        )
+        for booking in self.bookings:
+            booking.status = BookingStatus.CONFIRMED
+
+    def test_overlapping_bookings_are_saved_as_unavailable(self):
+        # Confirmed after the bookings were generated
+        BookingFactory(
+            resource=self.resource,
+            timespan=self.bookings[1].timespan,
+            status=BookingStatus.CONFIRMED,
+        )
+
+        bulk_save_bookings(self.bookings)
+
+        assert all(booking.pk for booking in self.bookings)
+        assert [booking.status for booking in self.bookings] == [
+            BookingStatus.CONFIRMED,
+            BookingStatus.UNAVAILABLE,
+            BookingStatus.CONFIRMED,
+        ]
+
+    def test_other_integrity_errors_are_raised(self):
+        self.bookings[1].title = None
+
+        with pytest.raises(IntegrityError):
+            bulk_save_bookings(self.bookings)
+
+        assert not Booking.objects.filter(resource=self.resource).exists()
+
+
+class TestGenerateBookings(TestCase):
+    def setUp(self):
+        self.resource = ResourceFactory()
+        self.booking_series = BookingSeriesFactory(
+            resource=self.resource,
+            rrule="DTSTART:20300107T000000Z\nRRULE:FREQ=DAILY;COUNT=30",
+            start_time=datetime.time(10, 0),
+            end_time=datetime.time(12, 0),
+            status=BookingStatus.PENDING,
+        )
+        self.start = datetime.datetime(2030, 1, 1, tzinfo=datetime.UTC)
+        self.end = datetime.datetime(2030, 12, 31, tzinfo=datetime.UTC)
+
+    def _create_booking(self, day, start_hour, end_hour, status):
+        start = timezone.make_aware(datetime.datetime(2030, 1, day, start_hour))  # noqa: DTZ001
+        end = timezone.make_aware(datetime.datetime(2030, 1, day, end_hour))  # noqa: DTZ001
+        return BookingFactory(
+            resource=self.resource,
+            timespan=(start, end),
+            start_date=start.date(),
+            end_date=end.date(),
+            status=status,
+        )
+
+    def test_overlapping_occurrences_are_unavailable(self):
+        self._create_booking(8, 11, 13, BookingStatus.CONFIRMED)
+        self._create_booking(10, 9, 10, BookingStatus.CONFIRMED)
+        self._create_booking(12, 8, 20, BookingStatus.CONFIRMED)
+        self._create_booking(14, 10, 12, BookingStatus.PENDING)
+
+        bookings = generate_bookings(self.booking_series, self.start, self.end)
+
+        unavailable_days = {
+            booking.start_date.day
+            for booking in bookings
+            if booking.status == BookingStatus.UNAVAILABLE
+        }
+        assert len(bookings) == 30  # noqa: PLR2004
+        assert unavailable_days == {8, 12}
+
+    def test_number_of_queries_is_independent_of_occurrences(self):
+        for day in range(8, 28, 2):
+            self._create_booking(day, 11, 13, BookingStatus.CONFIRMED)
+
+        with self.assertNumQueries(1):
+            bookings = generate_bookings(self.booking_series, self.start, self.end)
+
+        assert len(bookings) == 30  # noqa: PLR2004
+
+
+@freeze_time("2026-03-01 03:00:00")
+class TestExtendBookingSeries(TestCase):
+    def setUp(self):
+        self.target_date = datetime.date(2028, 3, 1)
+        self.booking_series = BookingSeriesFactory(
+            rrule="DTSTART:20260101T000000Z\nRRULE:FREQ=DAILY",
+            last_booking_date=None,
+            materialized_until=datetime.date(2028, 2, 27),
+            start_time=datetime.time(10, 0),
+            end_time=datetime.time(12, 0),
+            status=BookingStatus.CONFIRMED,
+        )
+
+    def test_catches_up_on_missed_days(self):
+        new_bookings = extend_booking_series()
+
+        assert [booking.start_date for booking in new_bookings] == [
+            datetime.date(2028, 2, 28),
+            datetime.date(2028, 2, 29),
+            datetime.date(2028, 3, 1),
+        ]
+        assert Booking.objects.filter(booking_series=self.booking_series).count() == 3  # noqa: PLR2004
+        self.booking_series.refresh_from_db()
+        assert self.booking_series.materialized_until == self.target_date
+
+    @patch("re_sharing.resources.services_access_codes.ACCESS_CODE_SPARE_CANDIDATES", 0)
+    @patch("re_sharing.resources.services_access_codes.generate_access_code")
+    def test_allocates_codes_free_on_the_smartlock(self, mock_generate):
+        access = self.booking_series.resource.access
+        access.smartlock_id = "101"
+        access.save()
+        start = timezone.make_aware(datetime.datetime(2030, 1, 1, 10))  # noqa: DTZ001
+        BookingFactory(
+            resource=ResourceFactory(access=access),
+            timespan=(start, start + timedelta(hours=2)),
+            access_code="111111",
+        )
+        mock_generate.side_effect = ["111111", "222222", "333333", "444444"]
+
+        new_bookings = extend_booking_series()
+
+        assert {booking.access_code for booking in new_bookings} == {
+            "222222",
+            "333333",
+            "444444",
+        }
+
+    def test_does_not_create_duplicates(self):
+        start = timezone.make_aware(datetime.datetime(2028, 2, 29, 10))  # noqa: DTZ001
+        BookingFactory(
+            booking_series=self.booking_series,
+            resource=self.booking_series.resource,
+            timespan=(start, start + timedelta(hours=2)),
+            start_date=start.date(),
+            end_date=start.date(),
+            status=BookingStatus.CONFIRMED,
+        )
+
+        first_run = extend_booking_series()
+        second_run = extend_booking_series()
+
+        assert {booking.start_date for booking in first_run} == {
+            datetime.date(2028, 2, 28),
+            datetime.date(2028, 3, 1),
+        }
+        assert second_run == []
+        assert Booking.objects.filter(booking_series=self.booking_series).count() == 3  # noqa: PLR2004
+
+    def test_number_of_queries_is_independent_of_series(self):
+        for _ in range(4):
+            BookingSeriesFactory(
+                rrule="DTSTART:20260101T000000Z\nRRULE:FREQ=DAILY",
+                last_booking_date=None,
+                materialized_until=datetime.date(2028, 2, 27),
+                status=BookingStatus.PENDING,
+            )
+
+        # chunk, existing occurrences, confirmed timespans, slugs, smartlocks of the
+        # accesses, insert pending, savepoint, insert confirmed, release, audit log,
+        # resource versions, info screen locations, watermark, savepoints, end
+        with self.assertNumQueries(16):
+            new_bookings = extend_booking_series()
+
+        assert len(new_bookings) == 15  # noqa: PLR2004
+
+    def test_skips_finished_series(self):
+        self.booking_series.last_booking_date = datetime.date(2028, 2, 27)
+        self.booking_series.save()
+
+        assert extend_booking_series() == []
+
+
+class TestBulkCancelBookings(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.booking_series = BookingSeriesFactory()
+        access = AccessFactory(smartlock_id="smartlock-1")
+        self.resource = ResourceFactory(access=access)
+
+    def _create_booking(self, start, status=BookingStatus.CONFIRMED):
+        return BookingFactory(
+            booking_series=self.booking_series,
+            resource=self.resource,
+            timespan=(start, start + timedelta(hours=1)),
+            start_date=start.date(),
+            end_date=start.date(),
+            status=status,
+        )
+
+    def test_deletes_future_and_cancels_past_bookings(self):
+        now = timezone.now()
+        future_bookings = [
+            self._create_booking(now + timedelta(days=days)) for days in (1, 2, 3)
+        ]
+        past_booking = self._create_booking(now - timedelta(days=1))
+        LogEntry.objects.all().delete()
+
+        bulk_cancel_bookings(
+            self.user, Booking.objects.filter(booking_series=self.booking_series)
+        )
+
+        assert list(Booking.objects.filter(booking_series=self.booking_series)) == [
+            past_booking
+        ]
+        past_booking.refresh_from_db()
+        assert past_booking.status == BookingStatus.CANCELLED
+        deleted_log_entries = LogEntry.objects.filter(
+            action=LogEntry.Action.DELETE,
+            object_id__in=[booking.id for booking in future_bookings],
+        )
+        assert deleted_log_entries.count() == len(future_bookings)
+        assert all(log_entry.actor == self.user for log_entry in LogEntry.objects.all())
+        assert LogEntry.objects.count() == len(future_bookings) + 1
+
+    @patch("re_sharing.resources.services_nuki.request_smartlock_sync")
+    def test_syncs_smartlocks_for_bookings_with_provisioned_codes(self, mock_sync):
+        # Codes are provisioned for today and tomorrow
+        self._create_booking(timezone.now() + timedelta(days=2))
+        self._create_booking(timezone.now() + timedelta(days=3))
+        bookings = Booking.objects.filter(booking_series=self.booking_series)
+
+        bulk_cancel_bookings(self.user, bookings)
+        mock_sync.assert_called_once_with(set())
+
+        self._create_booking(timezone.now().replace(hour=0, minute=0, second=0))
+        bulk_cancel_bookings(self.user, bookings)
+        mock_sync.assert_called_with({"smartlock-1"})
+
+    def test_query_count_is_independent_of_bookings(self):
+        now = timezone.now()
+        for days in range(1, 11):
+            self._create_booking(now + timedelta(days=days))
+            self._create_booking(now - timedelta(days=days))
+        bookings = Booking.objects.filter(booking_series=self.booking_series)
+        # content types are cached by the first log entries
+        LogEntry.objects.get_for_model(Booking)
+
+        # smartlock check, bookings, savepoint, two log batches, collect, delete
+        # messages, delete bookings, update, release savepoint, resource versions,
+        # info screen locations
+        with self.assertNumQueries(12):
+            bulk_cancel_bookings(self.user, bookings)
+
 
 @pytest.mark.django_db()
-@patch.object(Booking, "is_cancelable", return_value=True)
-def test_manager_cancel_booking_series(mock_is_cancelable):
+def test_manager_cancel_booking_series():
     user = UserFactory(is_staff=True)
     booking_series = BookingSeriesFactory()
     booking1 = BookingFactory(
@@ -964,11 +1296,33 @@ def test_manager_cancel_booking_series(mock_is_cancelable):
     manager_cancel_booking_series(user, booking_series.uuid)
 
     booking1.refresh_from_db()
-    assert booking1.status == BookingStatus.CANCELLED
+    assert booking1.status == BookingStatus.PENDING
     with pytest.raises(Booking.DoesNotExist):
         Booking.objects.get(id=booking2.id)
 
 
+@pytest.mark.django_db()
+def test_manager_cancel_booking_series_keeps_past_confirmed_bookings():
+    user = UserFactory(is_staff=True)
+    booking_series = BookingSeriesFactory()
+    past_booking = BookingFactory(
+        booking_series=booking_series,
+        status=BookingStatus.CONFIRMED,
+        start_date=(timezone.now().date() - timedelta(weeks=1)),
+    )
+    future_booking = BookingFactory(
+        booking_series=booking_series,
+        status=BookingStatus.CONFIRMED,
+        start_date=(timezone.now().date() + timedelta(weeks=1)),
+    )
+
+    manager_cancel_booking_series(user, booking_series.uuid)
+
+    past_booking.refresh_from_db()
+    assert past_booking.status == BookingStatus.CONFIRMED
+    assert not Booking.objects.filter(id=future_booking.id).exists()
+
+
 @pytest.mark.django_db()
 @patch.object(Booking, "is_confirmable", return_value=True)
 def test_manager_confirm_booking_series(mock_is_confirmable):
@@ -1017,6 +1371,74 @@ def test_manager_confirm_booking_series_preserves_cancelled_bookings(
     assert booking3.status == BookingStatus.CONFIRMED
 
 
+@pytest.mark.django_db()
+def test_manager_confirm_booking_series_marks_overlapping_unavailable():
+    user = UserFactory(is_staff=True)
+    booking_series = BookingSeriesFactory(status=BookingStatus.PENDING)
+    start = timezone.make_aware(datetime.datetime(2030, 1, 7, 10))  # noqa: DTZ001
+    bookings = [
+        BookingFactory(
+            booking_series=booking_series,
+            resource=booking_series.resource,
+            timespan=(
+                start + timedelta(days=day),
+                start + timedelta(days=day, hours=2),
+            ),
+            status=BookingStatus.PENDING,
+        )
+        for day in range(3)
+    ]
+    BookingFactory(
+        resource=booking_series.resource,
+        timespan=(
+            start + timedelta(days=1, hours=1),
+            start + timedelta(days=1, hours=3),
+        ),
+        status=BookingStatus.CONFIRMED,
+    )
+    LogEntry.objects.all().delete()
+
+    manager_confirm_booking_series(user, booking_series.uuid)
+
+    statuses = [Booking.objects.get(id=booking.id).status for booking in bookings]
+    assert statuses == [
+        BookingStatus.CONFIRMED,
+        BookingStatus.UNAVAILABLE,
+        BookingStatus.CONFIRMED,
+    ]
+    booking_log_entries = LogEntry.objects.get_for_objects(
+        Booking.objects.filter(booking_series=booking_series)
+    )
+    assert booking_log_entries.count() == len(bookings)
+    assert all(log_entry.actor == user for log_entry in booking_log_entries)
+
+
+@pytest.mark.django_db()
+def test_manager_confirm_booking_series_query_count_is_constant():
+    user = UserFactory(is_staff=True)
+    start = timezone.make_aware(datetime.datetime(2030, 1, 7, 10))  # noqa: DTZ001
+
+    def confirm_series(number_of_bookings):
+        booking_series = BookingSeriesFactory(status=BookingStatus.PENDING)
+        for week in range(number_of_bookings):
+            BookingFactory(
+                booking_series=booking_series,
+                resource=booking_series.resource,
+                timespan=(
+                    start + timedelta(weeks=week),
+                    start + timedelta(weeks=week, hours=2),
+                ),
+                status=BookingStatus.PENDING,
+            )
+        with CaptureQueriesContext(connection) as context:
+            manager_confirm_booking_series(user, booking_series.uuid)
+        return len(context.captured_queries)
+
+    # The first call warms up the content type cache of auditlog
+    confirm_series(1)
+    assert confirm_series(2) == confirm_series(8)
+
+
 @pytest.mark.parametrize(
     ("startdate", "starttime", "endtime", "expected_data"),
     [
@@ -1266,6 +1688,50 @@ class TestBookingsWebview(TestCase):
         assert bookings.first().resource == resource_at_location1
 
 
+class TestBookingsWebviewVersion(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.room = ResourceFactory(type=Resource.ResourceTypeChoices.ROOM)
+        self.location_id = self.room.location_id
+
+    def test_bump_increments_location_and_all(self):
+        version = get_bookings_webview_version(self.location_id)
+        all_version = get_bookings_webview_version("all")
+
+        bump_bookings_webview_version([self.room.id])
+
+        assert get_bookings_webview_version(self.location_id) > version
+        assert get_bookings_webview_version("all") > all_version
+
+    def test_bump_ignores_non_room_resources(self):
+        parking_lot = ResourceFactory(
+            type=Resource.ResourceTypeChoices.PARKING_LOT, location=self.room.location
+        )
+        version = get_bookings_webview_version(self.location_id)
+
+        bump_bookings_webview_version([parking_lot.id])
+
+        assert get_bookings_webview_version(self.location_id) == version
+
+    def test_pending_booking_keeps_version(self):
+        version = get_bookings_webview_version(self.location_id)
+
+        booking = BookingFactory(resource=self.room, status=BookingStatus.PENDING)
+
+        assert get_bookings_webview_version(self.location_id) == version
+        booking.status = BookingStatus.CONFIRMED
+        booking.save()
+        assert get_bookings_webview_version(self.location_id) > version
+
+    def test_deleting_confirmed_booking_bumps_version(self):
+        booking = BookingFactory(resource=self.room, status=BookingStatus.CONFIRMED)
+        version = get_bookings_webview_version(self.location_id)
+
+        booking.delete()
+
+        assert get_bookings_webview_version(self.location_id) > version
+
+
 @pytest.mark.django_db()
 @freeze_time(
     datetime.datetime(2023, 10, 10, 10, 0, 0).astimezone(
@@ -2297,19 +2763,15 @@ DESCRIPTION:This event is in the past
 END:VEVENT
 END:VCALENDAR"""
 
-    @patch("django.core.cache.cache")
     @patch("requests.get")
-    def test_parses_ics_feed_correctly(self, mock_get, mock_cache):
+    def test_parses_ics_feed_correctly(self, mock_get):
         """Test that ICS feed is parsed correctly"""
-        mock_cache.get.return_value = None
         mock_response = Mock()
         mock_response.content = self.sample_ics
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
 
-        events = get_external_events(
-            "https://example.com/events.ics", cache_key="test_events"
-        )
+        events = fetch_external_events("https://example.com/events.ics")
 
         # Should have 2 future events (past event filtered out)
         assert len(events) == TEST_EXPECTED_FUTURE_EVENTS
@@ -2318,43 +2780,35 @@ END:VCALENDAR"""
         assert events[0]["description"] == "A test event in the future"
         assert events[1]["title"] == "Future Event 2"
 
-    @patch("django.core.cache.cache")
     @patch("requests.get")
-    def test_filters_past_events(self, mock_get, mock_cache):
+    def test_filters_past_events(self, mock_get):
         """Test that past events are filtered out"""
-        mock_cache.get.return_value = None
         mock_response = Mock()
         mock_response.content = self.sample_ics
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
 
-        events = get_external_events(
-            "https://example.com/events.ics", cache_key="test_filter"
-        )
+        events = fetch_external_events("https://example.com/events.ics")
 
         # Verify no past events
         for event in events:
             assert event["title"] != "Past Event"
 
-    @patch("django.core.cache.cache")
     @patch("requests.get")
-    def test_sorts_events_by_start_date(self, mock_get, mock_cache):
+    def test_sorts_events_by_start_date(self, mock_get):
         """Test that events are sorted by start date"""
-        mock_cache.get.return_value = None
         mock_response = Mock()
         mock_response.content = self.sample_ics
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
 
-        events = get_external_events(
-            "https://example.com/events.ics", cache_key="test_sort"
-        )
+        events = fetch_external_events("https://example.com/events.ics")
 
         # Check that events are sorted by start date
         if len(events) >= TEST_EXPECTED_FUTURE_EVENTS:
             assert events[0]["start"] <= events[1]["start"]
 
-    @patch("django.core.cache.cache")
+    @patch("re_sharing.bookings.services.cache")
     def test_returns_cached_events(self, mock_cache):
         """Test that cached events are returned without fetching"""
         cached_events = [
@@ -2367,84 +2821,144 @@ END:VCALENDAR"""
         )
 
         assert events == cached_events
-        mock_cache.get.assert_called_once_with("test_cached")
+        mock_cache.get.assert_called_once_with(EXTERNAL_EVENTS_CACHE.key("test_cached"))
 
-    @patch("django.core.cache.cache")
     @patch("requests.get")
-    def test_caches_fetched_events(self, mock_get, mock_cache):
-        """Test that fetched events are cached for 24 hours"""
-        mock_cache.get.return_value = None
+    def test_stores_fetched_events(self, mock_get):
+        """Test that refreshed events are stored and served from the database"""
         mock_response = Mock()
         mock_response.content = self.sample_ics
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
+        cache.clear()
 
-        get_external_events(
-            "https://example.com/events.ics", cache_key="test_cache_set"
+        refresh_external_events("https://example.com/events.ics")
+        events = get_external_events(
+            "https://example.com/events.ics", cache_key="test_stored"
         )
 
-        # Verify cache.set was called with 24 hour TTL (86400 seconds)
-        mock_cache.set.assert_called_once()
-        args = mock_cache.set.call_args[0]
-        assert args[0] == "test_cache_set"  # cache key
-        assert args[2] == 60 * 60 * 24  # 24 hours in seconds
+        mock_get.assert_called_once()
+        assert len(events) == TEST_EXPECTED_FUTURE_EVENTS
+        assert events[0]["title"] == "Future Event 1"
+        assert events[0]["start"] == datetime.datetime(
+            2027, 3, 1, 10, tzinfo=datetime.UTC
+        )
 
-    @patch("django.core.cache.cache")
     @patch("requests.get")
-    def test_handles_request_error_gracefully(self, mock_get, mock_cache):
-        """Test that request errors are handled gracefully"""
-        import requests
+    def test_refresh_invalidates_cached_events(self, mock_get):
+        """Test that refreshed events replace the cached ones in all processes"""
+        mock_response = Mock()
+        mock_response.content = self.sample_ics
+        mock_response.raise_for_status = Mock()
+        mock_get.return_value = mock_response
+        cache.clear()
+        ExternalEventsFeed.objects.create(
+            url="https://example.com/events.ics", events=[]
+        )
+        assert (
+            get_external_events(
+                "https://example.com/events.ics", cache_key="test_refresh"
+            )
+            == []
+        )
 
-        mock_cache.get.return_value = None
-        mock_get.side_effect = requests.RequestException("Connection failed")
+        refresh_external_events("https://example.com/events.ics")
+
+        assert (
+            len(
+                get_external_events(
+                    "https://example.com/events.ics", cache_key="test_refresh"
+                )
+            )
+            == TEST_EXPECTED_FUTURE_EVENTS
+        )
+
+    @patch("re_sharing.bookings.tasks.refresh_external_events_feed")
+    @patch("requests.get")
+    def test_does_not_fetch_on_request_path(self, mock_get, mock_task):
+        """Test that a missing feed is refreshed in the background"""
+        cache.clear()
 
         events = get_external_events(
-            "https://example.com/events.ics", cache_key="test_error"
+            "https://example.com/events.ics", cache_key="test_missing"
         )
 
-        # Should return empty list on error
         assert events == []
+        mock_get.assert_not_called()
+        mock_task.enqueue.assert_called_once_with("https://example.com/events.ics")
+
+    @patch("re_sharing.bookings.tasks.refresh_external_events_feed")
+    def test_serves_stale_events_while_refreshing(self, mock_task):
+        """Test that outdated events are served while a refresh is enqueued"""
+        cache.clear()
+        with freeze_time("2026-01-01"):
+            ExternalEventsFeed.objects.create(
+                url="https://example.com/events.ics",
+                events=[
+                    {
+                        "title": "All Day Event",
+                        "start": "2099-05-01",
+                        "end": "2099-05-02",
+                        "location": "",
+                        "description": "",
+                        "url": "",
+                    }
+                ],
+            )
+
+        events = get_external_events(
+            "https://example.com/events.ics", cache_key="test_stale"
+        )
+
+        assert events[0]["start"] == datetime.date(2099, 5, 1)
+        mock_task.enqueue.assert_called_once_with("https://example.com/events.ics")
+
+    @patch("requests.get")
+    def test_handles_request_error_gracefully(self, mock_get):
+        """Test that request errors keep the stored events"""
+        import requests
+
+        ExternalEventsFeed.objects.create(
+            url="https://example.com/events.ics", events=[{"title": "Old"}]
+        )
+        mock_get.side_effect = requests.RequestException("Connection failed")
+
+        events = refresh_external_events("https://example.com/events.ics")
+
+        assert events is None
+        assert ExternalEventsFeed.objects.get().events == [{"title": "Old"}]
 
-    @patch("django.core.cache.cache")
     @patch("requests.get")
-    def test_handles_invalid_ics_gracefully(self, mock_get, mock_cache):
+    def test_handles_invalid_ics_gracefully(self, mock_get):
         """Test that invalid ICS content is handled gracefully"""
-        mock_cache.get.return_value = None
         mock_response = Mock()
         mock_response.content = b"This is not valid ICS content"
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
 
-        events = get_external_events(
-            "https://example.com/events.ics", cache_key="test_invalid"
-        )
+        events = refresh_external_events("https://example.com/events.ics")
 
-        # Should return empty list for invalid content
-        assert events == []
+        assert events is None
+        assert not ExternalEventsFeed.objects.exists()
 
-    @patch("django.core.cache.cache")
     @patch("requests.get")
-    def test_handles_empty_calendar(self, mock_get, mock_cache):
+    def test_handles_empty_calendar(self, mock_get):
         """Test that empty calendar is handled correctly"""
         empty_ics = b"""BEGIN:VCALENDAR
 VERSION:2.0
 PRODID:-//Test Calendar//EN
 END:VCALENDAR"""
-        mock_cache.get.return_value = None
         mock_response = Mock()
         mock_response.content = empty_ics
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
 
-        events = get_external_events(
-            "https://example.com/events.ics", cache_key="test_empty"
-        )
+        events = fetch_external_events("https://example.com/events.ics")
 
         assert events == []
 
-    @patch("django.core.cache.cache")
     @patch("requests.get")
-    def test_handles_event_without_dtstart(self, mock_get, mock_cache):
+    def test_handles_event_without_dtstart(self, mock_get):
         """Test that events without DTSTART are skipped"""
         ics_no_dtstart = b"""BEGIN:VCALENDAR
 VERSION:2.0
@@ -2459,23 +2973,19 @@ DTEND:20270401T120000Z
 SUMMARY:Valid Event
 END:VEVENT
 END:VCALENDAR"""
-        mock_cache.get.return_value = None
         mock_response = Mock()
         mock_response.content = ics_no_dtstart
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
 
-        events = get_external_events(
-            "https://example.com/events.ics", cache_key="test_no_dtstart"
-        )
+        events = fetch_external_events("https://example.com/events.ics")
 
         # Only the valid event should be included
         assert len(events) == 1
         assert events[0]["title"] == "Valid Event"
 
-    @patch("django.core.cache.cache")
     @patch("requests.get")
-    def test_handles_all_day_events(self, mock_get, mock_cache):
+    def test_handles_all_day_events(self, mock_get):
         """Test that all-day events (date only) are handled correctly"""
         ics_all_day = b"""BEGIN:VCALENDAR
 VERSION:2.0
@@ -2486,15 +2996,12 @@ DTEND;VALUE=DATE:20260502
 SUMMARY:All Day Event
 END:VEVENT
 END:VCALENDAR"""
-        mock_cache.get.return_value = None
         mock_response = Mock()
         mock_response.content = ics_all_day
         mock_response.raise_for_status = Mock()
         mock_get.return_value = mock_response
 
-        events = get_external_events(
-            "https://example.com/events.ics", cache_key="test_all_day"
-        )
+        events = fetch_external_events("https://example.com/events.ics")
 
         assert len(events) == 1
         assert events[0]["title"] == "All Day Event"
@@ -2950,6 +3457,40 @@ class TestBuildEinvoicePayload(TestCase):
         assert payload["item_single_price"] == ["15"]
 
 
+class TestStartInvoiceBundleRun(TransactionTestCase):
+    def test_concurrent_first_runs_start_once(self):
+        user = UserFactory(is_staff=True)
+        first_started = threading.Event()
+        finish_first = threading.Event()
+        results = []
+
+        def start(*, hold):
+            try:
+                with transaction.atomic():
+                    results.append(start_invoice_bundle_run(user, einvoice=False))
+                    if hold:
+                        first_started.set()
+                        finish_first.wait(5)
+            finally:
+                connection.close()
+
+        first = threading.Thread(target=start, kwargs={"hold": True})
+        first.start()
+        first_started.wait(5)
+        # No run exists before the first request commits, so the second request
+        # has to wait for the lock rather than for a row
+        second = threading.Thread(target=start, kwargs={"hold": False})
+        second.start()
+        second.join(0.5)
+        assert second.is_alive()
+        finish_first.set()
+        first.join()
+        second.join()
+
+        run = InvoiceBundleRun.objects.get()
+        assert results == [(run, True), (run, False)]
+
+
 class TestBuildOrgInvoicePayload(TestCase):
     """Test build_org_invoice_payload function"""
 
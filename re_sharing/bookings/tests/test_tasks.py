@@ -0,0 +1,120 @@
+import base64
+import datetime
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.test import override_settings
+
+from re_sharing.bookings.models import Booking
+from re_sharing.bookings.models import InvoiceBundleRun
+from re_sharing.bookings.tasks import create_all_org_invoices
+from re_sharing.bookings.tasks import create_draft_invoice
+from re_sharing.bookings.tasks import create_org_einvoice
+from re_sharing.bookings.tests.buchhaltungsbutler_stub import BuchhaltungsButlerStub
+from re_sharing.bookings.tests.factories import BookingFactory
+from re_sharing.organizations.tests.factories import OrganizationFactory
+from re_sharing.resources.models import Resource
+from re_sharing.resources.tests.factories import ResourceFactory
+from re_sharing.users.tests.factories import UserFactory
+
+NUMBER_OF_ORGANIZATIONS = 6
+
+
+@override_settings(
+    BUCHHALTUNGSBUTLER_API_KEY="key",
+    BUCHHALTUNGSBUTLER_API_CLIENT="client",
+    BUCHHALTUNGSBUTLER_API_SECRET="secret",  # noqa: S106
+)
+@patch(
+    "re_sharing.bookings.services_buchhaltungsbutler.BUCHHALTUNGSBUTLER_MIN_INTERVAL", 0
+)
+class TestInvoiceTasks(TestCase):
+    def setUp(self):
+        self.resource = ResourceFactory(type=Resource.ResourceTypeChoices.ROOM)
+        self.organizations = [
+            OrganizationFactory() for _ in range(NUMBER_OF_ORGANIZATIONS)
+        ]
+        for month, organization in enumerate(self.organizations, start=1):
+            for day in (10, 11):
+                BookingFactory(
+                    organization=organization,
+                    resource=self.resource,
+                    start_date=datetime.date(2025, month, day),
+                    total_amount=50,
+                )
+
+    def test_create_draft_invoice_sends_credentials(self):
+        booking = Booking.objects.first()
+
+        with (
+            BuchhaltungsButlerStub() as stub,
+            override_settings(BUCHHALTUNGSBUTLER_BASE_URL=stub.url),
+        ):
+            result = create_draft_invoice.call(booking.id)
+
+        assert result["status"] == "success"
+        path, authorization, payload = stub.requests[0]
+        assert path == "/invoices/create/draft"
+        assert authorization == "Basic " + base64.b64encode(b"client:secret").decode()
+        assert payload["api_key"] == "key"
+
+    def test_create_org_einvoice_sets_invoice_numbers(self):
+        organization = self.organizations[0]
+
+        with (
+            BuchhaltungsButlerStub() as stub,
+            override_settings(BUCHHALTUNGSBUTLER_BASE_URL=stub.url),
+        ):
+            self.resource.refresh_from_db()
+            bookings_version = self.resource.bookings_version
+            result = create_org_einvoice.call(organization.id)
+
+        assert result["status"] == "success"
+        assert len(stub.requests) == 1
+        assert set(
+            Booking.objects.filter(organization=organization).values_list(
+                "invoice_number", flat=True
+            )
+        ) == {result["invoice_number"]}
+        # The reporting rollups have to pick up the invoice numbers
+        self.resource.refresh_from_db()
+        assert self.resource.bookings_version > bookings_version
+
+    def test_create_org_einvoice_does_not_retry_error_statuses(self):
+        # The invoice may have been created anyway, e.g. behind a proxy
+        organization = self.organizations[0]
+
+        for status in (429, 500, 503):
+            with (
+                self.subTest(status=status),
+                BuchhaltungsButlerStub() as stub,
+                override_settings(BUCHHALTUNGSBUTLER_BASE_URL=stub.url),
+            ):
+                stub.queue_response(status, {"success": False})
+                result = create_org_einvoice.call(organization.id)
+
+                assert result["status"] == "error"
+                assert len(stub.requests) == 1
+                assert not Booking.objects.exclude(invoice_number="").exists()
+
+    def test_create_all_org_invoices(self):
+        run = InvoiceBundleRun.objects.create(user=UserFactory(), einvoice=True)
+
+        with (
+            BuchhaltungsButlerStub(delay=0.05) as stub,
+            override_settings(BUCHHALTUNGSBUTLER_BASE_URL=stub.url),
+        ):
+            stub.queue_response(400, {"success": False})
+            result = create_all_org_invoices.call(run.id)
+
+        run.refresh_from_db()
+        assert run.total == NUMBER_OF_ORGANIZATIONS
+        assert run.succeeded == NUMBER_OF_ORGANIZATIONS - 1
+        assert run.failed == 1
+        assert run.finished is not None
+        assert len(result["failed"]) == 1
+        assert len(stub.requests) == NUMBER_OF_ORGANIZATIONS
+        assert 1 < stub.max_in_flight <= 4  # noqa: PLR2004
+        assert (
+            Booking.objects.filter(invoice_number="").count() == 2  # noqa: PLR2004
+        )
@@ -2,17 +2,22 @@ import datetime
 from http import HTTPStatus
 from unittest.mock import patch
 
+from auditlog.context import set_actor
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
 from django.http import HttpResponseRedirect
 from django.test import Client
 from django.test import RequestFactory
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.timezone import make_aware
 
 from re_sharing.bookings.forms import BookingForm
+from re_sharing.bookings.models import Booking
 from re_sharing.bookings.tests.factories import BookingFactory
 from re_sharing.bookings.tests.factories import BookingMessageFactory
 from re_sharing.bookings.tests.factories import BookingSeriesFactory
@@ -22,6 +27,9 @@ from re_sharing.organizations.models import BookingPermission
 from re_sharing.organizations.tests.factories import BookingPermissionFactory
 from re_sharing.organizations.tests.factories import OrganizationFactory
 from re_sharing.providers.tests.factories import ManagerFactory
+from re_sharing.resources.models import Resource
+from re_sharing.resources.tests.factories import CompensationFactory
+from re_sharing.resources.tests.factories import LocationFactory
 from re_sharing.resources.tests.factories import ResourceFactory
 from re_sharing.users.tests.factories import UserFactory
 from re_sharing.utils.models import BookingStatus
@@ -126,6 +134,36 @@ class TestShowBookingView(TestCase):
 
         assert response.status_code == HTTPStatus.OK
 
+    def test_query_count_is_independent_of_history(self):
+        BookingPermissionFactory(
+            organization=self.organization,
+            user=self.user,
+            status=BookingPermission.Status.CONFIRMED,
+        )
+        client = Client()
+        client.force_login(self.user)
+
+        def edit_booking():
+            with set_actor(UserFactory()):
+                self.booking.user = UserFactory()
+                self.booking.resource = ResourceFactory()
+                self.booking.compensation = CompensationFactory()
+                self.booking.save()
+            BookingMessageFactory(booking=self.booking, user=UserFactory())
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(self.show_booking_url)
+            assert response.status_code == HTTPStatus.OK
+            return len(context.captured_queries)
+
+        edit_booking()
+        queries_with_short_history = count_queries()
+        for _ in range(5):
+            edit_booking()
+
+        assert count_queries() == queries_with_short_history
+
 
 class TestManagerBookingsView(TestCase):
     def setUp(self):
@@ -658,6 +696,7 @@ class TestListBookingsWebview(TestCase):
     def setUp(self):
         self.user = UserFactory()
         self.client.force_login(self.user)
+        cache.clear()
 
     @patch("re_sharing.bookings.services.get_external_events")
     @patch("re_sharing.bookings.views.bookings_webview")
@@ -676,16 +715,28 @@ class TestListBookingsWebview(TestCase):
     def test_list_bookings_webview_with_filters(
         self, mock_bookings_webview, mock_external_events
     ):
-        mock_bookings_webview.return_value = ([], "public")
+        location = LocationFactory()
+        mock_bookings_webview.return_value = ([], location)
         mock_external_events.return_value = []
 
         response = self.client.get(
             reverse("bookings:list-bookings-webview"),
-            {"location": "public"},
+            {"location": location.slug},
         )
 
         assert response.status_code == HTTPStatus.OK
-        mock_bookings_webview.assert_called_once_with("public")
+        mock_bookings_webview.assert_called_once_with(location)
+
+    @patch("re_sharing.bookings.views.bookings_webview")
+    def test_list_bookings_webview_unknown_location(self, mock_bookings_webview):
+        response = self.client.get(
+            reverse("bookings:list-bookings-webview"),
+            {"location": "unknown"},
+        )
+
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        mock_bookings_webview.assert_not_called()
+        assert cache.get("bookings_webview:version:unknown") is None
 
     @patch("re_sharing.bookings.services.get_external_events")
     @patch("re_sharing.bookings.views.bookings_webview")
@@ -704,6 +755,53 @@ class TestListBookingsWebview(TestCase):
         assert "external_events" in response.context
         assert len(response.context["external_events"]) == 1
 
+    @patch("re_sharing.bookings.services.get_external_events")
+    @patch("re_sharing.bookings.views.bookings_webview")
+    def test_list_bookings_webview_is_cached(
+        self, mock_bookings_webview, mock_external_events
+    ):
+        mock_bookings_webview.return_value = ([], "all")
+        mock_external_events.return_value = []
+
+        first_response = self.client.get(reverse("bookings:list-bookings-webview"))
+        second_response = self.client.get(reverse("bookings:list-bookings-webview"))
+
+        assert second_response.status_code == HTTPStatus.OK
+        assert second_response.content == first_response.content
+        assert second_response["ETag"] == first_response["ETag"]
+        mock_bookings_webview.assert_called_once_with("all")
+
+    @patch("re_sharing.bookings.services.get_external_events")
+    @patch("re_sharing.bookings.views.bookings_webview")
+    def test_list_bookings_webview_not_modified(
+        self, mock_bookings_webview, mock_external_events
+    ):
+        mock_bookings_webview.return_value = ([], "all")
+        mock_external_events.return_value = []
+
+        response = self.client.get(reverse("bookings:list-bookings-webview"))
+        response = self.client.get(
+            reverse("bookings:list-bookings-webview"),
+            headers={"If-None-Match": response["ETag"]},
+        )
+
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    @patch("re_sharing.bookings.services.get_external_events")
+    @patch("re_sharing.bookings.views.bookings_webview")
+    def test_list_bookings_webview_rerenders_after_booking_change(
+        self, mock_bookings_webview, mock_external_events
+    ):
+        mock_bookings_webview.return_value = ([], "all")
+        mock_external_events.return_value = []
+        resource = ResourceFactory(type=Resource.ResourceTypeChoices.ROOM)
+
+        self.client.get(reverse("bookings:list-bookings-webview"))
+        BookingFactory(resource=resource, status=BookingStatus.CONFIRMED)
+        self.client.get(reverse("bookings:list-bookings-webview"))
+
+        assert mock_bookings_webview.call_count == 2  # noqa: PLR2004
+
 
 class TestManagerListBookingsViewHTMX(TestCase):
     def setUp(self):
@@ -712,7 +810,7 @@ class TestManagerListBookingsViewHTMX(TestCase):
 
     @patch("re_sharing.bookings.views.manager_filter_bookings_list")
     def test_htmx_request_returns_partial(self, mock_filter):
-        mock_filter.return_value = ([], [], [])
+        mock_filter.return_value = (Booking.objects.none(), [], [])
 
         response = self.client.get(
             reverse("bookings:manager-list-bookings"), headers={"hx-request": "true"}
@@ -801,7 +899,7 @@ class TestManagerFilterInvoiceBookingsListView(TestCase):
 
     @patch("re_sharing.bookings.views.manager_filter_invoice_bookings_list")
     def test_manager_filter_invoice_bookings_list(self, mock_filter):
-        mock_filter.return_value = ([], [])
+        mock_filter.return_value = (Booking.objects.none(), [])
 
         response = self.client.get(reverse("bookings:manager-list-invoices"))
 
@@ -811,7 +909,7 @@ class TestManagerFilterInvoiceBookingsListView(TestCase):
 
     @patch("re_sharing.bookings.views.manager_filter_invoice_bookings_list")
     def test_manager_filter_invoice_bookings_list_htmx(self, mock_filter):
-        mock_filter.return_value = ([], [])
+        mock_filter.return_value = (Booking.objects.none(), [])
 
         response = self.client.get(
             reverse("bookings:manager-list-invoices"), headers={"hx-request": "true"}
@@ -822,7 +920,7 @@ class TestManagerFilterInvoiceBookingsListView(TestCase):
 
     @patch("re_sharing.bookings.views.manager_filter_invoice_bookings_list")
     def test_manager_filter_invoice_bookings_with_filters(self, mock_filter):
-        mock_filter.return_value = ([], [])
+        mock_filter.return_value = (Booking.objects.none(), [])
 
         response = self.client.get(
             reverse("bookings:manager-list-invoices"),
@@ -846,6 +944,68 @@ class TestManagerFilterInvoiceBookingsListView(TestCase):
         response = self.client.get(reverse("bookings:manager-list-invoices"))
         assert response.status_code == HTTPStatus.FOUND  # Redirects to login
 
+    @patch("re_sharing.utils.pagination.KEYSET_PAGE_SIZE", 2)
+    def test_load_more_bookings(self):
+        start = timezone.now() - datetime.timedelta(days=10)
+        bookings = [
+            BookingFactory(
+                timespan=(
+                    start + datetime.timedelta(days=day),
+                    start + datetime.timedelta(days=day, hours=1),
+                ),
+                status=BookingStatus.CONFIRMED,
+                total_amount=10,
+            )
+            for day in range(3)
+        ]
+
+        response = self.client.get(reverse("bookings:manager-list-invoices"))
+        assert list(response.context["bookings"]) == bookings[:2]
+        self.assertContains(response, "load-more-invoices")
+
+        response = self.client.get(
+            reverse("bookings:manager-list-invoices"),
+            {"after": response.context["next_cursor"]},
+            headers={"hx-request": "true"},
+        )
+        self.assertTemplateUsed(response, "manager-invoice-rows")
+        assert list(response.context["bookings"]) == bookings[2:]
+        self.assertNotContains(response, "load-more-invoices")
+
+    def test_export_csv_uses_filters(self):
+        start = timezone.now() - datetime.timedelta(days=10)
+        invoiced, not_invoiced = (
+            BookingFactory(
+                timespan=(
+                    start + datetime.timedelta(days=day),
+                    start + datetime.timedelta(days=day, hours=1),
+                ),
+                status=BookingStatus.CONFIRMED,
+                total_amount=10,
+                invoice_number=invoice_number,
+            )
+            for day, invoice_number in ((1, "INV-7"), (2, ""))
+        )
+
+        response = self.client.get(
+            reverse("bookings:manager-export-invoices", args=["csv"]),
+            {"invoice_filter": "with_invoice"},
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert response["Content-Type"] == "text/csv; charset=utf-8"
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        assert len(lines) == 2  # noqa: PLR2004
+        assert invoiced.slug in lines[1]
+        assert "INV-7" in lines[1]
+        assert not_invoiced.slug not in lines[1]
+
+    def test_export_unknown_format(self):
+        response = self.client.get(
+            reverse("bookings:manager-export-invoices", args=["pdf"])
+        )
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
 
 class TestCreateItemBookingViewPublicAccess(TestCase):
     """create_item_booking_view is public; shows a notice when login/org is missing."""
@@ -1503,3 +1663,87 @@ class TestCreateOrgEinvoiceView(TestCase):
             )
         )
         assert response.status_code == HTTPStatus.FOUND
+
+
+class TestCreateAllOrgInvoicesView(TestCase):
+    def setUp(self):
+        self.staff_user = UserFactory(is_staff=True)
+        self.client.force_login(self.staff_user)
+        self.resource = ResourceFactory(type=Resource.ResourceTypeChoices.ROOM)
+        for month in (1, 2):
+            BookingFactory(
+                organization=OrganizationFactory(),
+                resource=self.resource,
+                start_date=datetime.date(2025, month, 10),
+                total_amount=50,
+                invoice_number="",
+            )
+
+    @patch("re_sharing.bookings.tasks.create_all_org_invoices")
+    def test_creates_run_and_enqueues_task(self, mock_task):
+        from re_sharing.bookings.models import InvoiceBundleRun
+
+        response = self.client.post(
+            reverse("bookings:create-all-org-invoices"), {"einvoice": "true"}
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        run = InvoiceBundleRun.objects.get()
+        assert run.user == self.staff_user
+        assert run.einvoice is True
+        assert run.total == 2  # noqa: PLR2004
+        mock_task.enqueue.assert_called_once_with(run.id)
+        self.assertContains(
+            response, reverse("bookings:invoice-bundle-run", args=[run.id])
+        )
+
+    @patch("re_sharing.bookings.tasks.create_all_org_invoices")
+    def test_shows_active_run_instead_of_starting_another(self, mock_task):
+        from re_sharing.bookings.models import InvoiceBundleRun
+
+        run = InvoiceBundleRun.objects.create(user=self.staff_user, total=2)
+
+        response = self.client.post(reverse("bookings:create-all-org-invoices"))
+
+        assert response.status_code == HTTPStatus.OK
+        assert InvoiceBundleRun.objects.get() == run
+        mock_task.enqueue.assert_not_called()
+        self.assertContains(
+            response, reverse("bookings:invoice-bundle-run", args=[run.id])
+        )
+
+    @patch("re_sharing.bookings.tasks.create_all_org_invoices")
+    def test_starts_run_after_aborted_run(self, mock_task):
+        from re_sharing.bookings.models import InvoiceBundleRun
+
+        aborted_run = InvoiceBundleRun.objects.create(user=self.staff_user, total=2)
+        InvoiceBundleRun.objects.filter(id=aborted_run.id).update(
+            updated=timezone.now() - datetime.timedelta(hours=1)
+        )
+
+        self.client.post(reverse("bookings:create-all-org-invoices"))
+
+        run = InvoiceBundleRun.objects.exclude(id=aborted_run.id).get()
+        mock_task.enqueue.assert_called_once_with(run.id)
+
+    def test_shows_progress(self):
+        from re_sharing.bookings.models import InvoiceBundleRun
+
+        run = InvoiceBundleRun.objects.create(
+            user=self.staff_user, total=4, succeeded=1, failed=1
+        )
+
+        response = self.client.get(
+            reverse("bookings:invoice-bundle-run", args=[run.id])
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert run.percent == 50  # noqa: PLR2004
+        self.assertContains(response, 'hx-trigger="every 2s"')
+
+    def test_non_staff_user_forbidden(self):
+        self.client.force_login(UserFactory(is_staff=False))
+
+        response = self.client.post(reverse("bookings:create-all-org-invoices"))
+
+        assert response.status_code == HTTPStatus.FOUND
@@ -3,12 +3,14 @@ from django.urls import path
 from .views import cancel_booking_series_booking_view
 from .views import cancel_booking_view
 from .views import cancel_bookings_of_booking_series_view
+from .views import create_all_org_invoices_view
 from .views import create_booking_data_form_view
 from .views import create_bookingmessage_view
 from .views import create_draft_invoice_view
 from .views import create_einvoice_view
 from .views import create_org_draft_invoice_view
 from .views import create_org_einvoice_view
+from .views import invoice_bundle_run_view
 from .views import list_booking_series_view
 from .views import list_bookings_view
 from .views import list_bookings_webview
@@ -16,6 +18,7 @@ from .views import manager_cancel_booking_series_view
 from .views import manager_cancel_booking_view
 from .views import manager_confirm_booking_series_view
 from .views import manager_confirm_booking_view
+from .views import manager_export_invoice_bookings_view
 from .views import manager_filter_invoice_bookings_list_view
 from .views import manager_list_booking_series_view
 from .views import manager_list_bookings_view
@@ -51,6 +54,11 @@ urlpatterns = [
         manager_filter_invoice_bookings_list_view,
         name="manager-list-invoices",
     ),
+    path(
+        "manage-invoices/export/<str:export_format>/",
+        manager_export_invoice_bookings_view,
+        name="manager-export-invoices",
+    ),
     path(
         "manage-invoices/<slug:booking_slug>/create-draft-invoice/",
         create_draft_invoice_view,
@@ -71,6 +79,16 @@ urlpatterns = [
         create_org_einvoice_view,
         name="create-org-einvoice",
     ),
+    path(
+        "manage-invoices/all-orgs/",
+        create_all_org_invoices_view,
+        name="create-all-org-invoices",
+    ),
+    path(
+        "manage-invoices/all-orgs/<int:run_id>/",
+        invoice_bundle_run_view,
+        name="invoice-bundle-run",
+    ),
     path(
         "manage-booking-series/",
         manager_list_booking_series_view,
@@ -1,13 +1,20 @@
+import hashlib
+from datetime import timedelta
+
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
+from django.http import Http404
 from django.http import HttpRequest
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.shortcuts import redirect
 from django.shortcuts import render
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django.utils.translation import gettext_lazy as _
 from django.views.decorators.http import require_http_methods
 
@@ -15,18 +22,24 @@ from re_sharing.organizations.models import BookingPermission
 from re_sharing.organizations.models import Organization
 from re_sharing.organizations.services import user_has_bookingpermission
 from re_sharing.providers.decorators import manager_required
-from re_sharing.resources.models import Resource
+from re_sharing.resources.models import Location
+from re_sharing.utils.exports import EXPORT_CONTENT_TYPES
+from re_sharing.utils.exports import export_response
 from re_sharing.utils.models import BookingStatus
+from re_sharing.utils.pagination import get_keyset_page
 
 from .forms import BookingForm
 from .forms import MessageForm
 from .models import Booking
+from .services import BOOKINGS_WEBVIEW_CACHE
 from .services import bookings_webview
 from .services import cancel_booking
 from .services import create_booking_data
 from .services import create_bookingmessage
 from .services import filter_bookings_list
 from .services import generate_booking
+from .services import get_booking_export_rows
+from .services import get_bundleable_bookings
 from .services import get_organizations_with_bundleable_bookings
 from .services import manager_cancel_booking
 from .services import manager_confirm_booking
@@ -36,6 +49,7 @@ from .services import manager_filter_invoice_bookings_list
 from .services import save_booking
 from .services import set_initial_booking_data
 from .services import show_booking
+from .services import start_invoice_bundle_run
 from .services_booking_series import cancel_bookings_of_booking_series
 from .services_booking_series import create_booking_series_and_bookings
 from .services_booking_series import get_booking_series_list
@@ -335,33 +349,73 @@ def preview_and_save_booking_series_view(request):
     return redirect("bookings:create-booking")
 
 
+def _get_bookings_webview_timeout(bookings, now):
+    """Seconds until the next booking ends or the day changes, at most 15 minutes."""
+    end_of_day = timezone.localtime(now).replace(hour=23, minute=59, second=59)
+    expires_at = min(
+        [now + timedelta(minutes=15), end_of_day]
+        + [booking.timespan.upper for booking in bookings]
+    )
+    return max(int((expires_at - now).total_seconds()), 1)
+
+
 @require_http_methods(["GET"])
 def list_bookings_webview(request: HttpRequest) -> HttpResponse:
+    """
+    Show today's room bookings on the info screens.
+
+    The page is cached per location until a confirmed room booking of the location
+    changes, a listed booking ends or the day changes. Screens that send the ETag of
+    the cached page get a 304 without any rendering.
+    """
     from django.conf import settings
 
     from .services import get_external_events
 
+    # Only known locations get a cache scope, the parameter is unauthenticated
     location = request.GET.get("location") or "all"
-    bookings, location = bookings_webview(location)
-
-    # Fetch external events from ICS feed
-    external_events = []
-    if (
-        hasattr(settings, "EXTERNAL_EVENTS_ICS_URL")
-        and settings.EXTERNAL_EVENTS_ICS_URL
-    ):
-        external_events = get_external_events(settings.EXTERNAL_EVENTS_ICS_URL)
-
-    return render(
-        request,
-        "bookings/list-bookings-webview.html",
-        {
-            "bookings": bookings,
-            "date": timezone.now(),
-            "location": location,
-            "external_events": external_events,
-        },
+    if location != "all":
+        location = get_object_or_404(Location, slug=location)
+    cache_key = BOOKINGS_WEBVIEW_CACHE.key(
+        request.LANGUAGE_CODE, scope="all" if location == "all" else location.pk
     )
+    cached_page = cache.get(cache_key)
+    if cached_page is None:
+        bookings, location = bookings_webview(location)
+        bookings = list(bookings)
+
+        # Fetch external events from ICS feed
+        external_events = []
+        if (
+            hasattr(settings, "EXTERNAL_EVENTS_ICS_URL")
+            and settings.EXTERNAL_EVENTS_ICS_URL
+        ):
+            external_events = get_external_events(settings.EXTERNAL_EVENTS_ICS_URL)
+
+        now = timezone.now()
+        response = render(
+            request,
+            "bookings/list-bookings-webview.html",
+            {
+                "bookings": bookings,
+                "date": now,
+                "location": location,
+                "external_events": external_events,
+            },
+        )
+        etag = quote_etag(hashlib.md5(response.content).hexdigest())  # noqa: S324
+        cache.set(
+            cache_key,
+            (response.content, etag),
+            _get_bookings_webview_timeout(bookings, now),
+        )
+    else:
+        content, etag = cached_page
+        response = HttpResponse(content)
+
+    response = get_conditional_response(request, etag=etag) or response
+    response.headers["ETag"] = etag
+    return response
 
 
 @require_http_methods(["GET"])
@@ -390,9 +444,11 @@ def manager_list_bookings_view(request: HttpRequest) -> HttpResponse:
         until_date_string,
         request.user,
     )
+    bookings, next_cursor = get_keyset_page(bookings, request.GET.get("after"))
 
     context = {
         "bookings": bookings,
+        "next_cursor": next_cursor,
         "current_time": timezone.now(),
         "statuses": BookingStatus.choices,
         "resources": resources,
@@ -407,6 +463,13 @@ def manager_list_bookings_view(request: HttpRequest) -> HttpResponse:
         "show_recurring_bookings": show_recurring_bookings,
     }
 
+    if request.headers.get("HX-Request") and request.GET.get("after"):
+        return render(
+            request,
+            "bookings/manager_list_bookings.html#manager-booking-rows",
+            context,
+        )
+
     if request.headers.get("HX-Request"):
         return render(
             request,
@@ -496,6 +559,18 @@ def manager_confirm_booking_series_view(request, booking_series_uuid):
     )
 
 
+def _get_invoice_filters(request: HttpRequest) -> tuple:
+    """Return the arguments of manager_filter_invoice_bookings_list from the query."""
+    return (
+        request.GET.get("organization_search"),
+        request.GET.get("invoice_filter", "without_invoice"),
+        request.GET.get("invoice_number") or None,
+        request.GET.get("resource") or "all",
+        request.GET.get("invoice_address_filter", "all"),
+        request.GET.get("timespan_filter", "past"),
+    )
+
+
 @require_http_methods(["GET"])
 @staff_member_required
 def manager_filter_invoice_bookings_list_view(request: HttpRequest) -> HttpResponse:
@@ -503,20 +578,17 @@ def manager_filter_invoice_bookings_list_view(request: HttpRequest) -> HttpRespo
     Shows the bookings with an invoice for a resource manager so that they can be
     confirmed or cancelled
     """
-    invoice_filter = request.GET.get("invoice_filter", "without_invoice")
-    organization_search = request.GET.get("organization_search")
-    invoice_number = request.GET.get("invoice_number") or None
-    resource = request.GET.get("resource") or "all"
-    invoice_address_filter = request.GET.get("invoice_address_filter", "all")
-    timespan_filter = request.GET.get("timespan_filter", "past")
-    bookings, resources = manager_filter_invoice_bookings_list(
+    filters = _get_invoice_filters(request)
+    (
         organization_search,
         invoice_filter,
         invoice_number,
-        resource,
+        _resource,
         invoice_address_filter,
         timespan_filter,
-    )
+    ) = filters
+    bookings, resources = manager_filter_invoice_bookings_list(*filters)
+    bookings, next_cursor = get_keyset_page(bookings, request.GET.get("after"))
 
     orgs_with_bundleable = get_organizations_with_bundleable_bookings(
         organization_search
@@ -524,6 +596,7 @@ def manager_filter_invoice_bookings_list_view(request: HttpRequest) -> HttpRespo
 
     context = {
         "bookings": bookings,
+        "next_cursor": next_cursor,
         "organization_search": organization_search,
         "resources": resources,
         "invoice_number": invoice_number,
@@ -534,6 +607,13 @@ def manager_filter_invoice_bookings_list_view(request: HttpRequest) -> HttpRespo
         "orgs_with_bundleable": orgs_with_bundleable,
     }
 
+    if request.headers.get("HX-Request") and request.GET.get("after"):
+        return render(
+            request,
+            "bookings/manager_list_invoices.html#manager-invoice-rows",
+            context,
+        )
+
     if request.headers.get("HX-Request"):
         return render(
             request,
@@ -544,6 +624,21 @@ def manager_filter_invoice_bookings_list_view(request: HttpRequest) -> HttpRespo
     return render(request, "bookings/manager_list_invoices.html", context)
 
 
+@require_http_methods(["GET"])
+@staff_member_required
+def manager_export_invoice_bookings_view(
+    request: HttpRequest, export_format: str
+) -> HttpResponse:
+    """Streams the bookings of the invoice list with the same filters as CSV/XLSX."""
+    if export_format not in EXPORT_CONTENT_TYPES:
+        raise Http404
+    bookings, _resources = manager_filter_invoice_bookings_list(
+        *_get_invoice_filters(request)
+    )
+    header, rows = get_booking_export_rows(bookings)
+    return export_response(export_format, "invoice-bookings", header, rows)
+
+
 @require_http_methods(["POST"])
 @staff_member_required
 def create_draft_invoice_view(request: HttpRequest, booking_slug: str) -> HttpResponse:
@@ -601,17 +696,7 @@ def create_org_draft_invoice_view(
     organization = get_object_or_404(Organization, slug=organization_slug)
 
     # Check that there are bundleable uninvoiced bookings
-    bundleable_bookings = (
-        Booking.objects.filter(
-            organization=organization,
-            status=BookingStatus.CONFIRMED,
-            total_amount__gt=0,
-            invoice_number="",
-            timespan__endswith__lt=timezone.now(),
-        )
-        .exclude(resource__type=Resource.ResourceTypeChoices.LENDABLE_ITEM)
-        .exclude(invoice_address__contains={"single_invoice": True})
-    )
+    bundleable_bookings = get_bundleable_bookings().filter(organization=organization)
 
     if not bundleable_bookings.exists():
         return HttpResponse(
@@ -635,17 +720,7 @@ def create_org_einvoice_view(
 
     organization = get_object_or_404(Organization, slug=organization_slug)
 
-    bundleable_bookings = (
-        Booking.objects.filter(
-            organization=organization,
-            status=BookingStatus.CONFIRMED,
-            total_amount__gt=0,
-            invoice_number="",
-            timespan__endswith__lt=timezone.now(),
-        )
-        .exclude(resource__type=Resource.ResourceTypeChoices.LENDABLE_ITEM)
-        .exclude(invoice_address__contains={"single_invoice": True})
-    )
+    bundleable_bookings = get_bundleable_bookings().filter(organization=organization)
 
     if not bundleable_bookings.exists():
         return HttpResponse(
@@ -657,3 +732,38 @@ def create_org_einvoice_view(
     return HttpResponse(
         '<span class="badge text-bg-success">E-Invoice sent</span>',
     )
+
+
+@require_http_methods(["POST"])
+@staff_member_required
+def create_all_org_invoices_view(request: HttpRequest) -> HttpResponse:
+    """
+    Create bundled invoices for all organizations in the background.
+
+    Shows the progress of the active run instead if there is one.
+    """
+    from .tasks import create_all_org_invoices
+
+    run, started = start_invoice_bundle_run(
+        request.user, einvoice=request.POST.get("einvoice") == "true"
+    )
+    if started:
+        create_all_org_invoices.enqueue(run.id)
+        run.refresh_from_db()
+
+    return render(
+        request, "bookings/manager_list_invoices.html#invoice-bundle-run", {"run": run}
+    )
+
+
+@require_http_methods(["GET"])
+@staff_member_required
+def invoice_bundle_run_view(request: HttpRequest, run_id: int) -> HttpResponse:
+    """Show the progress of creating bundled invoices for all organizations."""
+    from .models import InvoiceBundleRun
+
+    run = get_object_or_404(InvoiceBundleRun, id=run_id)
+
+    return render(
+        request, "bookings/manager_list_invoices.html#invoice-bundle-run", {"run": run}
+    )
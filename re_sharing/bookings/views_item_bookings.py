@@ -47,7 +47,7 @@ def create_item_booking_view(request: HttpRequest) -> HttpResponse:
     show_login_notice = not user_organizations.exists()
 
     from re_sharing.resources.models import Resource
-    from re_sharing.resources.models import ResourceRestriction
+    from re_sharing.resources.services_restrictions import get_restriction_set
 
     is_manager = request.user.is_authenticated and request.user.is_manager()
     items = get_lendable_items()
@@ -58,15 +58,16 @@ def create_item_booking_view(request: HttpRequest) -> HttpResponse:
     pickup_days = get_pickup_days()
     return_days = get_return_days()
 
-    restrictions = ResourceRestriction.objects.filter(
-        resources__type=Resource.ResourceTypeChoices.LENDABLE_ITEM,
-        is_active=True,
-    ).distinct()
+    restrictions = get_restriction_set(
+        Resource.objects.filter(
+            type=Resource.ResourceTypeChoices.LENDABLE_ITEM
+        ).values_list("id", flat=True)
+    )
     restricted_ranges = [
         {
             "start_date": r.start_date.isoformat() if r.start_date else None,
             "end_date": r.end_date.isoformat() if r.end_date else None,
-            "days": [int(d.strip()) for d in r.days_of_week.split(",")],
+            "days": [day for day in range(7) if r.weekdays >> day & 1],
         }
         for r in restrictions
     ]
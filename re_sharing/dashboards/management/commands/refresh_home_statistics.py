@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from re_sharing.dashboards.services import refresh_home_statistics
+
+
+class Command(BaseCommand):
+    help = "Recompute the statistics shown on the home page, meant to run nightly"
+
+    def handle(self, *args, **kwargs):
+        statistics = refresh_home_statistics()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Home statistics computed through {statistics.computed_through}"
+            )
+        )
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.3 on 2026-10-17 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HomeStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Updated')),
+                ('computed_through', models.DateField(verbose_name='Computed through')),
+                ('confirmed_bookings', models.PositiveIntegerField(default=0, verbose_name='Confirmed bookings')),
+                ('total_hours_comp1', models.PositiveIntegerField(default=0, verbose_name='Free hours')),
+                ('registered_organizations', models.PositiveIntegerField(default=0, verbose_name='Registered organizations')),
+                ('free_bookings_value', models.PositiveIntegerField(default=0, verbose_name='Value of free bookings')),
+            ],
+            options={
+                'verbose_name': 'Home statistics',
+                'verbose_name_plural': 'Home statistics',
+            },
+        ),
+    ]
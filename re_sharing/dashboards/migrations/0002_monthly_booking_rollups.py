@@ -0,0 +1,48 @@
+# Generated by Django 6.0.3 on 2026-10-17 00:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboards', '0001_home_statistics'),
+        ('resources', '0020_resource_bookings_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyBookingRollupState',
+            fields=[
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Updated')),
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='monthlybookingrollupstate_of_resource', serialize=False, to='resources.resource', verbose_name='Resource')),
+                ('bookings_version', models.PositiveIntegerField(default=0, verbose_name='Bookings version')),
+            ],
+            options={
+                'verbose_name': 'Monthly booking rollup state',
+                'verbose_name_plural': 'Monthly booking rollup states',
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyBookingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Updated')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Year')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='Month')),
+                ('bookings_count', models.PositiveIntegerField(default=0, verbose_name='Bookings')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Amount')),
+                ('not_invoiced_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Not invoiced amount')),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthlybookingrollups_of_resource', related_query_name='monthlybookingrollup_of_resource', to='resources.resource', verbose_name='Resource')),
+            ],
+            options={
+                'verbose_name': 'Monthly booking rollup',
+                'verbose_name_plural': 'Monthly booking rollups',
+                'ordering': ['year', 'month'],
+                'constraints': [models.UniqueConstraint(fields=('resource', 'year', 'month'), name='unique_monthly_booking_rollup')],
+            },
+        ),
+    ]
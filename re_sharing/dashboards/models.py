@@ -0,0 +1,102 @@
+from django.db.models import CASCADE
+from django.db.models import DateField
+from django.db.models import DecimalField
+from django.db.models import ForeignKey
+from django.db.models import OneToOneField
+from django.db.models import PositiveIntegerField
+from django.db.models import PositiveSmallIntegerField
+from django.db.models import UniqueConstraint
+from django.utils.translation import gettext_lazy as _
+
+from re_sharing.resources.models import Resource
+from re_sharing.utils.models import TimeStampedModel
+
+
+class HomeStatistics(TimeStampedModel):
+    """
+    The statistics shown on the home page, stored in a single row.
+
+    The row is refreshed nightly by the refresh_home_statistics command, or by the
+    refresh_stored_home_statistics task once outdated, so the home page only has to
+    read it.
+    """
+
+    computed_through = DateField(_("Computed through"))
+    confirmed_bookings = PositiveIntegerField(_("Confirmed bookings"), default=0)
+    total_hours_comp1 = PositiveIntegerField(_("Free hours"), default=0)
+    registered_organizations = PositiveIntegerField(
+        _("Registered organizations"), default=0
+    )
+    free_bookings_value = PositiveIntegerField(_("Value of free bookings"), default=0)
+
+    class Meta:
+        verbose_name = _("Home statistics")
+        verbose_name_plural = _("Home statistics")
+
+    def __str__(self):
+        return f"{self.computed_through:%Y-%m-%d}"
+
+    def as_context(self):
+        return {
+            "confirmed_bookings": self.confirmed_bookings,
+            "total_hours_comp1": self.total_hours_comp1,
+            "registered_organizations": self.registered_organizations,
+            "free_bookings_value": self.free_bookings_value,
+        }
+
+
+class MonthlyBookingRollup(TimeStampedModel):
+    """The confirmed bookings of a resource in a month, summed up for reporting."""
+
+    resource = ForeignKey(
+        Resource,
+        verbose_name=_("Resource"),
+        on_delete=CASCADE,
+        related_name="monthlybookingrollups_of_resource",
+        related_query_name="monthlybookingrollup_of_resource",
+    )
+    year = PositiveSmallIntegerField(_("Year"))
+    month = PositiveSmallIntegerField(_("Month"))
+    bookings_count = PositiveIntegerField(_("Bookings"), default=0)
+    amount = DecimalField(_("Amount"), max_digits=12, decimal_places=2, default=0)
+    not_invoiced_amount = DecimalField(
+        _("Not invoiced amount"), max_digits=12, decimal_places=2, default=0
+    )
+
+    class Meta:
+        verbose_name = _("Monthly booking rollup")
+        verbose_name_plural = _("Monthly booking rollups")
+        ordering = ["year", "month"]
+        constraints = [
+            UniqueConstraint(
+                fields=["resource", "year", "month"],
+                name="unique_monthly_booking_rollup",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.resource_id} {self.month}/{self.year}"
+
+
+class MonthlyBookingRollupState(TimeStampedModel):
+    """
+    The bookings version of a resource its monthly rollups were computed at.
+
+    The rollups of a resource are outdated once its bookings_version moved on.
+    """
+
+    resource = OneToOneField(
+        Resource,
+        verbose_name=_("Resource"),
+        on_delete=CASCADE,
+        primary_key=True,
+        related_name="monthlybookingrollupstate_of_resource",
+    )
+    bookings_version = PositiveIntegerField(_("Bookings version"), default=0)
+
+    class Meta:
+        verbose_name = _("Monthly booking rollup state")
+        verbose_name_plural = _("Monthly booking rollup states")
+
+    def __str__(self):
+        return f"{self.resource_id} ({self.bookings_version})"
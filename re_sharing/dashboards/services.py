@@ -1,12 +1,34 @@
+from datetime import date
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import DurationField
+from django.db.models import ExpressionWrapper
+from django.db.models import F
+from django.db.models import FloatField
+from django.db.models import OuterRef
+from django.db.models import Q
 from django.db.models import QuerySet
+from django.db.models import Subquery
+from django.db.models import Sum
+from django.db.models.functions import Extract
 from django.utils import timezone
 
 from re_sharing.bookings.models import Booking
 from re_sharing.bookings.models import BookingGroup
+from re_sharing.dashboards.models import HomeStatistics
+from re_sharing.dashboards.models import MonthlyBookingRollup
+from re_sharing.dashboards.models import MonthlyBookingRollupState
 from re_sharing.organizations.models import BookingPermission
+from re_sharing.organizations.models import Organization
 from re_sharing.organizations.services import (
     organizations_with_confirmed_bookingpermission,
 )
+from re_sharing.resources.models import Compensation
+from re_sharing.resources.models import Resource
 from re_sharing.users.models import User
 from re_sharing.utils.models import BookingStatus
 
@@ -33,3 +55,237 @@ def get_users_bookings_and_permissions(
         .order_by("-created")[:5]
     )
     return bookings, booking_permissions, equipment_loans
+
+
+FREE_COMPENSATION_ID = 1
+REDUCED_COMPENSATION_IDS = (6, 14)
+HOME_STATISTICS_REFRESHING_KEY = "home_statistics:refreshing"
+
+
+def compute_home_statistics(until: date) -> dict:
+    """
+    Compute the home page statistics of the year of `until`, up to and including it.
+
+    The free hours and their value are summed in the database, valuing each hour at
+    the most expensive hourly rate of the booked resource.
+    """
+    hours = ExpressionWrapper(
+        Extract(
+            ExpressionWrapper(
+                F("timespan__endswith") - F("timespan__startswith"),
+                output_field=DurationField(),
+            ),
+            "epoch",
+            output_field=FloatField(),
+        )
+        / 3600.0,
+        output_field=FloatField(),
+    )
+    max_hourly_rate = Subquery(
+        Compensation.objects.filter(
+            resource=OuterRef("resource_id"), hourly_rate__isnull=False
+        )
+        .order_by("-hourly_rate")
+        .values("hourly_rate")[:1]
+    )
+    is_free = Q(compensation_id=FREE_COMPENSATION_ID)
+    not_parking = ~Q(resource__type=Resource.ResourceTypeChoices.PARKING_LOT)
+
+    totals = Booking.objects.filter(
+        status=BookingStatus.CONFIRMED,
+        start_date__gte=date(until.year, 1, 1),
+        start_date__lte=until,
+    ).aggregate(
+        confirmed_bookings=Count("id", filter=not_parking),
+        total_hours=Sum(hours, filter=is_free),
+        free_bookings_value=Sum(
+            ExpressionWrapper(hours * max_hourly_rate, output_field=FloatField()),
+            filter=is_free,
+        ),
+        reduced_bookings_amount=Sum(
+            "total_amount",
+            filter=Q(compensation_id__in=REDUCED_COMPENSATION_IDS) & not_parking,
+        ),
+    )
+
+    free_total = (totals["free_bookings_value"] or 0) + int(
+        totals["reduced_bookings_amount"] or 0
+    )
+    return {
+        "confirmed_bookings": totals["confirmed_bookings"],
+        "total_hours_comp1": round(totals["total_hours"] or 0),
+        "registered_organizations": Organization.objects.filter(
+            status=Organization.Status.CONFIRMED
+        ).count(),
+        "free_bookings_value": round(free_total),
+    }
+
+
+def refresh_home_statistics() -> HomeStatistics:
+    """Recompute the home page statistics up to yesterday and store them."""
+    yesterday = timezone.localdate() - timedelta(days=1)
+    statistics, _ = HomeStatistics.objects.update_or_create(
+        pk=1,
+        defaults={"computed_through": yesterday, **compute_home_statistics(yesterday)},
+    )
+    return statistics
+
+
+def get_home_statistics() -> HomeStatistics:
+    """
+    Return the stored home page statistics.
+
+    They are never computed on the request path: if the scheduled refresh has not
+    run since yesterday, the stored statistics are served and a refresh is enqueued.
+    Until the first refresh, the statistics are empty.
+    """
+    from re_sharing.dashboards.tasks import refresh_stored_home_statistics
+
+    statistics = HomeStatistics.objects.filter(pk=1).first()
+    yesterday = timezone.localdate() - timedelta(days=1)
+    if (statistics is None or statistics.computed_through < yesterday) and cache.add(
+        HOME_STATISTICS_REFRESHING_KEY, value=True, timeout=60 * 5
+    ):
+        refresh_stored_home_statistics.enqueue()
+    return statistics or HomeStatistics()
+
+
+def refresh_monthly_booking_rollups(resources) -> None:
+    """
+    Recompute the monthly rollups of the confirmed bookings of the given resources.
+
+    The resources need their bookings_version, it is read before the bookings are
+    summed up, so a booking changed in between leaves the rollups outdated rather
+    than marking outdated rollups as current. The rollups are upserted rather than
+    replaced, so concurrent refreshes of the same resources do not conflict.
+    """
+    versions = {resource.id: resource.bookings_version for resource in resources}
+    if not versions:
+        return
+
+    totals = (
+        Booking.objects.filter(resource_id__in=versions, status=BookingStatus.CONFIRMED)
+        .values("resource_id", "start_date__year", "start_date__month")
+        .annotate(
+            bookings_count=Count("id"),
+            amount=Sum("total_amount"),
+            not_invoiced_amount=Sum("total_amount", filter=Q(invoice_number="")),
+        )
+        .order_by()
+    )
+    rollups = [
+        MonthlyBookingRollup(
+            resource_id=row["resource_id"],
+            year=row["start_date__year"],
+            month=row["start_date__month"],
+            bookings_count=row["bookings_count"],
+            amount=row["amount"] or 0,
+            not_invoiced_amount=row["not_invoiced_amount"] or 0,
+        )
+        for row in totals
+    ]
+
+    with transaction.atomic():
+        rollups = MonthlyBookingRollup.objects.bulk_create(
+            rollups,
+            update_conflicts=True,
+            unique_fields=["resource", "year", "month"],
+            update_fields=[
+                "bookings_count",
+                "amount",
+                "not_invoiced_amount",
+                "updated",
+            ],
+        )
+        # Months without confirmed bookings anymore
+        MonthlyBookingRollup.objects.filter(resource_id__in=versions).exclude(
+            pk__in=[rollup.pk for rollup in rollups]
+        ).delete()
+        MonthlyBookingRollupState.objects.bulk_create(
+            [
+                MonthlyBookingRollupState(
+                    resource_id=resource_id, bookings_version=version
+                )
+                for resource_id, version in versions.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["resource"],
+            update_fields=["bookings_version", "updated"],
+        )
+
+
+def get_monthly_booking_report(resources, year: int) -> dict:
+    """
+    Return the confirmed bookings of the resources per month of a year.
+
+    The resources have to be annotated with the bookings_version of their rollups
+    as rollup_version, outdated rollups are refreshed first. Returns the
+    per-resource matrix (in the order of the resources, twelve months each), the
+    monthly totals and the yearly totals.
+    """
+    resources = list(resources)
+    outdated = [
+        resource
+        for resource in resources
+        if resource.rollup_version != resource.bookings_version
+    ]
+    refresh_monthly_booking_rollups(outdated)
+
+    months = range(1, 13)
+    rollups = {
+        (rollup.resource_id, rollup.month): rollup
+        for rollup in MonthlyBookingRollup.objects.filter(
+            resource__in=[resource.id for resource in resources], year=year
+        )
+    }
+
+    bookings_by_resource = []
+    monthly_totals = {
+        month: {"bookings_count": 0, "amount": None, "not_invoiced_amount": None}
+        for month in months
+    }
+    for resource in resources:
+        for month in months:
+            rollup = rollups.get((resource.id, month))
+            if rollup is None:
+                bookings_by_resource.append(
+                    {
+                        "resource__name": resource.name,
+                        "start_date__month": month,
+                        "bookings_count": "",
+                        "amount": "",
+                        "not_invoiced_amount": "",
+                    }
+                )
+                continue
+
+            bookings_by_resource.append(
+                {
+                    "resource__name": resource.name,
+                    "start_date__month": month,
+                    "bookings_count": rollup.bookings_count,
+                    "amount": rollup.amount or "",
+                    "not_invoiced_amount": rollup.not_invoiced_amount or "",
+                }
+            )
+            total = monthly_totals[month]
+            total["bookings_count"] += rollup.bookings_count
+            total["amount"] = (total["amount"] or Decimal(0)) + rollup.amount
+            if rollup.not_invoiced_amount:
+                total["not_invoiced_amount"] = (
+                    total["not_invoiced_amount"] or Decimal(0)
+                ) + rollup.not_invoiced_amount
+
+    return {
+        "bookings_by_resource": bookings_by_resource,
+        "monthly_totals": [
+            {"start_date__month": month, **totals}
+            for month, totals in monthly_totals.items()
+        ],
+        "yearly_totals": {
+            "bookings_count": sum(rollup.bookings_count for rollup in rollups.values()),
+            "amount": sum(rollup.amount for rollup in rollups.values())
+            if rollups
+            else None,
+        },
+    }
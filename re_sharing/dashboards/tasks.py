@@ -0,0 +1,10 @@
+from django.tasks import task
+
+
+@task(queue_name="default")
+def refresh_stored_home_statistics() -> dict:
+    """Recompute the home page statistics and store them."""
+    from re_sharing.dashboards.services import refresh_home_statistics
+
+    statistics = refresh_home_statistics()
+    return {"computed_through": statistics.computed_through.isoformat()}
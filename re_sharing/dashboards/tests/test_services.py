@@ -1,14 +1,25 @@
+from datetime import date
+from datetime import datetime
 from datetime import timedelta
 
 import pytest
 from django.utils import timezone
+from psycopg.types.range import Range
 
 from re_sharing.bookings.tests.factories import BookingFactory
+from re_sharing.dashboards.models import MonthlyBookingRollup
+from re_sharing.dashboards.models import MonthlyBookingRollupState
+from re_sharing.dashboards.services import compute_home_statistics
 from re_sharing.dashboards.services import get_users_bookings_and_permissions
+from re_sharing.dashboards.services import refresh_monthly_booking_rollups
 from re_sharing.organizations.tests.factories import BookingPermissionFactory
 from re_sharing.organizations.tests.factories import OrganizationFactory
+from re_sharing.resources.models import Resource
+from re_sharing.resources.tests.factories import CompensationFactory
+from re_sharing.resources.tests.factories import ResourceFactory
 from re_sharing.users.models import User
 from re_sharing.users.tests.factories import UserFactory
+from re_sharing.utils.models import BookingStatus
 
 
 @pytest.mark.django_db()  # Mark for db access
@@ -64,3 +75,80 @@ def test_get_users_bookings_and_permissions(
     assert {booking.title for booking in bookings} == set(expected_bookings)
     # equipment_loans should be empty as we didn't create any
     assert list(equipment_loans) == []
+
+
+@pytest.mark.django_db()
+def test_compute_home_statistics():
+    room = ResourceFactory(type=Resource.ResourceTypeChoices.ROOM)
+    parking_lot = ResourceFactory(type=Resource.ResourceTypeChoices.PARKING_LOT)
+    free = CompensationFactory(id=1, hourly_rate=None)
+    reduced = CompensationFactory(id=6, hourly_rate=10)
+    CompensationFactory(resource=[room], hourly_rate=40)
+    CompensationFactory(resource=[room], hourly_rate=80)
+    CompensationFactory(resource=[parking_lot], hourly_rate=5)
+
+    def booking(resource, day, hours, compensation, **kwargs):
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        return BookingFactory(
+            resource=resource,
+            status=kwargs.pop("status", BookingStatus.CONFIRMED),
+            start_date=day,
+            compensation=compensation,
+            timespan=Range(start, start + timedelta(hours=hours)),
+            **kwargs,
+        )
+
+    booking(room, date(2025, 3, 3), 2, free)
+    booking(parking_lot, date(2025, 3, 4), 3, free)
+    booking(room, date(2025, 3, 5), 1, reduced, total_amount=25)
+    # Not counted: cancelled, previous year and after the given day
+    booking(room, date(2025, 3, 6), 4, free, status=BookingStatus.CANCELLED)
+    booking(room, date(2024, 3, 3), 4, free)
+    booking(room, date(2025, 3, 11), 4, free)
+    OrganizationFactory(status=2)
+
+    statistics = compute_home_statistics(date(2025, 3, 10))
+
+    assert statistics == {
+        "confirmed_bookings": 2,
+        "total_hours_comp1": 5,
+        "registered_organizations": 1,
+        # 2h * 80 (room) + 3h * 5 (parking lot) + 25 (reduced)
+        "free_bookings_value": 200,
+    }
+
+
+@pytest.mark.django_db()
+def test_refresh_monthly_booking_rollups_updates_existing_rollups():
+    resource = ResourceFactory()
+
+    def booking(day, amount):
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        return BookingFactory(
+            resource=resource,
+            status=BookingStatus.CONFIRMED,
+            start_date=day,
+            total_amount=amount,
+            timespan=Range(start, start + timedelta(hours=1)),
+        )
+
+    booking(date(2025, 3, 3), 10)
+    april_booking = booking(date(2025, 4, 3), 20)
+    refresh_monthly_booking_rollups([resource])
+    # Rollups written in between, e.g. by a concurrent refresh, are updated
+    booking(date(2025, 3, 4), 5)
+    april_booking.status = BookingStatus.CANCELLED
+    april_booking.save()
+    resource.refresh_from_db()
+
+    refresh_monthly_booking_rollups([resource])
+
+    assert list(
+        MonthlyBookingRollup.objects.filter(resource=resource).values_list(
+            "year", "month", "bookings_count", "amount"
+        )
+    ) == [(2025, 3, 2, 15)]
+    assert (
+        MonthlyBookingRollupState.objects.get(resource=resource).bookings_version
+        == resource.bookings_version
+    )
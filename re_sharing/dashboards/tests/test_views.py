@@ -1,6 +1,7 @@
 from datetime import datetime
 from datetime import timedelta
 from http import HTTPStatus
+from unittest.mock import patch
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
@@ -13,6 +14,8 @@ from django.urls import reverse
 from django.utils import timezone
 
 from re_sharing.bookings.tests.factories import BookingFactory
+from re_sharing.dashboards.models import HomeStatistics
+from re_sharing.dashboards.services import refresh_home_statistics
 from re_sharing.dashboards.views import users_bookings_and_permissions_dashboard_view
 from re_sharing.organizations.tests.factories import OrganizationFactory
 from re_sharing.resources.models import Resource
@@ -20,6 +23,7 @@ from re_sharing.resources.tests.factories import CompensationFactory
 from re_sharing.resources.tests.factories import ResourceFactory
 from re_sharing.users.tests.factories import UserFactory
 from re_sharing.utils.models import BookingStatus
+from re_sharing.utils.tests.test_exports import read_xlsx_rows
 
 
 class TestListBookingsView(TestCase):
@@ -83,6 +87,7 @@ class TestHomeView(TestCase):
         expected_org_count = 3
         OrganizationFactory.create_batch(expected_org_count, status=confirmed_status)
 
+        refresh_home_statistics()
         response = self.client.get(reverse("home"))
 
         assert response.status_code == HTTPStatus.OK
@@ -91,46 +96,61 @@ class TestHomeView(TestCase):
         assert response.context["total_hours_comp1"] >= 0
         assert response.context["free_bookings_value"] >= 0
 
-    def test_home_view_uses_cache(self):
-        """Test that home view uses caching"""
-        # First request - should calculate and cache
+    def test_home_view_uses_stored_statistics(self):
+        """Test that home view reads the stored statistics until they are refreshed"""
+        refresh_home_statistics()
         response1 = self.client.get(reverse("home"))
-        stats1 = {
-            "confirmed_bookings": response1.context["confirmed_bookings"],
-            "total_hours_comp1": response1.context["total_hours_comp1"],
-            "registered_organizations": response1.context["registered_organizations"],
-            "free_bookings_value": response1.context["free_bookings_value"],
-        }
+        registered_organizations = response1.context["registered_organizations"]
 
         # Create new data that would change stats
         OrganizationFactory(status=2)  # CONFIRMED status
 
-        # Second request - should use cached data
-        response2 = self.client.get(reverse("home"))
-        stats2 = {
-            "confirmed_bookings": response2.context["confirmed_bookings"],
-            "total_hours_comp1": response2.context["total_hours_comp1"],
-            "registered_organizations": response2.context["registered_organizations"],
-            "free_bookings_value": response2.context["free_bookings_value"],
-        }
+        # Second request - a single read of the stored row
+        with self.assertNumQueries(3):
+            response2 = self.client.get(reverse("home"))
+        assert response2.context["registered_organizations"] == (
+            registered_organizations
+        )
 
-        # Stats should be the same (cached)
-        assert stats1 == stats2
+        # The scheduled refresh picks up the new organization
+        refresh_home_statistics()
+        response3 = self.client.get(reverse("home"))
+        assert response3.context["registered_organizations"] == (
+            registered_organizations + 1
+        )
 
-        # Clear cache
-        cache.clear()
+    @patch("re_sharing.dashboards.tasks.refresh_stored_home_statistics")
+    def test_home_view_serves_outdated_statistics_while_refreshing(self, mock_task):
+        """Test that outdated statistics are served while they are refreshed"""
+        statistics = refresh_home_statistics()
+        HomeStatistics.objects.filter(pk=statistics.pk).update(
+            computed_through=statistics.computed_through - timedelta(days=1),
+            registered_organizations=42,
+        )
 
-        # Third request - should recalculate
-        response3 = self.client.get(reverse("home"))
-        stats3 = {
-            "confirmed_bookings": response3.context["confirmed_bookings"],
-            "total_hours_comp1": response3.context["total_hours_comp1"],
-            "registered_organizations": response3.context["registered_organizations"],
-            "free_bookings_value": response3.context["free_bookings_value"],
-        }
+        response = self.client.get(reverse("home"))
+        self.client.get(reverse("home"))
+
+        assert response.context["registered_organizations"] == 42  # noqa: PLR2004
+        mock_task.enqueue.assert_called_once_with()
+
+    @patch("re_sharing.dashboards.tasks.refresh_stored_home_statistics")
+    def test_home_view_does_not_compute_missing_statistics(self, mock_task):
+        """Test that missing statistics are computed in the background"""
+        OrganizationFactory(status=2)  # CONFIRMED status
+
+        response = self.client.get(reverse("home"))
+
+        assert response.context["registered_organizations"] == 0
+        assert not HomeStatistics.objects.exists()
+        mock_task.enqueue.assert_called_once_with()
 
-        # Stats should now reflect the new organization
-        assert stats3["registered_organizations"] > stats1["registered_organizations"]
+    def test_refresh_task_stores_statistics(self):
+        """Test that the enqueued refresh stores the statistics"""
+        self.client.get(reverse("home"))
+
+        statistics = HomeStatistics.objects.get()
+        assert statistics.computed_through == timezone.localdate() - timedelta(days=1)
 
     def test_home_view_excludes_parking_lots(self):
         """Test that parking lots are excluded from confirmed bookings count"""
@@ -156,7 +176,7 @@ class TestHomeView(TestCase):
             start_date=yesterday,
         )
 
-        cache.clear()
+        refresh_home_statistics()
         response = self.client.get(reverse("home"))
 
         # Should only count non-parking booking
@@ -186,12 +206,13 @@ class TestHomeView(TestCase):
             timespan=Range(start_dt, end_dt),
         )
 
-        cache.clear()
+        refresh_home_statistics()
         response = self.client.get(reverse("home"))
 
         # Free bookings value should be calculated
         # 2 hours * 100 (most expensive rate) = 200
-        assert response.context["free_bookings_value"] >= 0
+        assert response.context["total_hours_comp1"] == 2  # noqa: PLR2004
+        assert response.context["free_bookings_value"] == 200  # noqa: PLR2004
 
 
 class TestReportingView(TestCase):
@@ -346,3 +367,100 @@ class TestReportingView(TestCase):
 
         # Total should be greater than or equal to realized
         assert yearly["bookings_count"] >= realized["bookings_count"]
+
+    def test_reporting_view_matrix_from_rollups(self):
+        """Test that the matrix is read from the rollups and kept current"""
+        resource1 = ResourceFactory(type=Resource.ResourceTypeChoices.ROOM)
+        resource2 = ResourceFactory(type=Resource.ResourceTypeChoices.ROOM)
+        booking = BookingFactory(
+            resource=resource1,
+            status=BookingStatus.CONFIRMED,
+            start_date=datetime(2025, 3, 15).date(),  # noqa: DTZ001
+            total_amount=100,
+        )
+        BookingFactory(
+            resource=resource2,
+            status=BookingStatus.CONFIRMED,
+            start_date=datetime(2025, 4, 15).date(),  # noqa: DTZ001
+            total_amount=50,
+            invoice_number="INV-001",
+        )
+        url = reverse("dashboards:reports") + "?year=2025"
+        self.client.force_login(self.staff_user)
+
+        response = self.client.get(url)
+
+        matrix = {
+            (row["resource__name"], row["start_date__month"]): row
+            for row in response.context["bookings_by_resource"]
+        }
+        assert len(matrix) == 24  # noqa: PLR2004
+        assert matrix[(resource1.name, 3)]["bookings_count"] == 1
+        assert matrix[(resource1.name, 3)]["not_invoiced_amount"] == 100  # noqa: PLR2004
+        assert matrix[(resource2.name, 4)]["amount"] == 50  # noqa: PLR2004
+        assert matrix[(resource2.name, 4)]["not_invoiced_amount"] == ""
+        assert matrix[(resource1.name, 4)]["bookings_count"] == ""
+        assert response.context["yearly_totals"] == {
+            "bookings_count": 2,
+            "amount": 150,
+        }
+        monthly_totals = response.context["monthly_totals"]
+        assert [total["bookings_count"] for total in monthly_totals][2:4] == [1, 1]
+
+        # Current rollups are only read
+        with self.assertNumQueries(10):
+            self.client.get(url)
+
+        booking.status = BookingStatus.CANCELLED
+        booking.save()
+        response = self.client.get(url)
+        assert response.context["yearly_totals"]["bookings_count"] == 1
+
+    def test_reporting_view_queries_independent_of_resources(self):
+        """Test that more resources do not add queries"""
+        BookingFactory(
+            resource=ResourceFactory(type=Resource.ResourceTypeChoices.ROOM),
+            status=BookingStatus.CONFIRMED,
+            start_date=datetime(2025, 3, 15).date(),  # noqa: DTZ001
+        )
+        url = reverse("dashboards:reports") + "?year=2025"
+        self.client.force_login(self.staff_user)
+        self.client.get(url)
+
+        with self.assertNumQueries(10):
+            self.client.get(url)
+
+        ResourceFactory.create_batch(3, type=Resource.ResourceTypeChoices.ROOM)
+        self.client.get(url)
+        with self.assertNumQueries(10):
+            self.client.get(url)
+
+    def test_reporting_export_xlsx(self):
+        """Test that the export streams the bookings of the selected year and types"""
+        room = ResourceFactory(type=Resource.ResourceTypeChoices.ROOM)
+        parking_lot = ResourceFactory(type=Resource.ResourceTypeChoices.PARKING_LOT)
+        booking = BookingFactory(
+            resource=room,
+            status=BookingStatus.CONFIRMED,
+            start_date=datetime(2025, 3, 15).date(),  # noqa: DTZ001
+            total_amount=100,
+        )
+        BookingFactory(
+            resource=parking_lot,
+            status=BookingStatus.CONFIRMED,
+            start_date=datetime(2025, 3, 15).date(),  # noqa: DTZ001
+        )
+        self.client.force_login(self.staff_user)
+
+        response = self.client.get(
+            reverse("dashboards:reports-export", args=["xlsx"]) + "?year=2025"
+        )
+
+        assert response.status_code == HTTPStatus.OK
+        assert response["Content-Disposition"] == (
+            'attachment; filename="report-2025.xlsx"'
+        )
+        rows = read_xlsx_rows(b"".join(response.streaming_content))
+        assert len(rows) == 2  # noqa: PLR2004
+        assert rows[1][3] == room.name
+        assert rows[1][-1] == booking.slug
@@ -1,5 +1,6 @@
 from django.urls import path
 
+from re_sharing.dashboards.views import reporting_export_view
 from re_sharing.dashboards.views import reporting_view
 from re_sharing.dashboards.views import users_bookings_and_permissions_dashboard_view
 
@@ -11,4 +12,9 @@ urlpatterns = [
         name="users_bookings_and_permissions",
     ),
     path("reports/", reporting_view, name="reports"),
+    path(
+        "reports/export/<str:export_format>/",
+        reporting_export_view,
+        name="reports-export",
+    ),
 ]
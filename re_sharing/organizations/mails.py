@@ -494,15 +494,18 @@ def send_monthly_overview_email(
     """Send monthly bookings overview email to a single organization."""
     from re_sharing.bookings.models import Booking
     from re_sharing.organizations.models import Organization
+    from re_sharing.resources.services import get_access_codes
 
     organization = Organization.objects.get(id=organization_id)
     bookings = list(
-        Booking.objects.filter(id__in=booking_ids).select_related("resource")
+        Booking.objects.filter(id__in=booking_ids).select_related(
+            "resource", "resource__access", "resource__access__parent_access"
+        )
     )
 
     # Add access codes to bookings
-    for booking in bookings:
-        booking.access_code = booking.get_access_code()
+    for booking, access_code in zip(bookings, get_access_codes(bookings), strict=True):
+        booking.access_code = access_code
 
     domain = Site.objects.get_current().domain
     next_month = timezone.datetime.fromisoformat(next_month_iso)
@@ -8,6 +8,7 @@ from .models import PermanentCode
 from .models import Resource
 from .models import ResourceImage
 from .models import ResourceRestriction
+from .models import SmartlockAuth
 
 
 class CompensationInline(admin.TabularInline):
@@ -90,6 +91,31 @@ class PermanentCodeAdmin(ImportExportMixin, admin.ModelAdmin):
     ordering = ["id"]
 
 
+@admin.register(SmartlockAuth)
+class SmartlockAuthAdmin(admin.ModelAdmin):
+    list_display = [
+        "smartlock_id",
+        "code",
+        "name",
+        "allowed_from",
+        "allowed_until",
+        "last_seen",
+    ]
+    search_fields = ["smartlock_id", "code", "name"]
+    list_filter = ["smartlock_id"]
+    ordering = ["smartlock_id", "code"]
+
+    # The codes are mirrored from NUKI by the smartlock sync
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Access)
 class AccessAdmin(ImportExportMixin, admin.ModelAdmin):
     list_display = ["id", "name", "slug"]
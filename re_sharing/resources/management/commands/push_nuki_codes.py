@@ -5,7 +5,10 @@ from re_sharing.resources.services_nuki import sync_all_smartlock_codes
 
 
 class Command(BaseCommand):
-    help = "Enqueue NUKI smartlock code sync task for all smartlocks (today's bookings)"
+    help = (
+        "Enqueue NUKI smartlock code sync task for all smartlocks (bookings of the "
+        "next NUKI_PROVISIONING_DAYS days). Run it off-peak, e.g. at night."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
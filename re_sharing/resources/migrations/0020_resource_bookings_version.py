@@ -0,0 +1,23 @@
+# Generated by Django 6.0.3 on 2026-10-16 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0019_remove_accesscode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='bookings_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Bookings changed at'),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='bookings_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Bookings version'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.3 on 2026-10-17 00:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0020_resource_bookings_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SmartlockSyncRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Updated')),
+                ('smartlock_id', models.CharField(max_length=255, unique=True, verbose_name='Smartlock ID')),
+            ],
+            options={
+                'verbose_name': 'Smartlock sync request',
+                'verbose_name_plural': 'Smartlock sync requests',
+                'ordering': ['created'],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.3 on 2026-10-17 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0021_smartlock_sync_request'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SmartlockMirror',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Updated')),
+                ('smartlock_id', models.CharField(max_length=255, unique=True, verbose_name='Smartlock ID')),
+                ('reconciled_at', models.DateTimeField(verbose_name='Reconciled at')),
+            ],
+            options={
+                'verbose_name': 'Smartlock mirror',
+                'verbose_name_plural': 'Smartlock mirrors',
+                'ordering': ['smartlock_id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SmartlockAuth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Updated')),
+                ('smartlock_id', models.CharField(max_length=255, verbose_name='Smartlock ID')),
+                ('auth_id', models.CharField(blank=True, max_length=255, verbose_name='Auth ID')),
+                ('code', models.PositiveIntegerField(verbose_name='Code')),
+                ('name', models.CharField(blank=True, max_length=256, verbose_name='Name')),
+                ('allowed_from', models.DateTimeField(blank=True, null=True, verbose_name='Allowed from')),
+                ('allowed_until', models.DateTimeField(blank=True, null=True, verbose_name='Allowed until')),
+                ('last_seen', models.DateTimeField(blank=True, null=True, verbose_name='Last seen')),
+            ],
+            options={
+                'verbose_name': 'Smartlock code',
+                'verbose_name_plural': 'Smartlock codes',
+                'ordering': ['smartlock_id', 'code'],
+                'constraints': [models.UniqueConstraint(fields=('smartlock_id', 'code'), name='unique_smartlock_auth_code'), models.UniqueConstraint(condition=models.Q(('auth_id', ''), _negated=True), fields=('smartlock_id', 'auth_id'), name='unique_smartlock_auth_id')],
+            },
+        ),
+    ]
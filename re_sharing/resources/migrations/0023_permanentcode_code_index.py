@@ -0,0 +1,18 @@
+# Generated by Django 6.0.3 on 2026-10-17 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0024_alter_organization_status'),
+        ('resources', '0022_smartlock_mirror'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='permanentcode',
+            index=models.Index(fields=['code'], name='resources_p_code_c86def_idx'),
+        ),
+    ]
@@ -13,6 +13,7 @@ from django.db.models import DateTimeField
 from django.db.models import DecimalField
 from django.db.models import ForeignKey
 from django.db.models import ImageField
+from django.db.models import Index
 from django.db.models import IntegerField
 from django.db.models import ManyToManyField
 from django.db.models import Model
@@ -21,6 +22,7 @@ from django.db.models import Q
 from django.db.models import TextChoices
 from django.db.models import TextField
 from django.db.models import TimeField
+from django.db.models import UniqueConstraint
 from django.db.models import UUIDField
 from django.db.models.functions import Lower
 from django.urls import reverse
@@ -99,11 +101,90 @@ class PermanentCode(TimeStampedModel):
         verbose_name = _("Permanent code")
         verbose_name_plural = _("Permanent codes")
         ordering = ["validity_start"]
+        indexes = [
+            # lookup of the codes in use on a smartlock
+            Index(fields=["code"]),
+        ]
 
     def __str__(self):
         return str(self.id) + " " + self.validity_start.strftime("%Y-%m-%d %H:%M")
 
 
+class SmartlockSyncRequest(TimeStampedModel):
+    """
+    A pending sync of the keypad codes of a smartlock.
+
+    Changes only add a request per smartlock; the sync_requested_smartlock_codes
+    task picks up all requests after a short delay, so a burst of changes leads to
+    a single sync of the affected smartlocks.
+    """
+
+    smartlock_id = CharField(_("Smartlock ID"), max_length=255, unique=True)
+
+    class Meta:
+        verbose_name = _("Smartlock sync request")
+        verbose_name_plural = _("Smartlock sync requests")
+        ordering = ["created"]
+
+    def __str__(self):
+        return self.smartlock_id
+
+
+class SmartlockMirror(TimeStampedModel):
+    """
+    The time the keypad codes of a smartlock were last fetched from NUKI.
+
+    Syncs compare against the mirrored SmartlockAuth entries of a smartlock as long
+    as they were reconciled recently; otherwise the codes are fetched again.
+    """
+
+    smartlock_id = CharField(_("Smartlock ID"), max_length=255, unique=True)
+    reconciled_at = DateTimeField(_("Reconciled at"))
+
+    class Meta:
+        verbose_name = _("Smartlock mirror")
+        verbose_name_plural = _("Smartlock mirrors")
+        ordering = ["smartlock_id"]
+
+    def __str__(self):
+        return self.smartlock_id
+
+
+class SmartlockAuth(TimeStampedModel):
+    """
+    A keypad code on a smartlock, as mirrored from NUKI.
+
+    Codes pushed by a sync are mirrored right away but only get their auth ID once
+    they are seen when fetching the codes of the smartlock.
+    """
+
+    smartlock_id = CharField(_("Smartlock ID"), max_length=255)
+    auth_id = CharField(_("Auth ID"), max_length=255, blank=True)
+    code = PositiveIntegerField(_("Code"))
+    name = CharField(_("Name"), max_length=256, blank=True)
+    allowed_from = DateTimeField(_("Allowed from"), null=True, blank=True)
+    allowed_until = DateTimeField(_("Allowed until"), null=True, blank=True)
+    last_seen = DateTimeField(_("Last seen"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Smartlock code")
+        verbose_name_plural = _("Smartlock codes")
+        ordering = ["smartlock_id", "code"]
+        constraints = [
+            UniqueConstraint(
+                fields=["smartlock_id", "code"], name="unique_smartlock_auth_code"
+            ),
+            UniqueConstraint(
+                fields=["smartlock_id", "auth_id"],
+                condition=~Q(auth_id=""),
+                name="unique_smartlock_auth_id",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.smartlock_id}: {self.code}"
+
+
 class Resource(Model):
     class ResourceTypeChoices(TextChoices):
         ROOM = "room", _("Room")
@@ -150,6 +231,13 @@ class Resource(Model):
         blank=True,
         help_text=_("Number of items in stock. Only applicable for lendable items."),
     )
+    # Incremented whenever a confirmed booking of the resource changes
+    bookings_version = PositiveIntegerField(
+        _("Bookings version"), default=0, editable=False
+    )
+    bookings_changed_at = DateTimeField(
+        _("Bookings changed at"), null=True, blank=True, editable=False
+    )
 
     class Meta:
         verbose_name = _("Resource")
@@ -309,25 +397,9 @@ class ResourceRestriction(TimeStampedModel):
         """
         Check if this restriction applies to the given datetime.
         """
-        # Check if the date is within the date range
-        date = dt.date()
-        if self.start_date and date < self.start_date:
-            return False
-        if self.end_date and date > self.end_date:
-            return False
-
-        # Check if the day of week is in the restriction's days of week
-        weekday = dt.weekday()
-        days = [int(d.strip()) for d in self.days_of_week.split(",")]
-        if weekday not in days:
-            return False
-
-        # Check if the time is between start_time and end_time
-        time = dt.time()
-        if not (self.start_time <= time < self.end_time):
-            return False
+        from re_sharing.resources.services_restrictions import CompiledRestriction
 
-        return True
+        return CompiledRestriction(self).matches(dt)
 
 
 class Compensation(TimeStampedModel):
@@ -1,10 +1,17 @@
+import heapq
+from collections import defaultdict
 from datetime import datetime
 from datetime import time
 from datetime import timedelta
+from math import ceil
 
 from dateutil import parser
 from dateutil.relativedelta import relativedelta
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import Max
 from django.db.models import Q
+from django.db.models import Sum
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
@@ -13,6 +20,8 @@ from re_sharing.resources.models import Compensation
 from re_sharing.resources.models import Location
 from re_sharing.resources.models import Resource
 from re_sharing.resources.models import ResourceRestriction
+from re_sharing.resources.services_restrictions import get_restricted_resource_ids
+from re_sharing.resources.services_restrictions import get_restriction_sets
 from re_sharing.utils.models import BookingStatus
 
 
@@ -149,6 +158,16 @@ def filter_resources(  # noqa: PLR0913
         ).select_related("resource", "organization")
         booked_resource_ids = overlapping_bookings.values_list("resource_id", flat=True)
         resources = resources.exclude(id__in=booked_resource_ids)
+        # Exclude resources with restrictions the user is not exempt from
+        resources = resources.exclude(
+            id__in=get_restricted_resource_ids(
+                start_datetime,
+                end_datetime,
+                user.get_organizations_of_user().values("id")
+                if user.is_authenticated
+                else None,
+            )
+        )
 
     # Prefetch related data to optimize performance
     return resources.prefetch_related(
@@ -156,6 +175,142 @@ def filter_resources(  # noqa: PLR0913
     )
 
 
+FREE_SLOTS_DAY_START = time(hour=7)
+FREE_SLOTS_STEP_MINUTES = 30
+FREE_SLOTS_DAYS = 14
+FREE_SLOTS_LIMIT = 10
+
+
+def _merge_intervals(intervals):
+    """Merge overlapping or touching (start, end) intervals into sorted ones."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _round_up_to_step(dt):
+    step = timedelta(minutes=FREE_SLOTS_STEP_MINUTES)
+    dt = dt.replace(second=0, microsecond=0)
+    remainder = (dt - datetime.combine(dt.date(), time.min)) % step
+    return dt + (step - remainder) if remainder else dt
+
+
+def find_free_slots(  # noqa: PLR0913
+    user,
+    duration,
+    persons_count=None,
+    location_slug=None,
+    resource_type=None,
+    start=None,
+    days=FREE_SLOTS_DAYS,
+    limit=FREE_SLOTS_LIMIT,
+):
+    """
+    Find the earliest free windows of a duration across the resources of a user.
+
+    Searches the resources matching the filters of filter_resources from start (or
+    now) over the given number of days. Confirmed bookings are loaded with a
+    single query and merged with the restrictions the user is not exempt from and
+    the closed hours before FREE_SLOTS_DAY_START into busy intervals. Every gap
+    long enough yields one window, starting at the next full half hour.
+
+    Returns:
+        list: Up to limit dicts with "resource", "start" and "end" (aware
+        datetimes), ordered by start.
+    """
+    from re_sharing.organizations.models import OrganizationGroup
+
+    resources = list(
+        filter_resources(
+            user, persons_count, None, location_slug, resource_type=resource_type
+        ).prefetch_related(None)
+    )
+    if not resources:
+        return []
+
+    length = timedelta(minutes=int(duration))
+    now = timezone.localtime().replace(tzinfo=None)
+    search_start = _round_up_to_step(
+        max(now, timezone.localtime(start).replace(tzinfo=None)) if start else now
+    )
+    search_end = datetime.combine(search_start.date() + timedelta(days=days), time.min)
+
+    busy = defaultdict(list)
+    for resource_id, timespan in Booking.objects.filter(
+        resource__in=resources,
+        status=BookingStatus.CONFIRMED,
+        timespan__overlap=(
+            timezone.make_aware(search_start),
+            timezone.make_aware(search_end),
+        ),
+    ).values_list("resource_id", "timespan"):
+        busy[resource_id].append(
+            (
+                timezone.localtime(timespan.lower).replace(tzinfo=None),
+                timezone.localtime(timespan.upper).replace(tzinfo=None),
+            )
+        )
+
+    closed_hours = []
+    day = search_start.date()
+    while day < search_end.date():
+        closed_hours.append(
+            (
+                datetime.combine(day, time.min),
+                datetime.combine(day, FREE_SLOTS_DAY_START),
+            )
+        )
+        day += timedelta(days=1)
+
+    restriction_sets = get_restriction_sets([resource.id for resource in resources])
+    organization_group_ids = (
+        set(
+            OrganizationGroup.objects.filter(
+                organization_of_organizationgroups__in=user.get_organizations_of_user()
+            ).values_list("id", flat=True)
+        )
+        if user.is_authenticated
+        else set()
+    )
+
+    free_slots = []
+    for resource in resources:
+        busy_intervals = _merge_intervals(
+            [
+                *busy[resource.id],
+                *closed_hours,
+                *restriction_sets[resource.id].restricted_periods(
+                    search_start, search_end, organization_group_ids
+                ),
+                (search_end, search_end),
+            ]
+        )
+        gap_start = search_start
+        found = 0
+        for busy_start, busy_end in busy_intervals:
+            slot_start = _round_up_to_step(gap_start)
+            if slot_start + length <= busy_start:
+                free_slots.append(
+                    {
+                        "resource": resource,
+                        "start": timezone.make_aware(slot_start),
+                        "end": timezone.make_aware(slot_start + length),
+                    }
+                )
+                found += 1
+                if found == limit:
+                    break
+            gap_start = max(gap_start, busy_end)
+
+    return heapq.nsmallest(
+        limit, free_slots, key=lambda slot: (slot["start"], slot["resource"].name)
+    )
+
+
 def _has_smartlock(access):
     """Check if an access (or its parent) has a smartlock configured."""
     if not access:
@@ -177,74 +332,107 @@ def get_access_code(booking):
     3. If the resource's access has no smartlock, return the PermanentCode
        with no organization (manually maintained code list).
     """
-    from re_sharing.resources.models import PermanentCode
+    return get_access_codes([booking])[0]
 
-    resource = booking.resource
-    organization = booking.organization
-    timestamp = booking.timespan.lower
 
-    if not resource.access:
-        return None
+def get_access_codes(bookings):
+    """
+    Return the access codes of many bookings, in the order of the bookings.
 
-    # First, check for a PermanentCode for this organization and access
-    permanent_code = (
-        PermanentCode.objects.filter(
-            organization=organization,
-            accesses=resource.access,
-            validity_start__lte=timestamp,
+    Resolves the codes like get_access_code, but loads all permanent codes that
+    can apply to the bookings in a single query. The bookings should come with
+    resource__access__parent_access selected to avoid a query per booking.
+    """
+    from re_sharing.resources.models import PermanentCode
+
+    bookings = list(bookings)
+    bookings_with_access = [
+        booking for booking in bookings if booking.resource.access_id
+    ]
+    if not bookings_with_access:
+        return [None] * len(bookings)
+
+    timestamps = [booking.timespan.lower for booking in bookings_with_access]
+    organization_ids = {booking.organization_id for booking in bookings_with_access}
+    permanent_code_accesses = (
+        PermanentCode.accesses.through.objects.filter(
+            access_id__in={
+                booking.resource.access_id for booking in bookings_with_access
+            },
+            permanentcode__validity_start__lte=max(timestamps),
         )
-        .filter(Q(validity_end__isnull=True) | Q(validity_end__gte=timestamp))
-        .order_by("-validity_start")
-        .first()
-    )
-    if permanent_code:
-        return permanent_code.code
-
-    # For resources with a smartlock, return the booking's auto-generated code
-    if _has_smartlock(resource.access):
-        return booking.access_code
-
-    # For resources without a smartlock, return the general (no-org) PermanentCode
-    general_code = (
-        PermanentCode.objects.filter(
-            accesses=resource.access,
-            validity_start__lte=timestamp,
-            organization=None,
+        .filter(
+            Q(permanentcode__validity_end__isnull=True)
+            | Q(permanentcode__validity_end__gte=min(timestamps))
         )
-        .filter(Q(validity_end__isnull=True) | Q(validity_end__gte=timestamp))
-        .order_by("-validity_start")
-        .first()
+        .filter(
+            Q(permanentcode__organization_id__in=organization_ids)
+            | Q(permanentcode__organization__isnull=True)
+        )
+        .select_related("permanentcode")
+        .order_by("-permanentcode__validity_start")
     )
-    return general_code.code if general_code else None
 
+    # Candidates per (organization id or None, access id), newest first
+    permanent_codes = defaultdict(list)
+    for permanent_code_access in permanent_code_accesses:
+        permanent_code = permanent_code_access.permanentcode
+        permanent_codes[
+            (permanent_code.organization_id, permanent_code_access.access_id)
+        ].append(permanent_code)
+
+    def find_code(organization_id, access_id, timestamp):
+        for permanent_code in permanent_codes[(organization_id, access_id)]:
+            if permanent_code.validity_start <= timestamp and (
+                permanent_code.validity_end is None
+                or permanent_code.validity_end >= timestamp
+            ):
+                return permanent_code.code
+        return None
+
+    access_codes = []
+    for booking in bookings:
+        access = booking.resource.access
+        if not access:
+            access_codes.append(None)
+            continue
 
-def _get_timeslot_status(slot_time, resource_restrictions):
+        timestamp = booking.timespan.lower
+        # First, check for a PermanentCode for this organization and access
+        code = find_code(booking.organization_id, access.id, timestamp)
+        if code is None:
+            if _has_smartlock(access):
+                # For resources with a smartlock, the booking's auto-generated code
+                code = booking.access_code
+            else:
+                # Otherwise the general (no-org) PermanentCode
+                code = find_code(None, access.id, timestamp)
+        access_codes.append(code)
+    return access_codes
+
+
+def _get_timeslot_status(slot_time, restriction_set, now=None):
     """
     Determine the status of a timeslot based on time and restrictions.
 
     Args:
         slot_time: The datetime of the slot
-        resource_restrictions: List of restrictions for the resource
+        restriction_set: RestrictionSet of the resource
+        now: The current datetime, defaults to timezone.now()
 
     Returns:
         tuple: (status, restriction_message)
     """
     # Check if the slot is in the past
-    if slot_time <= (timezone.now() - timedelta(minutes=29)):
+    if slot_time <= ((now or timezone.now()) - timedelta(minutes=29)):
         return "past", None
 
-    # Default status is bookable
-    status = "bookable"
-    restriction_message = None
-
     # Check if any restrictions apply
-    for restriction in resource_restrictions:
-        if restriction.applies_to_datetime(slot_time):
-            status = "restricted"
-            restriction_message = restriction.message
-            break
+    restriction = restriction_set.matches(slot_time)
+    if restriction:
+        return "restricted", restriction.message
 
-    return status, restriction_message
+    return "bookable", None
 
 
 def _create_timeslot(slot_time, status, day, resource_slug, restriction_message=None):
@@ -280,54 +468,73 @@ def _create_timeslot(slot_time, status, day, resource_slug, restriction_message=
     return timeslot
 
 
-def _process_bookings(resource_data, bookings, resource, day, user_context):
+def _index_bookings(bookings, first_slot_time, number_of_slots, slot_minutes):
     """
-    Process bookings for a resource and day, updating timeslot statuses.
+    Index bookings by (resource id, local date) as ranges of occupied slots.
 
-    Args:
-        resource_data: Resource data structure containing timeslots
-        bookings: QuerySet of bookings
-        resource: The resource being processed
-        day: The day being processed
-        user_context: Dictionary containing user and their organizations
+    A booking occupies slot i of a day if it covers the start of the slot, which
+    is first_slot_time + i * slot_minutes. Bookings spanning several days are
+    indexed for every day they cover.
+
+    Returns:
+        dict: {(resource_id, date): [(first_slot_index, end_slot_index, booking)]}
     """
-    user = user_context.get("user")
-    organizations_of_user = user_context.get("organizations", [])
+    slot_length = timedelta(minutes=slot_minutes)
+    bookings_by_resource_and_day = defaultdict(list)
     for booking in bookings:
-        if booking.resource != resource or booking.timespan.lower.date() != day.date():
-            continue
+        # Naive local datetimes, so slots are counted in wall-clock time
+        booking_start = timezone.localtime(booking.timespan.lower).replace(tzinfo=None)
+        booking_end = timezone.localtime(booking.timespan.upper).replace(tzinfo=None)
+        day = booking_start.date()
+        while day <= booking_end.date():
+            first_slot = datetime.combine(day, first_slot_time)
+            start_index = max(0, ceil((booking_start - first_slot) / slot_length))
+            end_index = min(
+                number_of_slots, ceil((booking_end - first_slot) / slot_length)
+            )
+            if start_index < end_index:
+                bookings_by_resource_and_day[(booking.resource_id, day)].append(
+                    (start_index, end_index, booking)
+                )
+            day += timedelta(days=1)
+    return bookings_by_resource_and_day
 
-        booking_start = booking.timespan.lower
-        booking_end = booking.timespan.upper
 
-        for timeslot in resource_data["timeslots"]:
-            slot_time = timeslot["time"].time()
-            slot_datetime = timezone.make_aware(datetime.combine(day.date(), slot_time))
+def _get_booked_timeslot_data(booking, user_context):
+    """
+    Return the timeslot fields of a slot occupied by a booking.
 
-            if booking_start <= slot_datetime < booking_end:
-                timeslot["status"] = "booked"
-                timeslot["link"] = None
+    Args:
+        booking: The booking occupying the slot
+        user_context: Dictionary containing the user, the ids of their
+            organizations and whether they are a manager
+    """
+    user = user_context.get("user")
+    organization = booking.organization
+    data = {"status": "booked", "link": None}
 
-                if booking.organization in organizations_of_user:
-                    timeslot["status"] = "booked by me"
-                    timeslot["link"] = f"/bookings/{booking.slug}/"
-                    timeslot["title"] = booking.title
-                    timeslot["organization"] = booking.organization.name
+    if organization.id in user_context.get("organization_ids", set()):
+        data["status"] = "booked by me"
+        data["link"] = f"/bookings/{booking.slug}/"
+        data["title"] = booking.title
+        data["organization"] = organization.name
 
-                if user.is_authenticated and booking.organization.is_public:
-                    timeslot["organization"] = booking.organization.name
-                    timeslot["link"] = f"/organizations/{booking.organization.slug}/"
+    if user.is_authenticated and organization.is_public:
+        data["organization"] = organization.name
+        data["link"] = f"/organizations/{organization.slug}/"
 
-                if user.is_authenticated and user.is_manager():
-                    timeslot["organization"] = booking.organization.name
-                    timeslot["link"] = f"/bookings/{booking.slug}/"
+    if user_context.get("is_manager"):
+        data["organization"] = organization.name
+        data["link"] = f"/bookings/{booking.slug}/"
+
+    return data
 
 
 def planner(user, date_string, nb_of_days, resources):
     """
     Generate planner data for resources over a specified number of days.
     """
-    resources = resources.order_by("access__id", "name")
+    resources = list(resources.order_by("access__id", "name"))
 
     shown_date = (
         parser.parse(date_string)
@@ -341,11 +548,11 @@ def planner(user, date_string, nb_of_days, resources):
     )
     weekdays = [shown_date + timedelta(days=i) for i in range(nb_of_days)]
 
-    slots_start = 7  # Start at 6 AM
-    number_of_slots = 34  # 16 hours (6 AM - 10 PM), 30-minute intervals
+    slots_start = 7  # Start at 7 AM
+    number_of_slots = 34  # 17 hours (7 AM - midnight), 30-minute intervals
     slot_interval_minutes = 30
 
-    # Fetch bookings
+    # Fetch bookings and index them by resource and day
     bookings = Booking.objects.filter(
         resource__in=resources,
         status=BookingStatus.CONFIRMED,
@@ -353,72 +560,67 @@ def planner(user, date_string, nb_of_days, resources):
             shown_date,
             shown_date + timedelta(days=nb_of_days),
         ),
-    ).prefetch_related("resource", "organization")
-
-    # Fetch all active restrictions for all resources at once
-    all_restrictions = ResourceRestriction.objects.filter(
-        is_active=True, resources__in=resources
-    ).prefetch_related("resources", "exempt_organization_groups")
+    ).select_related("organization")
+    bookings_by_resource_and_day = _index_bookings(
+        bookings, time(hour=slots_start), number_of_slots, slot_interval_minutes
+    )
 
-    # Create a dictionary to store restrictions by resource
-    restrictions_by_resource = {}
-    for resource in resources:
-        restrictions_by_resource[resource.id] = [
-            restriction
-            for restriction in all_restrictions
-            if resource in restriction.resources.all()
-        ]
+    # Compiled active restrictions of all resources at once
+    restrictions_by_resource = get_restriction_sets(
+        [resource.id for resource in resources]
+    )
 
     # Prepare planner_data
     planner_data = {}
-    organizations_of_user = (
-        user.get_organizations_of_user() if user.is_authenticated else []
-    )
+    user_context = {
+        "user": user,
+        "organization_ids": set(
+            user.get_organizations_of_user().values_list("id", flat=True)
+        )
+        if user.is_authenticated
+        else set(),
+        "is_manager": user.is_authenticated and user.is_manager(),
+    }
+    now = timezone.now()
 
     # Process each day
     for day in weekdays:
         day_data = {"weekday": day, "resources": []}
+        # Get start time for this day
+        start_time = timezone.make_aware(datetime.combine(day, time(hour=slots_start)))
+        slot_times = [
+            start_time + timedelta(minutes=slot_interval_minutes * i)
+            for i in range(number_of_slots)
+        ]
 
         # Process each resource
         for resource in resources:
-            resource_data = {
-                "name": resource.name,
-                "timeslots": [],
-                "slug": resource.slug,
-            }
-
-            # Get start time for this day
-            start_time = timezone.make_aware(
-                datetime.combine(day, time(hour=slots_start))
-            )
-
             # Get restrictions for this resource
-            resource_restrictions = restrictions_by_resource.get(resource.id, [])
+            restriction_set = restrictions_by_resource[resource.id]
 
             # Create timeslots
-            for i in range(number_of_slots):
-                slot_time = start_time + timedelta(minutes=slot_interval_minutes * i)
-
-                # Determine status and restriction message
+            timeslots = []
+            for slot_time in slot_times:
                 status, restriction_message = _get_timeslot_status(
-                    slot_time, resource_restrictions
+                    slot_time, restriction_set, now
                 )
-
-                # Create timeslot
-                timeslot = _create_timeslot(
-                    slot_time, status, day, resource.slug, restriction_message
+                timeslots.append(
+                    _create_timeslot(
+                        slot_time, status, day, resource.slug, restriction_message
+                    )
                 )
 
-                resource_data["timeslots"].append(timeslot)
+            # Mark the slots occupied by bookings of this resource and day
+            for start_index, end_index, booking in bookings_by_resource_and_day.get(
+                (resource.id, day.date()), []
+            ):
+                booked_data = _get_booked_timeslot_data(booking, user_context)
+                for timeslot in timeslots[start_index:end_index]:
+                    timeslot.update(booked_data)
 
-            # Process bookings for this resource and day
-            user_context = {
-                "user": user,
-                "organizations": organizations_of_user,
-            }
-            _process_bookings(resource_data, bookings, resource, day, user_context)
-
-            day_data["resources"].append(resource_data)
+            day_data["resources"].append(
+                {"name": resource.name, "timeslots": timeslots, "slug": resource.slug}
+            )
 
         planner_data[day] = day_data
 
@@ -481,3 +683,26 @@ def get_user_accessible_locations(user):
         .distinct()
         .order_by("name")
     )
+
+
+def bump_resource_bookings_version(resource_ids):
+    """Record that confirmed bookings of the given resources changed."""
+    Resource.objects.filter(id__in=resource_ids).update(
+        bookings_version=F("bookings_version") + 1, bookings_changed_at=timezone.now()
+    )
+
+
+def get_bookings_version(resources):
+    """
+    Return a token that changes whenever a confirmed booking of the resources changes.
+
+    Returns the token and the time of the latest change (None if no booking changed
+    since the counters were introduced). The number of resources is part of the
+    token, so adding a resource to a location changes it as well.
+    """
+    version = resources.aggregate(
+        count=Count("id"),
+        version=Sum("bookings_version"),
+        changed_at=Max("bookings_changed_at"),
+    )
+    return f"{version['count']}.{version['version'] or 0}", version["changed_at"]
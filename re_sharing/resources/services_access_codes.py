@@ -0,0 +1,96 @@
+import random
+
+from django.db.models import Q
+from django.utils import timezone
+
+from re_sharing.resources.models import Access
+from re_sharing.resources.models import PermanentCode
+from re_sharing.resources.models import SmartlockAuth
+from re_sharing.utils.models import BookingStatus
+
+ACCESS_CODE_DIGITS = "123456789"
+ACCESS_CODE_LENGTH = 6
+# Additional random codes checked per query, so a few codes in use don't need
+# another round
+ACCESS_CODE_SPARE_CANDIDATES = 10
+
+
+def generate_access_code() -> str:
+    """Generate a random 6-digit access code (no zeros, cannot start with '12')."""
+    while True:
+        code = "".join(random.choices(ACCESS_CODE_DIGITS, k=ACCESS_CODE_LENGTH))  # noqa: S311
+        if not code.startswith("12"):
+            return code
+
+
+def _get_smartlock_ids(accesses) -> set[str]:
+    """Return the smartlocks the codes of the accesses are pushed to."""
+    smartlock_ids = set()
+    for smartlock_id, parent_smartlock_id in accesses.values_list(
+        "smartlock_id", "parent_access__smartlock_id"
+    ):
+        smartlock_ids.update([smartlock_id, parent_smartlock_id])
+    smartlock_ids.difference_update(["", None])
+    return smartlock_ids
+
+
+def _get_codes_in_use(smartlock_ids: set[str], codes: set[str]) -> set[str]:
+    """
+    Return which of the codes are active on any of the smartlocks.
+
+    A code is active if it belongs to a pending or confirmed booking that has not
+    ended, to a permanent code that has not expired, or is mirrored from the
+    smartlock, at an access mapping to one of the smartlocks. All lookups use an
+    index on the code.
+    """
+    from re_sharing.bookings.models import Booking
+
+    now = timezone.now()
+    accesses = Access.objects.filter(
+        Q(smartlock_id__in=smartlock_ids)
+        | Q(parent_access__smartlock_id__in=smartlock_ids)
+    )
+    booking_codes = Booking.objects.filter(
+        access_code__in=codes,
+        resource__access__in=accesses,
+        status__in=[BookingStatus.PENDING, BookingStatus.CONFIRMED],
+        timespan__endswith__gte=now,
+    ).values_list("access_code", flat=True)
+    permanent_codes = (
+        PermanentCode.objects.filter(code__in=codes, accesses__in=accesses)
+        .filter(Q(validity_end__isnull=True) | Q(validity_end__gte=now))
+        .values_list("code", flat=True)
+    )
+    mirrored_codes = SmartlockAuth.objects.filter(
+        smartlock_id__in=smartlock_ids, code__in=[int(code) for code in codes]
+    ).values_list("code", flat=True)
+    return set(booking_codes.union(permanent_codes)) | {
+        str(code) for code in mirrored_codes
+    }
+
+
+def allocate_access_codes(accesses, count: int = 1) -> list[str]:
+    """
+    Return count distinct random access codes that are free on all smartlocks the
+    accesses (an Access queryset) map to, including those of parent accesses.
+
+    The candidates are checked against the active codes of the smartlocks with one
+    lookup per round, so syncing the codes does not run into duplicates or
+    conflicts on a smartlock.
+    """
+    smartlock_ids = _get_smartlock_ids(accesses)
+    allocated = []
+    rejected = set()
+    while len(allocated) < count:
+        missing = count - len(allocated)
+        candidates = set()
+        while len(candidates) < missing + ACCESS_CODE_SPARE_CANDIDATES:
+            code = generate_access_code()
+            if code not in rejected and code not in allocated:
+                candidates.add(code)
+        if smartlock_ids:
+            in_use = _get_codes_in_use(smartlock_ids, candidates)
+            rejected.update(in_use)
+            candidates.difference_update(in_use)
+        allocated.extend(list(candidates)[:missing])
+    return allocated
@@ -1,13 +1,20 @@
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from datetime import UTC
 from datetime import datetime
 from datetime import timedelta
 
 import requests
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 from django.tasks import task
 from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +22,39 @@ NUKI_API_BASE = "https://api.nuki.io"
 NUKI_AUTH_TYPE_CODE = 13
 HTTP_409_CONFLICT = 409
 
+NUKI_TIMEOUT = 15
+NUKI_PUSH_TIMEOUT = 30
+# Smartlocks synced at the same time (per process)
+NUKI_MAX_CONCURRENCY = 4
+# Deleted codes may still be listed for a moment (eventual consistency), so the
+# auth list is polled until they are gone before codes are added again
+NUKI_DELETE_POLL_INTERVAL = 0.5
+NUKI_DELETE_POLL_TIMEOUT = 10
+# Changes to the codes of a smartlock within this delay are synced together
+SMARTLOCK_SYNC_DELAY = timedelta(seconds=30)
+SMARTLOCK_SYNC_REQUEST_EXPIRY = timedelta(minutes=15)
+# Codes are compared against the local mirror of a smartlock unless it is older
+# than this; sync_all_smartlock_codes always fetches the codes again
+NUKI_MIRROR_MAX_AGE = timedelta(hours=24)
+# A code must never be added twice, so adding (PUT) is only retried if the
+# connection could not be established. Listing and deleting codes can be repeated
+# safely and are also retried on rate limiting and unavailability, since a 503
+# does not guarantee that the request was not processed.
+NUKI_RETRY = Retry(
+    total=3,
+    connect=3,
+    read=0,
+    status=3,
+    status_forcelist=(429, 503),
+    allowed_methods=frozenset({"GET", "DELETE"}),
+    backoff_factor=0.5,
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+_session = None
+_session_lock = threading.Lock()
+
 
 def _nuki_headers() -> dict:
     return {
@@ -24,6 +64,41 @@ def _nuki_headers() -> dict:
     }
 
 
+def _get_session() -> requests.Session:
+    """Return the keep-alive session shared by all NUKI requests of the process."""
+    global _session  # noqa: PLW0603
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_maxsize=NUKI_MAX_CONCURRENCY, max_retries=NUKI_RETRY
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def _run_per_smartlock(func, args_by_smartlock: dict):
+    """
+    Call func concurrently for each smartlock, given as {smartlock_id: args}.
+
+    Yields (smartlock_id, result, exception) in the order the calls finish;
+    exception is None on success. A failing request only fails its own smartlock.
+    func must only talk to the API, the database is used by the caller.
+    """
+    with ThreadPoolExecutor(max_workers=NUKI_MAX_CONCURRENCY) as executor:
+        futures = {
+            executor.submit(func, *args): smartlock_id
+            for smartlock_id, args in args_by_smartlock.items()
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except requests.RequestException as e:
+                yield futures[future], None, e
+
+
 def _get_accesses_for_smartlock(smartlock_id: str):
     """
     Return all Access objects that contribute codes to this smartlock.
@@ -52,16 +127,37 @@ def _get_accesses_for_smartlock(smartlock_id: str):
     return Access.objects.filter(id__in=[a.id for a in accesses])
 
 
-def _get_todays_confirmed_bookings_for_accesses(accesses):
-    """Return confirmed bookings starting today for resources in the given accesses."""
+def get_provisioning_window():
+    """
+    Return the start (inclusive) and end (exclusive) of the time whose booking
+    codes are on the smartlocks, as aware datetimes at local midnight.
+
+    The codes of the bookings starting in the next NUKI_PROVISIONING_DAYS days are
+    pushed ahead, e.g. at night by push_nuki_codes, and only open the door within
+    their validity. Later syncs then only have to handle changes.
+    """
+    today = timezone.localdate()
+    start = timezone.make_aware(datetime.combine(today, datetime.min.time()))
+    end = timezone.make_aware(
+        datetime.combine(
+            today + timedelta(days=settings.NUKI_PROVISIONING_DAYS),
+            datetime.min.time(),
+        )
+    )
+    return start, end
+
+
+def _get_upcoming_confirmed_bookings_for_accesses(accesses):
+    """Return confirmed bookings of the provisioning days in the given accesses."""
     from re_sharing.bookings.models import Booking
     from re_sharing.utils.models import BookingStatus
 
-    today = timezone.now().date()
+    start, end = get_provisioning_window()
     return Booking.objects.filter(
         resource__access__in=accesses,
         status=BookingStatus.CONFIRMED,
-        timespan__startswith__date=today,
+        timespan__startswith__gte=start,
+        timespan__startswith__lt=end,
     ).select_related("organization", "resource__access")
 
 
@@ -77,6 +173,7 @@ def _get_active_permanent_codes_for_accesses(accesses):
         )
         .filter(Q(validity_end__isnull=True) | Q(validity_end__gte=now))
         .select_related("organization")
+        .prefetch_related("accesses__parent_access")
         .distinct()
     )
 
@@ -91,10 +188,10 @@ def _get_existing_keypad_codes(smartlock_id: str) -> dict[int, dict]:
         - allowedFromDate: start time
         - allowedUntilDate: end time
     """
-    resp = requests.get(
+    resp = _get_session().get(
         f"{NUKI_API_BASE}/smartlock/{smartlock_id}/auth",
         headers=_nuki_headers(),
-        timeout=15,
+        timeout=NUKI_TIMEOUT,
     )
     resp.raise_for_status()
 
@@ -119,11 +216,11 @@ def _delete_keypad_codes_by_ids(auth_ids: list[str]) -> int:
     if not auth_ids:
         return 0
 
-    del_resp = requests.delete(
+    del_resp = _get_session().delete(
         f"{NUKI_API_BASE}/smartlock/auth",
         headers=_nuki_headers(),
         json=auth_ids,
-        timeout=15,
+        timeout=NUKI_TIMEOUT,
     )
     del_resp.raise_for_status()
     logger.info("Bulk-deleted %d keypad codes", len(auth_ids))
@@ -170,10 +267,15 @@ def _collect_permanent_codes_mapping(permanent_codes) -> dict:
 
 
 def _collect_booking_codes_mapping(
-    bookings, orgs_with_permanent_code
+    bookings, accesses_with_permanent_code
 ) -> tuple[dict, int]:
     """Build mapping of booking codes to their smartlock IDs.
 
+    Bookings whose organization has a permanent code for the booking's access are
+    skipped, as get_access_code hands out the permanent code for them. The check
+    only depends on the booking itself, so a sync of some smartlocks and a sync of
+    all smartlocks agree on the codes of a smartlock.
+
     Returns:
         Tuple of (code_to_smartlocks dict, skipped_count)
     """
@@ -181,11 +283,15 @@ def _collect_booking_codes_mapping(
     skipped = 0
 
     for booking in bookings:
-        if booking.organization_id in orgs_with_permanent_code:
+        if (
+            booking.organization_id,
+            booking.resource.access_id,
+        ) in accesses_with_permanent_code:
             logger.debug(
-                "Skipping booking %s - org %s has a permanent code",
+                "Skipping booking %s - org %s has a permanent code for %s",
                 booking.slug,
                 booking.organization,
+                booking.resource.access,
             )
             skipped += 1
             continue
@@ -285,6 +391,16 @@ def _build_desired_state(code_to_smartlocks: dict) -> dict:
                         "%Y-%m-%dT%H:%M:%S.000Z"
                     )
                 desired_state[key] = payload_data
+            elif desired_state[key]["name"] != name:
+                # Codes are allocated to be free on their smartlocks, so this is
+                # only expected for codes created before
+                logger.warning(
+                    "Code %s of %s collides with %s on smartlock %s, skipping it",
+                    code,
+                    name,
+                    desired_state[key]["name"],
+                    sl_id,
+                )
     return desired_state
 
 
@@ -416,11 +532,11 @@ def _push_all_codes(payloads: list[dict]) -> None:
     # The API expects individual PUT requests for each code, not a bulk array
     for i, payload in enumerate(payloads, 1):
         try:
-            resp = requests.put(
+            resp = _get_session().put(
                 f"{NUKI_API_BASE}/smartlock/auth",
                 headers=_nuki_headers(),
                 json=payload,  # Send single code object
-                timeout=30,
+                timeout=NUKI_PUSH_TIMEOUT,
             )
             resp.raise_for_status()
             logger.debug(
@@ -441,59 +557,261 @@ def _push_all_codes(payloads: list[dict]) -> None:
                 )
             raise
 
-    logger.info("Successfully pushed %d codes across all smartlocks", len(payloads))
+    logger.info(
+        "Successfully pushed %d codes to smartlocks %s",
+        len(payloads),
+        sorted({sl_id for payload in payloads for sl_id in payload["smartlockIds"]}),
+    )
 
 
-@task(queue_name="default")
-def sync_all_smartlock_codes() -> dict:
+def _wait_for_deleted_codes(smartlock_id: str, auth_ids: list[str]) -> dict:
+    """Poll the codes of a smartlock until the deleted auths are no longer listed.
+
+    Gives up after NUKI_DELETE_POLL_TIMEOUT seconds and returns the codes of the
+    smartlock as fetched last.
+    """
+    auth_ids = set(auth_ids)
+    deadline = time.monotonic() + NUKI_DELETE_POLL_TIMEOUT
+    while True:
+        existing_codes = _get_existing_keypad_codes(smartlock_id)
+        remaining = auth_ids.intersection(
+            auth_data["id"] for auth_data in existing_codes.values()
+        )
+        if not remaining or time.monotonic() >= deadline:
+            break
+        time.sleep(NUKI_DELETE_POLL_INTERVAL)
+
+    if remaining:
+        logger.warning(
+            "%d deleted codes are still listed on smartlock %s after %d seconds",
+            len(remaining),
+            smartlock_id,
+            NUKI_DELETE_POLL_TIMEOUT,
+        )
+    return existing_codes
+
+
+def _sync_smartlock(
+    smartlock_id: str, existing_codes: dict, auth_ids_to_delete: list, codes_to_add
+) -> dict:
+    """Apply the planned changes to one smartlock: delete, wait, then add codes.
+
+    The result contains the codes on the smartlock and the payloads of the added
+    codes. After adding, the codes are fetched once more, so the mirror learns the
+    auth IDs of the added codes and the next sync does not have to fetch them.
+    """
+    deleted = _delete_keypad_codes_by_ids(auth_ids_to_delete)
+    fetched = False
+    deleted_codes = {
+        code_num
+        for code_num, auth_data in existing_codes.items()
+        if auth_data["id"] in auth_ids_to_delete
+    }
+    if deleted_codes & codes_to_add.keys():
+        # Re-fetch after the deletion to prevent 409 errors for re-added codes
+        # that are still listed
+        existing_codes = _wait_for_deleted_codes(smartlock_id, auth_ids_to_delete)
+        fetched = True
+    else:
+        existing_codes = {
+            code_num: auth_data
+            for code_num, auth_data in existing_codes.items()
+            if code_num not in deleted_codes
+        }
+
+    payloads = []
+    skipped_still_exist = 0
+    for code_num, data in codes_to_add.items():
+        if code_num in existing_codes:
+            logger.warning(
+                "Code %s still exists on smartlock %s after deletion, skipping add",
+                code_num,
+                smartlock_id,
+            )
+            skipped_still_exist += 1
+            continue
+        payload = data["payload_data"].copy()
+        payload["smartlockIds"] = [smartlock_id]
+        payload["type"] = NUKI_AUTH_TYPE_CODE
+        payload["allowedWeekDays"] = 127
+        payloads.append(payload)
+
+    _push_all_codes(payloads)
+    if payloads:
+        existing_codes = _get_existing_keypad_codes(smartlock_id)
+        fetched = True
+    return {
+        "added": len(payloads),
+        "deleted": deleted,
+        "skipped_still_exist": skipped_still_exist,
+        "existing_codes": existing_codes,
+        "fetched": fetched,
+        "payloads": payloads,
+    }
+
+
+def _parse_nuki_datetime(dt_str: str):
+    if not dt_str:
+        return None
+    return datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
+
+
+def _format_nuki_datetime(dt) -> str:
+    if dt is None:
+        return ""
+    return dt.astimezone(UTC).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _get_mirrored_keypad_codes(smartlock_ids) -> dict[str, dict[int, dict]]:
+    """Return the mirrored codes of the smartlocks whose mirror can be used.
+
+    The codes are returned like by _get_existing_keypad_codes(). Smartlocks whose
+    mirror is outdated or contains codes without a known auth ID are left out, so
+    they are fetched again.
+    """
+    from re_sharing.resources.models import SmartlockAuth
+    from re_sharing.resources.models import SmartlockMirror
+
+    mirrored_smartlock_ids = set(
+        SmartlockMirror.objects.filter(
+            smartlock_id__in=smartlock_ids,
+            reconciled_at__gt=timezone.now() - NUKI_MIRROR_MAX_AGE,
+        ).values_list("smartlock_id", flat=True)
+    )
+    codes_by_smartlock = {smartlock_id: {} for smartlock_id in mirrored_smartlock_ids}
+    for auth in SmartlockAuth.objects.filter(smartlock_id__in=mirrored_smartlock_ids):
+        if not auth.auth_id:
+            mirrored_smartlock_ids.discard(auth.smartlock_id)
+            continue
+        codes_by_smartlock[auth.smartlock_id][auth.code] = {
+            "id": auth.auth_id,
+            "name": auth.name,
+            "allowedFromDate": _format_nuki_datetime(auth.allowed_from),
+            "allowedUntilDate": _format_nuki_datetime(auth.allowed_until),
+            "lastSeen": auth.last_seen,
+        }
+    return {
+        smartlock_id: codes
+        for smartlock_id, codes in codes_by_smartlock.items()
+        if smartlock_id in mirrored_smartlock_ids
+    }
+
+
+def _save_smartlock_mirror(
+    smartlock_id: str, existing_codes: dict, payloads=(), *, reconciled=False
+) -> None:
+    """Replace the mirrored codes of a smartlock.
+
+    existing_codes are the codes on the smartlock like returned by
+    _get_existing_keypad_codes(), payloads the codes just added to it. Added codes
+    that are not listed yet are stored without an auth ID. If reconciled,
+    existing_codes were just fetched.
+    """
+    from re_sharing.resources.models import SmartlockAuth
+    from re_sharing.resources.models import SmartlockMirror
+
+    now = timezone.now()
+    auths = [
+        SmartlockAuth(
+            smartlock_id=smartlock_id,
+            auth_id=auth_data["id"],
+            code=code_num,
+            name=auth_data["name"],
+            allowed_from=_parse_nuki_datetime(auth_data["allowedFromDate"]),
+            allowed_until=_parse_nuki_datetime(auth_data.get("allowedUntilDate")),
+            last_seen=auth_data.get("lastSeen", now),
+        )
+        for code_num, auth_data in existing_codes.items()
+    ]
+    auths.extend(
+        SmartlockAuth(
+            smartlock_id=smartlock_id,
+            code=payload["code"],
+            name=payload["name"],
+            allowed_from=_parse_nuki_datetime(payload["allowedFromDate"]),
+            allowed_until=_parse_nuki_datetime(payload.get("allowedUntilDate")),
+        )
+        for payload in payloads
+        if payload["code"] not in existing_codes
+    )
+    with transaction.atomic():
+        SmartlockAuth.objects.filter(smartlock_id=smartlock_id).delete()
+        SmartlockAuth.objects.bulk_create(auths)
+        if reconciled:
+            SmartlockMirror.objects.update_or_create(
+                smartlock_id=smartlock_id, defaults={"reconciled_at": now}
+            )
+
+
+def _sync_smartlock_codes(all_smartlock_ids: list[str], *, reconcile=False) -> dict:
     """
-    Sync all keypad codes for ALL smartlocks using smart diff-based sync:
-    1. Fetches existing codes from all smartlocks
-    2. Determines desired codes from today's bookings and permanent codes
+    Sync the keypad codes of the given smartlocks using smart diff-based sync:
+    1. Fetches existing codes from the smartlocks
+    2. Determines desired codes from upcoming bookings and permanent codes
     3. Deletes only codes that shouldn't exist or have wrong validity
     4. Adds only codes that are missing
     5. Updates codes that need different validity times
 
-    This is more efficient than bulk delete + re-add.
+    This is more efficient than bulk delete + re-add. The smartlocks are fetched
+    and updated concurrently, and a smartlock whose requests fail is skipped
+    without affecting the others.
+
+    The existing codes are taken from the local mirror where it is recent enough,
+    unless reconcile is set; then the codes of all smartlocks are fetched.
     """
     from re_sharing.resources.models import Access
+    from re_sharing.resources.models import SmartlockMirror
 
-    # Get all smartlocks
-    all_smartlock_ids = list(
-        Access.objects.exclude(smartlock_id="")
-        .values_list("smartlock_id", flat=True)
-        .distinct()
+    existing_codes_by_smartlock = (
+        {} if reconcile else _get_mirrored_keypad_codes(all_smartlock_ids)
     )
 
-    if not all_smartlock_ids:
-        logger.warning("No smartlocks configured — skipping sync")
-        return {"smartlocks": 0, "added": 0, "deleted": 0, "skipped": 0}
-
-    # Fetch existing codes from all smartlocks
-    existing_codes_by_smartlock = {}
-    for smartlock_id in all_smartlock_ids:
-        existing_codes_by_smartlock[smartlock_id] = _get_existing_keypad_codes(
-            smartlock_id
-        )
+    # Fetch existing codes from the smartlocks that are not mirrored
+    failed_smartlock_ids = set()
+    for smartlock_id, existing_codes, error in _run_per_smartlock(
+        _get_existing_keypad_codes,
+        {
+            smartlock_id: (smartlock_id,)
+            for smartlock_id in all_smartlock_ids
+            if smartlock_id not in existing_codes_by_smartlock
+        },
+    ):
+        if error is not None:
+            logger.error(
+                "Could not fetch the codes of smartlock %s: %s", smartlock_id, error
+            )
+            failed_smartlock_ids.add(smartlock_id)
+            continue
+        existing_codes_by_smartlock[smartlock_id] = existing_codes
+        _save_smartlock_mirror(smartlock_id, existing_codes, reconciled=True)
         logger.debug(
             "Smartlock %s has %d existing keypad codes",
             smartlock_id,
-            len(existing_codes_by_smartlock[smartlock_id]),
+            len(existing_codes),
         )
 
-    # Collect desired codes from bookings and permanent codes
-    all_accesses = Access.objects.exclude(smartlock_id="")
+    # Collect desired codes from bookings and permanent codes of the accesses
+    # contributing codes to the smartlocks
+    all_accesses = Access.objects.filter(
+        Q(smartlock_id__in=all_smartlock_ids)
+        | Q(parent_access__smartlock_id__in=all_smartlock_ids)
+    )
     permanent_codes = list(_get_active_permanent_codes_for_accesses(all_accesses))
-    bookings = list(_get_todays_confirmed_bookings_for_accesses(all_accesses))
-
-    orgs_with_permanent_code = {
-        pc.organization_id for pc in permanent_codes if pc.organization_id
+    bookings = list(_get_upcoming_confirmed_bookings_for_accesses(all_accesses))
+
+    # The permanent codes cover the accesses of all bookings here, as a booking's
+    # access maps to the smartlocks it is pushed to
+    accesses_with_permanent_code = {
+        (pc.organization_id, access.id)
+        for pc in permanent_codes
+        if pc.organization_id
+        for access in pc.accesses.all()
     }
 
     # Build code mappings - this gives us the desired state
     code_to_smartlocks = _collect_permanent_codes_mapping(permanent_codes)
     booking_codes, skipped = _collect_booking_codes_mapping(
-        bookings, orgs_with_permanent_code
+        bookings, accesses_with_permanent_code
     )
 
     # Merge booking codes into the main mapping
@@ -503,86 +821,68 @@ def sync_all_smartlock_codes() -> dict:
         else:
             code_to_smartlocks[key].update(smartlock_ids)
 
-    # Build desired state and compare with existing to plan changes
+    # Build desired state and compare with existing to plan changes per smartlock
     desired_state = _build_desired_state(code_to_smartlocks)
     logger.info(
         "Desired state: %d unique (code, smartlock) combinations", len(desired_state)
     )
-    auth_ids_to_delete, codes_to_add = _compare_and_plan_changes(
-        existing_codes_by_smartlock, desired_state
-    )
-    logger.info(
-        "Plan: delete %d auth IDs, add %d unique codes",
-        len(auth_ids_to_delete),
-        len(codes_to_add),
-    )
-
-    # Delete outdated/wrong codes
-    deleted = _delete_keypad_codes_by_ids(auth_ids_to_delete)
-
-    # Wait for NUKI API to propagate deletions (eventual consistency)
-    if deleted > 0:
+    changes_by_smartlock = {}
+    for smartlock_id, existing_codes in existing_codes_by_smartlock.items():
+        auth_ids_to_delete, codes_to_add = _compare_and_plan_changes(
+            {smartlock_id: existing_codes},
+            {
+                key: payload_data
+                for key, payload_data in desired_state.items()
+                if key[1] == smartlock_id
+            },
+        )
         logger.info(
-            "Waiting 10 seconds for NUKI API to propagate %d deletions...", deleted
+            "Plan for smartlock %s: delete %d auth IDs, add %d codes",
+            smartlock_id,
+            len(auth_ids_to_delete),
+            len(codes_to_add),
         )
-        time.sleep(10)
-
-    # Re-fetch existing codes after deletion to verify and filter
-    # This prevents 409 errors if delete didn't fully propagate
-    logger.debug("Re-fetching existing codes after deletion to verify...")
-    existing_after_delete = {}
-    for smartlock_id in all_smartlock_ids:
-        existing_after_delete[smartlock_id] = _get_existing_keypad_codes(smartlock_id)
-
-    # Filter out codes that still exist after deletion
-    payloads = []
-    skipped_still_exist = 0
-    for data in codes_to_add.values():
-        code_num = data["payload_data"]["code"]
-        smartlock_ids = data["smartlock_ids"]
-
-        # Check if code still exists on any target smartlock
-        filtered_smartlocks = [
-            sl_id
-            for sl_id in smartlock_ids
-            if code_num not in existing_after_delete.get(sl_id, {})
-        ]
-
-        if filtered_smartlocks:
-            payload = data["payload_data"].copy()
-            payload["smartlockIds"] = filtered_smartlocks
-            payload["type"] = NUKI_AUTH_TYPE_CODE
-            payload["allowedWeekDays"] = 127
-            payloads.append(payload)
-
-            if len(filtered_smartlocks) < len(smartlock_ids):
-                logger.warning(
-                    "Code %s still exists on some smartlocks after deletion, "
-                    "only adding to: %s (originally: %s)",
-                    code_num,
-                    filtered_smartlocks,
-                    smartlock_ids,
-                )
-        else:
-            logger.warning(
-                "Code %s still exists on all target smartlocks after deletion, "
-                "skipping add",
-                code_num,
+        if auth_ids_to_delete or codes_to_add:
+            changes_by_smartlock[smartlock_id] = (
+                smartlock_id,
+                existing_codes,
+                auth_ids_to_delete,
+                codes_to_add,
             )
-            skipped_still_exist += 1
 
-    _push_all_codes(payloads)
-    added = len(payloads)
+    # Delete outdated/wrong codes and add the missing ones
+    added = deleted = skipped_still_exist = 0
+    for smartlock_id, result, error in _run_per_smartlock(
+        _sync_smartlock, changes_by_smartlock
+    ):
+        if error is not None:
+            logger.error("Could not sync smartlock %s: %s", smartlock_id, error)
+            failed_smartlock_ids.add(smartlock_id)
+            continue
+        _save_smartlock_mirror(
+            smartlock_id,
+            result["existing_codes"],
+            result["payloads"],
+            reconciled=result["fetched"],
+        )
+        added += result["added"]
+        deleted += result["deleted"]
+        skipped_still_exist += result["skipped_still_exist"]
+
+    # The mirror of a smartlock may be wrong after a failure, so it is fetched again
+    # by the next sync
+    SmartlockMirror.objects.filter(smartlock_id__in=failed_smartlock_ids).delete()
 
     logger.info(
         "Synced %d smartlock(s): added %d codes, deleted %d codes, "
         "skipped %d bookings (permanent code org), "
-        "%d codes still existed after delete",
+        "%d codes still existed after delete, %d smartlock(s) failed",
         len(all_smartlock_ids),
         added,
         deleted,
         skipped,
         skipped_still_exist,
+        len(failed_smartlock_ids),
     )
     return {
         "smartlocks": len(all_smartlock_ids),
@@ -590,4 +890,83 @@ def sync_all_smartlock_codes() -> dict:
         "deleted": deleted,
         "skipped": skipped,
         "skipped_still_exist": skipped_still_exist,
+        "failed": sorted(failed_smartlock_ids),
     }
+
+
+def request_smartlock_sync(smartlock_ids) -> None:
+    """
+    Sync the keypad codes of the smartlocks after SMARTLOCK_SYNC_DELAY.
+
+    The request is made once the current transaction is committed. Smartlocks that
+    already wait for a sync are left to it, so a burst of changes is coalesced
+    into one sync task for all affected smartlocks.
+    """
+    smartlock_ids = {smartlock_id for smartlock_id in smartlock_ids if smartlock_id}
+    if smartlock_ids:
+        transaction.on_commit(lambda: _add_smartlock_sync_requests(smartlock_ids))
+
+
+def _add_smartlock_sync_requests(smartlock_ids: set[str]) -> None:
+    from re_sharing.resources.models import SmartlockSyncRequest
+
+    now = timezone.now()
+    # Requests whose task got lost are replaced instead of waiting forever
+    pending = set(
+        SmartlockSyncRequest.objects.filter(
+            smartlock_id__in=smartlock_ids,
+            created__gt=now - SMARTLOCK_SYNC_REQUEST_EXPIRY,
+        ).values_list("smartlock_id", flat=True)
+    )
+    new_smartlock_ids = smartlock_ids - pending
+    if not new_smartlock_ids:
+        return
+
+    SmartlockSyncRequest.objects.bulk_create(
+        [
+            SmartlockSyncRequest(smartlock_id=smartlock_id)
+            for smartlock_id in sorted(new_smartlock_ids)
+        ],
+        update_conflicts=True,
+        unique_fields=["smartlock_id"],
+        update_fields=["created", "updated"],
+    )
+    sync_task = sync_requested_smartlock_codes
+    if sync_task.get_backend().supports_defer:
+        sync_task = sync_task.using(run_after=now + SMARTLOCK_SYNC_DELAY)
+    sync_task.enqueue()
+    logger.info("Requested a sync of smartlocks %s", sorted(new_smartlock_ids))
+
+
+@task(queue_name="default")
+def sync_requested_smartlock_codes() -> dict:
+    """Sync the keypad codes of the smartlocks with pending sync requests."""
+    from re_sharing.resources.models import SmartlockSyncRequest
+
+    with transaction.atomic():
+        smartlock_ids = list(
+            SmartlockSyncRequest.objects.select_for_update(
+                skip_locked=True
+            ).values_list("smartlock_id", flat=True)
+        )
+        SmartlockSyncRequest.objects.filter(smartlock_id__in=smartlock_ids).delete()
+
+    if not smartlock_ids:
+        return {"smartlocks": 0, "added": 0, "deleted": 0, "skipped": 0}
+    return _sync_smartlock_codes(smartlock_ids)
+
+
+@task(queue_name="default")
+def sync_all_smartlock_codes() -> dict:
+    """Sync the keypad codes of all smartlocks, reconciling their local mirror."""
+    from re_sharing.resources.models import Access
+
+    all_smartlock_ids = list(
+        Access.objects.exclude(smartlock_id="")
+        .values_list("smartlock_id", flat=True)
+        .distinct()
+    )
+    if not all_smartlock_ids:
+        logger.warning("No smartlocks configured — skipping sync")
+        return {"smartlocks": 0, "added": 0, "deleted": 0, "skipped": 0}
+    return _sync_smartlock_codes(all_smartlock_ids, reconcile=True)
@@ -1,6 +1,5 @@
 """Service functions for managing permanent codes."""
 
-import random
 from datetime import datetime
 from datetime import timedelta
 
@@ -12,15 +11,12 @@ from re_sharing.organizations.mails import send_permanent_code_renewed_email
 from re_sharing.organizations.models import Organization
 from re_sharing.resources.models import Access
 from re_sharing.resources.models import PermanentCode
+from re_sharing.resources.services_access_codes import allocate_access_codes
 
 
-def _generate_permanent_code() -> str:
-    """Generate a random 6-digit code (no zeros, cannot start with '12')."""
-    digits = "123456789"
-    while True:
-        code = "".join(random.choices(digits, k=6))  # noqa: S311
-        if not code.startswith("12"):
-            return code
+def _generate_permanent_code(accesses) -> str:
+    """Allocate a 6-digit code that is free on the smartlocks of the accesses."""
+    return allocate_access_codes(accesses)[0]
 
 
 def create_permanent_code_for_organization(
@@ -39,12 +35,12 @@ def create_permanent_code_for_organization(
     """
     organization = get_object_or_404(Organization, slug=organization_slug)
 
-    # Generate new code
-    code = _generate_permanent_code()
-
     # Get accesses 1, 2, 8
     accesses = Access.objects.filter(id__in=[1, 2, 8])
 
+    # Generate new code
+    code = _generate_permanent_code(accesses)
+
     # Use the provided name, falling back to a default derived from the org
     code_name = name.strip() or f"Permanent code for {organization.name}"
 
@@ -111,7 +107,7 @@ def renew_permanent_code(
     old_code.save()
 
     # Create new code
-    new_code_value = _generate_permanent_code()
+    new_code_value = _generate_permanent_code(old_code.accesses.all())
     new_code = PermanentCode.objects.create(
         code=new_code_value,
         organization=old_code.organization,
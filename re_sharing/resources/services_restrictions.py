@@ -0,0 +1,323 @@
+"""Compiled resource restrictions for matching datetimes and time ranges."""
+
+from bisect import bisect_right
+from datetime import datetime
+from datetime import time
+from datetime import timedelta
+from math import ceil
+
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models import Q
+from django.utils import timezone
+
+from re_sharing.resources.models import ResourceRestriction
+from re_sharing.utils.cache import RESTRICTIONS
+from re_sharing.utils.cache import CacheNamespace
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+RESTRICTIONS_CACHE = CacheNamespace(
+    "resource_restrictions", timeout=60 * 60, invalidated_by=[RESTRICTIONS]
+)
+
+
+def _to_local(dt):
+    """Return the naive local wall-clock time of a (naive or aware) datetime."""
+    return timezone.localtime(dt).replace(tzinfo=None) if timezone.is_aware(dt) else dt
+
+
+def _minute_of_week(dt):
+    return dt.weekday() * MINUTES_PER_DAY + dt.hour * 60 + dt.minute
+
+
+class CompiledRestriction:
+    """
+    A ResourceRestriction prepared for matching.
+
+    The weekdays are stored as a bitmask (bit 0 = Monday) and the restricted times
+    as sorted, half-open [start, end) intervals in minutes of the week. Times are
+    compared with minute precision.
+    """
+
+    __slots__ = (
+        "end_date",
+        "exempt_organization_group_ids",
+        "id",
+        "intervals",
+        "message",
+        "start_date",
+        "weekdays",
+    )
+
+    def __init__(self, restriction, exempt_organization_group_ids=()):
+        self.id = restriction.id
+        self.message = restriction.message
+        self.start_date = restriction.start_date
+        self.end_date = restriction.end_date
+        self.exempt_organization_group_ids = frozenset(exempt_organization_group_ids)
+
+        weekdays = sorted(
+            {
+                int(day)
+                for day in restriction.days_of_week.split(",")
+                if day.strip() and 0 <= int(day) <= 6  # noqa: PLR2004
+            }
+        )
+        self.weekdays = sum(1 << weekday for weekday in weekdays)
+        start = restriction.start_time.hour * 60 + restriction.start_time.minute
+        end = restriction.end_time.hour * 60 + restriction.end_time.minute
+        self.intervals = (
+            tuple(
+                (weekday * MINUTES_PER_DAY + start, weekday * MINUTES_PER_DAY + end)
+                for weekday in weekdays
+            )
+            if start < end
+            else ()
+        )
+
+    def __repr__(self):
+        return f"<CompiledRestriction {self.id}>"
+
+    def is_exempt(self, organization_group_ids):
+        return not self.exempt_organization_group_ids.isdisjoint(organization_group_ids)
+
+    def matches_date(self, date):
+        """Check if the restriction applies on a date, ignoring the time of day."""
+        if self.start_date and date < self.start_date:
+            return False
+        if self.end_date and date > self.end_date:
+            return False
+        return bool(self.weekdays >> date.weekday() & 1)
+
+    def matches(self, dt):
+        """Check if the restriction applies to a datetime."""
+        dt = _to_local(dt)
+        if not self.matches_date(dt.date()):
+            return False
+        minute = _minute_of_week(dt)
+        index = bisect_right(self.intervals, (minute, MINUTES_PER_WEEK)) - 1
+        return index >= 0 and minute < self.intervals[index][1]
+
+    def matches_range(self, start, end):
+        """Check if the restriction applies to any moment of [start, end)."""
+        start = _to_local(start)
+        end = _to_local(end)
+        # Clip the range to the validity of the restriction
+        if self.start_date:
+            start = max(start, datetime.combine(self.start_date, time.min))
+        if self.end_date:
+            end = min(
+                end, datetime.combine(self.end_date + timedelta(days=1), time.min)
+            )
+        if start >= end or not self.intervals:
+            return False
+
+        first = _minute_of_week(start)
+        last = first + ceil((end - start) / timedelta(minutes=1))
+        if last - first >= MINUTES_PER_WEEK:
+            return True
+        # The range may wrap into the next week
+        return any(
+            interval_start + offset < last and first < interval_end + offset
+            for offset in (0, MINUTES_PER_WEEK)
+            for interval_start, interval_end in self.intervals
+        )
+
+    def restricted_periods(self, start, end):
+        """Yield the naive local (start, end) periods of [start, end) it applies to."""
+        start = _to_local(start)
+        end = _to_local(end)
+        day = start.date()
+        while datetime.combine(day, time.min) < end:
+            if self.matches_date(day):
+                day_start = datetime.combine(day, time.min)
+                weekday_offset = day.weekday() * MINUTES_PER_DAY
+                for interval_start, interval_end in self.intervals:
+                    if interval_start // MINUTES_PER_DAY != day.weekday():
+                        continue
+                    period_start = max(
+                        start,
+                        day_start + timedelta(minutes=interval_start - weekday_offset),
+                    )
+                    period_end = min(
+                        end,
+                        day_start + timedelta(minutes=interval_end - weekday_offset),
+                    )
+                    if period_start < period_end:
+                        yield period_start, period_end
+            day += timedelta(days=1)
+
+
+class RestrictionSet:
+    """
+    The compiled active restrictions of one or more resources, ordered by id.
+
+    The matching methods return the first restriction that applies, or None. If
+    organization group ids are given, restrictions exempting one of the groups
+    are skipped.
+    """
+
+    __slots__ = ("restrictions",)
+
+    def __init__(self, restrictions=()):
+        self.restrictions = tuple(
+            sorted({r.id: r for r in restrictions}.values(), key=lambda r: r.id)
+        )
+
+    def __bool__(self):
+        return bool(self.restrictions)
+
+    def __iter__(self):
+        return iter(self.restrictions)
+
+    def __or__(self, other):
+        return RestrictionSet((*self.restrictions, *other.restrictions))
+
+    def _applicable(self, organization_group_ids):
+        if organization_group_ids is None:
+            return self.restrictions
+        return [r for r in self.restrictions if not r.is_exempt(organization_group_ids)]
+
+    def matches_date(self, date, organization_group_ids=None):
+        for restriction in self._applicable(organization_group_ids):
+            if restriction.matches_date(date):
+                return restriction
+        return None
+
+    def matches(self, dt, organization_group_ids=None):
+        for restriction in self._applicable(organization_group_ids):
+            if restriction.matches(dt):
+                return restriction
+        return None
+
+    def matches_range(self, start, end, organization_group_ids=None):
+        for restriction in self._applicable(organization_group_ids):
+            if restriction.matches_range(start, end):
+                return restriction
+        return None
+
+    def restricted_periods(self, start, end, organization_group_ids=None):
+        """Return the naive local periods of [start, end) covered by restrictions."""
+        return [
+            period
+            for restriction in self._applicable(organization_group_ids)
+            for period in restriction.restricted_periods(start, end)
+        ]
+
+
+def get_restriction_sets(resource_ids):
+    """
+    Return {resource_id: RestrictionSet} of the active restrictions per resource.
+
+    The sets are cached per resource until a restriction changes. Resources missing
+    from the cache are compiled with two queries.
+    """
+    resource_ids = set(resource_ids)
+    prefix = RESTRICTIONS_CACHE.key()
+    keys = {f"{prefix}:{resource_id}": resource_id for resource_id in resource_ids}
+    restriction_sets = {
+        keys[key]: restriction_set
+        for key, restriction_set in cache.get_many(keys).items()
+    }
+
+    missing_ids = resource_ids - restriction_sets.keys()
+    if missing_ids:
+        resource_restrictions = ResourceRestriction.resources.through.objects.filter(
+            resource_id__in=missing_ids, resourcerestriction__is_active=True
+        ).select_related("resourcerestriction")
+        exempt_group_ids = {}
+        for (
+            restriction_id,
+            group_id,
+        ) in ResourceRestriction.exempt_organization_groups.through.objects.filter(
+            resourcerestriction__resources__in=missing_ids,
+            resourcerestriction__is_active=True,
+        ).values_list("resourcerestriction_id", "organizationgroup_id"):
+            exempt_group_ids.setdefault(restriction_id, set()).add(group_id)
+
+        compiled = {}
+        restrictions_by_resource = {resource_id: [] for resource_id in missing_ids}
+        for resource_restriction in resource_restrictions:
+            restriction = resource_restriction.resourcerestriction
+            if restriction.id not in compiled:
+                compiled[restriction.id] = CompiledRestriction(
+                    restriction, exempt_group_ids.get(restriction.id, ())
+                )
+            restrictions_by_resource[resource_restriction.resource_id].append(
+                compiled[restriction.id]
+            )
+
+        missing_sets = {
+            resource_id: RestrictionSet(restrictions)
+            for resource_id, restrictions in restrictions_by_resource.items()
+        }
+        cache.set_many(
+            {
+                f"{prefix}:{resource_id}": restriction_set
+                for resource_id, restriction_set in missing_sets.items()
+            },
+            RESTRICTIONS_CACHE.timeout,
+        )
+        restriction_sets.update(missing_sets)
+
+    return restriction_sets
+
+
+def get_restriction_set(resource_ids):
+    """Return the combined RestrictionSet of the given resources."""
+    combined = RestrictionSet()
+    for restriction_set in get_restriction_sets(resource_ids).values():
+        combined |= restriction_set
+    return combined
+
+
+def _restricted_window_q(start, end):
+    """
+    Return a Q matching restrictions that cover any moment of [start, end).
+
+    The window is split into its local days, so the predicates only use the stored
+    columns of the restrictions, like CompiledRestriction.matches_range.
+    """
+    start = _to_local(start)
+    end = _to_local(end)
+    window_q = Q(pk__in=[])
+    day = start.date()
+    while datetime.combine(day, time.min) < end:
+        day_start = max(start, datetime.combine(day, time.min))
+        next_day = datetime.combine(day + timedelta(days=1), time.min)
+        day_q = (
+            (Q(start_date__isnull=True) | Q(start_date__lte=day))
+            & (Q(end_date__isnull=True) | Q(end_date__gte=day))
+            & Q(days_of_week__regex=rf"(^|,)\s*{day.weekday()}\s*(,|$)")
+            & Q(end_time__gt=day_start.time())
+        )
+        if end < next_day:
+            day_q &= Q(start_time__lt=end.time())
+        window_q |= day_q
+        day += timedelta(days=1)
+    return window_q
+
+
+def get_restricted_resource_ids(start, end, organizations=None):
+    """
+    Return a queryset of the ids of resources restricted at any moment of [start, end).
+
+    Restrictions exempting a group of one of the given organizations are ignored.
+    The result is meant to be used as a subquery, e.g. exclude(id__in=...).
+    """
+    restrictions = ResourceRestriction.objects.filter(
+        _restricted_window_q(start, end),
+        is_active=True,
+        start_time__lt=F("end_time"),
+    )
+    if organizations is not None:
+        restrictions = restrictions.exclude(
+            exempt_organization_groups__organization_of_organizationgroups__in=(
+                organizations
+            )
+        )
+    # Select from the through table, a NULL id would make NOT IN match nothing
+    return ResourceRestriction.resources.through.objects.filter(
+        resourcerestriction__in=restrictions
+    ).values("resource_id")
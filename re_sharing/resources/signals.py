@@ -0,0 +1,32 @@
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from re_sharing.resources.models import Location
+from re_sharing.resources.models import Resource
+from re_sharing.resources.models import ResourceRestriction
+from re_sharing.utils.cache import RESOURCES
+from re_sharing.utils.cache import RESTRICTIONS
+from re_sharing.utils.cache import invalidate_caches
+
+
+@receiver(post_save, sender=ResourceRestriction)
+@receiver(post_delete, sender=ResourceRestriction)
+def invalidate_restrictions_on_change(sender, instance, **kwargs):
+    invalidate_caches(RESTRICTIONS)
+
+
+@receiver(m2m_changed, sender=ResourceRestriction.resources.through)
+@receiver(m2m_changed, sender=ResourceRestriction.exempt_organization_groups.through)
+def invalidate_restrictions_on_relation_change(sender, instance, action, **kwargs):
+    if action in {"post_add", "post_remove", "post_clear"}:
+        invalidate_caches(RESTRICTIONS)
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_resources_on_change(sender, instance, **kwargs):
+    invalidate_caches(RESOURCES)
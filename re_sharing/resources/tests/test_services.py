@@ -4,13 +4,20 @@ from unittest import skip
 from zoneinfo import ZoneInfo
 
 import pytest
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
+from re_sharing.bookings.models import Booking
 from re_sharing.bookings.tests.factories import BookingFactory
 from re_sharing.organizations.tests.factories import OrganizationFactory
+from re_sharing.resources.models import Resource
 from re_sharing.resources.services import filter_resources
+from re_sharing.resources.services import find_free_slots
 from re_sharing.resources.services import get_access_code
+from re_sharing.resources.services import get_access_codes
 from re_sharing.resources.services import get_user_accessible_locations
 from re_sharing.resources.services import planner
 from re_sharing.resources.services import show_resource
@@ -267,6 +274,87 @@ class TestGetAccessCode(TestCase):
         assert result is None
 
 
+class TestGetAccessCodes(TestCase):
+    def setUp(self):
+        from re_sharing.resources.tests.factories import PermanentCodeFactory
+
+        self.timestamp = timezone.make_aware(timezone.datetime(2024, 7, 23, 13, 30))
+        self.access_with_smartlock = AccessFactory(
+            name="with-smartlock", smartlock_id="smartlock-123"
+        )
+        self.access_no_smartlock = AccessFactory(name="no-smartlock", smartlock_id="")
+        self.resource_smartlock = ResourceFactory(access=self.access_with_smartlock)
+        self.resource_no_smartlock = ResourceFactory(access=self.access_no_smartlock)
+        self.resource_no_access = ResourceFactory(access=None)
+        self.organization = OrganizationFactory()
+        self.other_organization = OrganizationFactory()
+
+        PermanentCodeFactory(
+            code="GENERAL-OLD",
+            organization=None,
+            validity_start=self.timestamp - timedelta(days=30),
+            validity_end=self.timestamp + timedelta(days=2),
+            accesses=[self.access_no_smartlock],
+        )
+        PermanentCodeFactory(
+            code="GENERAL-NEW",
+            organization=None,
+            validity_start=self.timestamp + timedelta(days=2),
+            validity_end=None,
+            accesses=[self.access_no_smartlock],
+        )
+        PermanentCodeFactory(
+            code="ORG-PERM",
+            organization=self.organization,
+            validity_start=self.timestamp - timedelta(days=1),
+            validity_end=None,
+            accesses=[self.access_with_smartlock, self.access_no_smartlock],
+        )
+
+    def _make_booking(self, resource, organization, days=0):
+        ts = self.timestamp + timedelta(days=days)
+        return BookingFactory(
+            resource=resource,
+            organization=organization,
+            status=BookingStatus.CONFIRMED,
+            timespan=(ts, ts + timedelta(hours=2)),
+        )
+
+    def test_resolves_codes_in_one_query(self):
+        created = [
+            self._make_booking(self.resource_smartlock, self.organization),
+            self._make_booking(self.resource_no_smartlock, self.organization, 1),
+            self._make_booking(self.resource_smartlock, self.other_organization, 0.5),
+            self._make_booking(self.resource_no_smartlock, self.other_organization),
+            self._make_booking(self.resource_no_smartlock, self.other_organization, 3),
+            self._make_booking(self.resource_no_access, self.organization),
+        ]
+        bookings = list(
+            Booking.objects.filter(id__in=[booking.id for booking in created])
+            .select_related("resource__access__parent_access")
+            .order_by("id")
+        )
+
+        with self.assertNumQueries(1):
+            access_codes = get_access_codes(bookings)
+
+        assert access_codes == [
+            "ORG-PERM",
+            "ORG-PERM",
+            bookings[2].access_code,
+            "GENERAL-OLD",
+            "GENERAL-NEW",
+            None,
+        ]
+        assert access_codes == [get_access_code(booking) for booking in bookings]
+
+    def test_no_bookings_with_access_need_no_query(self):
+        booking = self._make_booking(self.resource_no_access, self.organization)
+
+        with self.assertNumQueries(0):
+            assert get_access_codes([booking]) == [None]
+
+
 @skip
 class TestResourcePlanner(TestCase):
     def test_empty_planner_table(self):
@@ -364,6 +452,117 @@ class TestResourcePlanner(TestCase):
         }  # This should be True because we booked the slot from 18:00 to 22:00
 
 
+class TestPlanner(TestCase):
+    def setUp(self):
+        self.day = timezone.localdate() + timedelta(days=10)
+        self.resource1 = ResourceFactory()
+        self.resource2 = ResourceFactory()
+        self.resources = Resource.objects.filter(
+            id__in=[self.resource1.id, self.resource2.id]
+        )
+        self.user = UserFactory()
+
+    def _at(self, day_offset, hour, minute=0):
+        return timezone.make_aware(
+            datetime.datetime.combine(
+                self.day + timedelta(days=day_offset), datetime.time(hour, minute)
+            )
+        )
+
+    def _statuses(self, planner_data, day_offset, resource):
+        day = planner_data[list(planner_data)[day_offset]]
+        resource_data = next(
+            data for data in day["resources"] if data["slug"] == resource.slug
+        )
+        return [timeslot["status"] for timeslot in resource_data["timeslots"]]
+
+    def test_marks_slots_covered_by_bookings(self):
+        BookingFactory(
+            resource=self.resource1,
+            status=BookingStatus.CONFIRMED,
+            timespan=(self._at(0, 9), self._at(0, 10, 30)),
+        )
+        # Spans midnight, so it shows up on both days
+        BookingFactory(
+            resource=self.resource2,
+            status=BookingStatus.CONFIRMED,
+            timespan=(self._at(0, 22), self._at(1, 8)),
+        )
+        BookingFactory(
+            resource=self.resource1,
+            status=BookingStatus.CANCELLED,
+            timespan=(self._at(1, 9), self._at(1, 10)),
+        )
+
+        *_, planner_data = planner(self.user, self.day.isoformat(), 2, self.resources)
+
+        statuses = self._statuses(planner_data, 0, self.resource1)
+        assert [i for i, status in enumerate(statuses) if status == "booked"] == [
+            4,
+            5,
+            6,
+        ]
+        statuses = self._statuses(planner_data, 0, self.resource2)
+        assert [i for i, status in enumerate(statuses) if status == "booked"] == [
+            30,
+            31,
+            32,
+            33,
+        ]
+        statuses = self._statuses(planner_data, 1, self.resource2)
+        assert [i for i, status in enumerate(statuses) if status == "booked"] == [
+            0,
+            1,
+        ]
+        assert "booked" not in self._statuses(planner_data, 1, self.resource1)
+
+    def test_bookings_of_own_organization(self):
+        from re_sharing.organizations.tests.factories import BookingPermissionFactory
+
+        permission = BookingPermissionFactory(
+            user=self.user, organization=OrganizationFactory(is_public=False)
+        )
+        booking = BookingFactory(
+            resource=self.resource1,
+            organization=permission.organization,
+            status=BookingStatus.CONFIRMED,
+            timespan=(self._at(0, 7), self._at(0, 8)),
+        )
+
+        *_, planner_data = planner(self.user, self.day.isoformat(), 1, self.resources)
+
+        day = planner_data[next(iter(planner_data))]
+        timeslot = next(
+            data for data in day["resources"] if data["slug"] == self.resource1.slug
+        )["timeslots"][1]
+        assert timeslot["status"] == "booked by me"
+        assert timeslot["link"] == f"/bookings/{booking.slug}/"
+        assert timeslot["title"] == booking.title
+
+    def test_number_of_queries_does_not_depend_on_bookings(self):
+        BookingFactory(
+            resource=self.resource1,
+            status=BookingStatus.CONFIRMED,
+            timespan=(self._at(0, 9), self._at(0, 10)),
+        )
+        cache.clear()
+        with CaptureQueriesContext(connection) as few_bookings:
+            planner(self.user, self.day.isoformat(), 14, self.resources)
+
+        for day_offset in range(1, 14):
+            for resource in (self.resource1, self.resource2):
+                BookingFactory(
+                    resource=resource,
+                    status=BookingStatus.CONFIRMED,
+                    timespan=(self._at(day_offset, 9), self._at(day_offset, 10)),
+                )
+        cache.clear()
+        with CaptureQueriesContext(connection) as many_bookings:
+            planner(self.user, self.day.isoformat(), 14, self.resources)
+
+        assert len(many_bookings) == len(few_bookings)
+
+
 class TestGetUserAccessibleLocations(TestCase):
     def setUp(self):
         self.user = UserFactory()
@@ -470,6 +669,146 @@ class TestFilterResources(TestCase):
         assert self.medium_resource not in resources
         assert self.large_resource in resources
 
+    def test_filter_resources_excludes_restricted_at_time(self):
+        from re_sharing.organizations.tests.factories import BookingPermissionFactory
+        from re_sharing.organizations.tests.factories import OrganizationGroupFactory
+        from re_sharing.resources.tests.factories import ResourceRestrictionFactory
+
+        # 2023-12-15 is a Friday
+        restriction = ResourceRestrictionFactory(
+            resources=[self.medium_resource],
+            start_time=datetime.time(18, 0),
+            end_time=datetime.time(22, 0),
+            days_of_week="4",
+        )
+
+        resources = filter_resources(self.user, None, "2023-12-15T17:00", None, 90)
+        assert self.small_resource in resources
+        assert self.medium_resource not in resources
+
+        resources = filter_resources(self.user, None, "2023-12-15T16:00", None, 120)
+        assert self.medium_resource in resources
+
+        # Members of an exempt organization group still see the resource
+        group = OrganizationGroupFactory()
+        permission = BookingPermissionFactory(user=self.user)
+        permission.organization.organization_groups.add(group)
+        restriction.exempt_organization_groups.add(group)
+        resources = filter_resources(self.user, None, "2023-12-15T17:00", None, 90)
+        assert self.medium_resource in resources
+
+    def test_filter_resources_is_a_single_query(self):
+        from re_sharing.resources.tests.factories import ResourceRestrictionFactory
+
+        for resource in (self.small_resource, self.medium_resource):
+            ResourceRestrictionFactory(resources=[resource], days_of_week="0,4")
+
+        resources = filter_resources(
+            self.user, None, "2023-12-15T23:00", None, 120
+        ).prefetch_related(None)
+        with self.assertNumQueries(1):
+            list(resources)
+
+
+class TestFindFreeSlots(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.day = timezone.localdate() + timedelta(days=10)
+        self.location = LocationFactory()
+        self.resource1 = ResourceFactory(
+            name="A", max_persons=10, location=self.location, is_private=False
+        )
+        self.resource2 = ResourceFactory(
+            name="B", max_persons=4, location=self.location, is_private=False
+        )
+
+    def _at(self, hour, minute=0, day_offset=0):
+        return timezone.make_aware(
+            datetime.datetime.combine(
+                self.day + timedelta(days=day_offset), datetime.time(hour, minute)
+            )
+        )
+
+    def _find(self, duration=60, **kwargs):
+        kwargs.setdefault("start", self._at(0))
+        kwargs.setdefault("location_slug", self.location.slug)
+        return [
+            (slot["resource"], slot["start"], slot["end"])
+            for slot in find_free_slots(self.user, duration, **kwargs)
+        ]
+
+    def test_earliest_slots_across_resources(self):
+        BookingFactory(
+            resource=self.resource1,
+            status=BookingStatus.CONFIRMED,
+            timespan=(self._at(7), self._at(9)),
+        )
+        BookingFactory(
+            resource=self.resource2,
+            status=BookingStatus.CANCELLED,
+            timespan=(self._at(7), self._at(9)),
+        )
+
+        assert self._find(limit=3) == [
+            (self.resource2, self._at(7), self._at(8)),
+            (self.resource1, self._at(9), self._at(10)),
+            (self.resource1, self._at(7, day_offset=1), self._at(8, day_offset=1)),
+        ]
+
+    def test_skips_gaps_that_are_too_short(self):
+        # Free 10:00-10:30 and 12:00-12:30, too short for 90 minutes
+        for start, end in (
+            (self._at(7), self._at(10)),
+            (self._at(10, 30), self._at(12)),
+            (self._at(12, 30), self._at(0, day_offset=1)),
+        ):
+            BookingFactory(
+                resource=self.resource1,
+                status=BookingStatus.CONFIRMED,
+                timespan=(start, end),
+            )
+
+        assert self._find(duration=90, persons_count=5, limit=1) == [
+            (self.resource1, self._at(7, day_offset=1), self._at(8, 30, day_offset=1)),
+        ]
+
+    def test_respects_restrictions_and_exemptions(self):
+        from re_sharing.organizations.tests.factories import BookingPermissionFactory
+        from re_sharing.organizations.tests.factories import OrganizationGroupFactory
+        from re_sharing.resources.tests.factories import ResourceRestrictionFactory
+
+        restriction = ResourceRestrictionFactory(
+            resources=[self.resource1, self.resource2],
+            start_time=datetime.time(6, 0),
+            end_time=datetime.time(12, 30),
+            days_of_week=str(self.day.weekday()),
+        )
+        assert self._find(limit=1) == [
+            (self.resource1, self._at(12, 30), self._at(13, 30)),
+        ]
+
+        group = OrganizationGroupFactory()
+        permission = BookingPermissionFactory(user=self.user)
+        permission.organization.organization_groups.add(group)
+        restriction.exempt_organization_groups.add(group)
+        assert self._find(limit=1) == [(self.resource1, self._at(7), self._at(8))]
+
+    def test_number_of_queries_does_not_depend_on_bookings(self):
+        for day_offset in range(14):
+            BookingFactory(
+                resource=self.resource1,
+                status=BookingStatus.CONFIRMED,
+                timespan=(
+                    self._at(8, day_offset=day_offset),
+                    self._at(9, day_offset=day_offset),
+                ),
+            )
+        find_free_slots(self.user, 60, start=self._at(0))
+
+        # User groups, resources and bookings, the restrictions are cached
+        with self.assertNumQueries(3):
+            find_free_slots(self.user, 60, start=self._at(0))
+
 
 class TestManagerAccessibleMethods(TestCase):
     """Test Manager model methods for accessing resources."""
@@ -0,0 +1,104 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from re_sharing.bookings.tests.factories import BookingFactory
+from re_sharing.resources.models import Access
+from re_sharing.resources.models import SmartlockAuth
+from re_sharing.resources.services_access_codes import allocate_access_codes
+from re_sharing.resources.services_access_codes import generate_access_code
+from re_sharing.resources.tests.factories import AccessFactory
+from re_sharing.resources.tests.factories import PermanentCodeFactory
+from re_sharing.resources.tests.factories import ResourceFactory
+from re_sharing.utils.models import BookingStatus
+
+
+def test_generate_access_code():
+    for _ in range(100):
+        code = generate_access_code()
+        assert len(code) == 6  # noqa: PLR2004
+        assert "0" not in code
+        assert not code.startswith("12")
+
+
+class TestAllocateAccessCodes(TestCase):
+    def setUp(self):
+        self.parent = AccessFactory(smartlock_id="100")
+        self.access = AccessFactory(smartlock_id="101", parent_access=self.parent)
+        self.resource = ResourceFactory(access=self.access)
+
+    def allocate(self, candidates, accesses=None, count=1):
+        if accesses is None:
+            accesses = Access.objects.filter(id=self.access.id)
+        with (
+            patch(
+                "re_sharing.resources.services_access_codes.generate_access_code",
+                side_effect=candidates,
+            ),
+            patch(
+                "re_sharing.resources.services_access_codes."
+                "ACCESS_CODE_SPARE_CANDIDATES",
+                0,
+            ),
+        ):
+            return allocate_access_codes(accesses, count)
+
+    def create_booking(self, code, resource=None, days=1, **kwargs):
+        start = timezone.now() + timedelta(days=days)
+        return BookingFactory(
+            resource=resource or self.resource,
+            timespan=(start, start + timedelta(hours=1)),
+            access_code=code,
+            **kwargs,
+        )
+
+    def test_skips_codes_of_upcoming_bookings(self):
+        self.create_booking("111111")
+
+        assert self.allocate(["111111", "222222"]) == ["222222"]
+
+    def test_reuses_codes_of_past_and_cancelled_bookings(self):
+        self.create_booking("111111", days=-1)
+        self.create_booking("222222", days=2, status=BookingStatus.CANCELLED)
+
+        assert self.allocate(["111111"]) == ["111111"]
+        assert self.allocate(["222222"]) == ["222222"]
+
+    def test_skips_permanent_codes_on_the_parent_smartlock(self):
+        sibling = AccessFactory(smartlock_id="102", parent_access=self.parent)
+        PermanentCodeFactory(code="111111", accesses=[sibling])
+        PermanentCodeFactory(
+            code="222222",
+            accesses=[self.parent],
+            validity_end=timezone.now() - timedelta(days=1),
+        )
+
+        assert self.allocate(["111111", "222222"]) == ["222222"]
+
+    def test_skips_mirrored_codes(self):
+        SmartlockAuth.objects.create(smartlock_id="100", auth_id="1", code=111111)
+
+        assert self.allocate(["111111", "222222"]) == ["222222"]
+
+    def test_ignores_codes_of_other_smartlocks(self):
+        other_resource = ResourceFactory(access=AccessFactory(smartlock_id="200"))
+        self.create_booking("111111", resource=other_resource)
+
+        assert self.allocate(["111111"]) == ["111111"]
+
+    def test_allocates_distinct_codes(self):
+        codes = self.allocate(["111111", "111111", "222222", "333333"], count=3)
+
+        assert sorted(codes) == ["111111", "222222", "333333"]
+
+    def test_without_smartlocks_only_looks_up_accesses(self):
+        access = AccessFactory(smartlock_id="")
+
+        with self.assertNumQueries(1):
+            codes = self.allocate(
+                ["111111", "222222"], accesses=Access.objects.filter(id=access.id)
+            )
+
+        assert codes == ["111111"]
@@ -0,0 +1,512 @@
+from datetime import UTC
+from datetime import datetime
+from datetime import time
+from datetime import timedelta
+from unittest.mock import Mock
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+import pytest
+import requests
+from django.test import TestCase
+from django.test import override_settings
+from django.utils import timezone
+from freezegun import freeze_time
+from urllib3.exceptions import NewConnectionError
+
+from re_sharing.bookings.tests.factories import BookingFactory
+from re_sharing.resources.models import SmartlockAuth
+from re_sharing.resources.models import SmartlockMirror
+from re_sharing.resources.models import SmartlockSyncRequest
+from re_sharing.resources.services_nuki import NUKI_API_BASE
+from re_sharing.resources.services_nuki import NUKI_AUTH_TYPE_CODE
+from re_sharing.resources.services_nuki import NUKI_RETRY
+from re_sharing.resources.services_nuki import _get_existing_keypad_codes
+from re_sharing.resources.services_nuki import _run_per_smartlock
+from re_sharing.resources.services_nuki import _wait_for_deleted_codes
+from re_sharing.resources.services_nuki import get_provisioning_window
+from re_sharing.resources.services_nuki import request_smartlock_sync
+from re_sharing.resources.services_nuki import sync_all_smartlock_codes
+from re_sharing.resources.services_nuki import sync_requested_smartlock_codes
+from re_sharing.resources.tests.factories import AccessFactory
+from re_sharing.resources.tests.factories import PermanentCodeFactory
+from re_sharing.resources.tests.factories import ResourceFactory
+
+
+def _auth(auth_id, code, allowed_from="2026-01-01T00:00:00.000Z"):
+    return {
+        "id": auth_id,
+        "type": NUKI_AUTH_TYPE_CODE,
+        "code": code,
+        "name": f"PC-{auth_id}",
+        "allowedFromDate": allowed_from,
+        "allowedUntilDate": "",
+    }
+
+
+def _response(json_data=None, status_code=200):
+    response = Mock(status_code=status_code)
+    response.json.return_value = json_data
+    if status_code >= 400:  # noqa: PLR2004
+        response.raise_for_status.side_effect = requests.HTTPError(response=response)
+    return response
+
+
+class FakeNukiSession:
+    """Serves the auth lists of smartlocks and records deletions and pushes."""
+
+    def __init__(self, auths_by_smartlock, failing_smartlocks=(), stale_fetches=0):
+        self.auths_by_smartlock = auths_by_smartlock
+        self.failing_smartlocks = set(failing_smartlocks)
+        # Number of fetches that still list deleted auths
+        self.stale_fetches = stale_fetches
+        self.deleted = []
+        self.pushed = []
+        self.fetched = []
+
+    def get(self, url, **kwargs):
+        smartlock_id = url.split("/")[-2]
+        self.fetched.append(smartlock_id)
+        if smartlock_id in self.failing_smartlocks:
+            return _response(status_code=503)
+        auths = self.auths_by_smartlock.get(smartlock_id, [])
+        if self.deleted and self.stale_fetches:
+            self.stale_fetches -= 1
+            return _response(auths)
+        return _response([a for a in auths if a["id"] not in self.deleted])
+
+    def delete(self, url, json, **kwargs):
+        self.deleted.extend(json)
+        return _response()
+
+    def put(self, url, json, **kwargs):
+        self.pushed.append(json)
+        # The smartlock lists the added code from then on
+        for smartlock_id in json["smartlockIds"]:
+            self.auths_by_smartlock.setdefault(smartlock_id, []).append(
+                {
+                    **_auth(f"new-{len(self.pushed)}", json["code"]),
+                    "name": json["name"],
+                    "allowedFromDate": json["allowedFromDate"],
+                    "allowedUntilDate": json.get("allowedUntilDate", ""),
+                }
+            )
+        return _response()
+
+
+@override_settings(NUKI_API_TOKEN="token")  # noqa: S106
+class TestSyncAllSmartlockCodes(TestCase):
+    def setUp(self):
+        self.access1 = AccessFactory(smartlock_id="101")
+        self.access2 = AccessFactory(smartlock_id="102")
+        self.code1 = PermanentCodeFactory(code="111111", accesses=[self.access1])
+        self.code2 = PermanentCodeFactory(code="222222", accesses=[self.access2])
+
+    def sync(self, session):
+        with (
+            patch(
+                "re_sharing.resources.services_nuki._get_session",
+                return_value=session,
+            ),
+            patch("re_sharing.resources.services_nuki.time.sleep") as mock_sleep,
+        ):
+            result = sync_all_smartlock_codes.call()
+        return result, mock_sleep
+
+    def test_adds_missing_codes_to_each_smartlock(self):
+        session = FakeNukiSession({})
+
+        result, mock_sleep = self.sync(session)
+
+        assert result["added"] == 2  # noqa: PLR2004
+        assert result["failed"] == []
+        pushed = {
+            (payload["code"], tuple(payload["smartlockIds"]))
+            for payload in session.pushed
+        }
+        assert pushed == {(111111, ("101",)), (222222, ("102",))}
+        assert session.deleted == []
+        mock_sleep.assert_not_called()
+
+    def test_polls_until_deletions_are_visible_before_re_adding(self):
+        # The validity of the code changed, so it is deleted and added again
+        session = FakeNukiSession({"101": [_auth("9", 111111)]}, stale_fetches=2)
+
+        result, mock_sleep = self.sync(session)
+
+        assert session.deleted == ["9"]
+        assert result["deleted"] == 1
+        assert result["added"] == 2  # noqa: PLR2004
+        assert mock_sleep.call_count == 2  # noqa: PLR2004
+
+    @override_settings(NUKI_PROVISIONING_DAYS=2)
+    def test_provisions_codes_of_upcoming_bookings(self):
+        resource = ResourceFactory(access=self.access1)
+        start = datetime.combine(
+            timezone.now().date() + timedelta(days=1), time(12), tzinfo=UTC
+        )
+        BookingFactory(
+            resource=resource,
+            timespan=(start, start + timedelta(hours=2)),
+            access_code="333333",
+        )
+        BookingFactory(
+            resource=resource,
+            timespan=(start + timedelta(days=1), start + timedelta(days=1, hours=2)),
+            access_code="444444",
+        )
+        session = FakeNukiSession({})
+
+        self.sync(session)
+
+        payloads = {payload["code"]: payload for payload in session.pushed}
+        assert set(payloads) == {111111, 222222, 333333}
+        assert payloads[333333]["allowedFromDate"] == (
+            f"{start.date():%Y-%m-%d}T11:00:00.000Z"
+        )
+        assert payloads[333333]["allowedUntilDate"] == (
+            f"{start.date():%Y-%m-%d}T15:00:00.000Z"
+        )
+
+    def test_permanent_code_only_replaces_bookings_of_its_accesses(self):
+        # The organization has a permanent code for smartlock 102 only, so its
+        # booking at smartlock 101 still needs the booking code
+        start = timezone.now() + timedelta(hours=1)
+        for access, access_code in [(self.access1, "333333"), (self.access2, "444444")]:
+            BookingFactory(
+                resource=ResourceFactory(access=access),
+                organization=self.code2.organization,
+                timespan=(start, start + timedelta(hours=2)),
+                access_code=access_code,
+            )
+        SmartlockSyncRequest.objects.create(smartlock_id="101")
+        incremental = FakeNukiSession({})
+        full = FakeNukiSession({})
+
+        with patch(
+            "re_sharing.resources.services_nuki._get_session",
+            return_value=incremental,
+        ):
+            sync_requested_smartlock_codes.call()
+        self.sync(full)
+
+        assert {payload["code"] for payload in incremental.pushed} == {
+            111111,
+            333333,
+        }
+        assert {
+            payload["code"]
+            for payload in full.pushed
+            if payload["smartlockIds"] == ["101"]
+        } == {111111, 333333}
+        assert {
+            payload["code"]
+            for payload in full.pushed
+            if payload["smartlockIds"] == ["102"]
+        } == {222222}
+
+    def test_failing_smartlock_does_not_abort_the_others(self):
+        session = FakeNukiSession({}, failing_smartlocks=["101"])
+
+        result, _ = self.sync(session)
+
+        assert result["failed"] == ["101"]
+        assert result["added"] == 1
+        assert [payload["smartlockIds"] for payload in session.pushed] == [["102"]]
+
+
+@override_settings(NUKI_API_TOKEN="token")  # noqa: S106
+class TestSmartlockMirror(TestCase):
+    def setUp(self):
+        self.access = AccessFactory(smartlock_id="101")
+        self.code = PermanentCodeFactory(code="111111", accesses=[self.access])
+
+    def sync(self, session, task=sync_requested_smartlock_codes):
+        SmartlockSyncRequest.objects.create(smartlock_id="101")
+        with (
+            patch(
+                "re_sharing.resources.services_nuki._get_session",
+                return_value=session,
+            ),
+            patch("re_sharing.resources.services_nuki.time.sleep"),
+        ):
+            return task.call()
+
+    def auth(self, auth_id):
+        return _auth(
+            auth_id,
+            111111,
+            allowed_from=self.code.validity_start.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        )
+
+    def mirror(self, *auths, reconciled_at=None):
+        SmartlockMirror.objects.create(
+            smartlock_id="101", reconciled_at=reconciled_at or timezone.now()
+        )
+        for auth_id, code in auths:
+            SmartlockAuth.objects.create(
+                smartlock_id="101",
+                auth_id=auth_id,
+                code=code,
+                allowed_from=self.code.validity_start,
+                last_seen=timezone.now(),
+            )
+
+    def test_full_sync_mirrors_fetched_and_pushed_codes(self):
+        session = FakeNukiSession({"101": [_auth("9", 999999)]})
+
+        self.sync(session, task=sync_all_smartlock_codes)
+
+        assert list(SmartlockAuth.objects.values_list("auth_id", "code")) == [
+            ("new-1", 111111)
+        ]
+        assert SmartlockMirror.objects.filter(smartlock_id="101").exists()
+
+    def test_second_sync_after_adding_does_not_fetch(self):
+        self.mirror()
+        session = FakeNukiSession({})
+
+        first = self.sync(session)
+        session.fetched.clear()
+        second = self.sync(session)
+
+        assert first["added"] == 1
+        assert session.fetched == []
+        assert second["added"] == 0
+        assert len(session.pushed) == 1
+
+    def test_mirrors_added_codes_not_listed_yet_without_auth_id(self):
+        self.mirror()
+        session = FakeNukiSession({})
+        session.put = Mock(return_value=_response())
+
+        self.sync(session)
+
+        assert list(SmartlockAuth.objects.values_list("auth_id", "code")) == [
+            ("", 111111)
+        ]
+
+    def test_uses_mirror_instead_of_fetching(self):
+        self.mirror(("5", 111111))
+        session = FakeNukiSession({})
+
+        result = self.sync(session)
+
+        assert session.fetched == []
+        assert session.pushed == []
+        assert result["added"] == 0
+
+    def test_deletes_from_mirror_without_polling(self):
+        self.mirror(("5", 111111), ("9", 999999))
+        session = FakeNukiSession({})
+
+        result = self.sync(session)
+
+        assert session.deleted == ["9"]
+        assert session.fetched == []
+        assert result["deleted"] == 1
+        assert list(SmartlockAuth.objects.values_list("code", flat=True)) == [111111]
+
+    def test_fetches_outdated_mirror(self):
+        self.mirror(reconciled_at=timezone.now() - timedelta(days=2))
+        session = FakeNukiSession({"101": [self.auth("5")]})
+
+        self.sync(session)
+
+        assert session.fetched == ["101"]
+        assert session.pushed == []
+        assert SmartlockAuth.objects.get().auth_id == "5"
+
+    def test_fetches_mirror_with_unknown_auth_ids(self):
+        self.mirror(("", 111111))
+        session = FakeNukiSession({"101": [self.auth("5")]})
+
+        self.sync(session)
+
+        assert session.fetched == ["101"]
+        assert SmartlockAuth.objects.get().auth_id == "5"
+
+    def test_failure_discards_mirror(self):
+        self.mirror(("9", 999999))
+        session = FakeNukiSession({})
+        session.delete = Mock(return_value=_response(status_code=503))
+
+        result = self.sync(session)
+
+        assert result["failed"] == ["101"]
+        assert not SmartlockMirror.objects.exists()
+
+
+class TestRequestSmartlockSync(TestCase):
+    def request(self, smartlock_ids):
+        with (
+            patch(
+                "re_sharing.resources.services_nuki.sync_requested_smartlock_codes"
+            ) as mock_task,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            mock_task.get_backend.return_value.supports_defer = True
+            request_smartlock_sync(smartlock_ids)
+        return mock_task
+
+    def test_coalesces_requests_for_pending_smartlocks(self):
+        mock_task = self.request(["101", "", None])
+
+        assert list(
+            SmartlockSyncRequest.objects.values_list("smartlock_id", flat=True)
+        ) == ["101"]
+        run_after = mock_task.using.call_args.kwargs["run_after"]
+        assert run_after > timezone.now()
+        mock_task.using.return_value.enqueue.assert_called_once()
+
+        mock_task = self.request(["101"])
+
+        mock_task.using.assert_not_called()
+        assert SmartlockSyncRequest.objects.count() == 1
+
+        mock_task = self.request(["101", "102"])
+
+        mock_task.using.return_value.enqueue.assert_called_once()
+        assert SmartlockSyncRequest.objects.count() == 2  # noqa: PLR2004
+
+    def test_replaces_expired_requests(self):
+        SmartlockSyncRequest.objects.create(smartlock_id="101")
+        SmartlockSyncRequest.objects.update(created=timezone.now() - timedelta(hours=1))
+
+        mock_task = self.request(["101"])
+
+        mock_task.using.return_value.enqueue.assert_called_once()
+        assert SmartlockSyncRequest.objects.get().created > timezone.now() - timedelta(
+            minutes=1
+        )
+
+    def test_is_made_after_commit(self):
+        with patch(
+            "re_sharing.resources.services_nuki.sync_requested_smartlock_codes"
+        ) as mock_task:
+            request_smartlock_sync(["101"])
+
+        assert not SmartlockSyncRequest.objects.exists()
+        mock_task.enqueue.assert_not_called()
+
+
+@override_settings(NUKI_API_TOKEN="token")  # noqa: S106
+class TestSyncRequestedSmartlockCodes(TestCase):
+    def test_syncs_only_requested_smartlocks(self):
+        access1 = AccessFactory(smartlock_id="101")
+        access2 = AccessFactory(smartlock_id="102")
+        PermanentCodeFactory(code="111111", accesses=[access1])
+        PermanentCodeFactory(code="222222", accesses=[access2])
+        SmartlockSyncRequest.objects.create(smartlock_id="102")
+        session = FakeNukiSession({})
+
+        with patch(
+            "re_sharing.resources.services_nuki._get_session", return_value=session
+        ):
+            result = sync_requested_smartlock_codes.call()
+
+        assert result["smartlocks"] == 1
+        assert [(p["code"], p["smartlockIds"]) for p in session.pushed] == [
+            (222222, ["102"])
+        ]
+        assert not SmartlockSyncRequest.objects.exists()
+
+    def test_syncs_codes_of_child_accesses_to_parent_smartlock(self):
+        parent = AccessFactory(smartlock_id="100")
+        child = AccessFactory(smartlock_id="", parent_access=parent)
+        PermanentCodeFactory(code="333333", accesses=[child])
+        SmartlockSyncRequest.objects.create(smartlock_id="100")
+        session = FakeNukiSession({})
+
+        with patch(
+            "re_sharing.resources.services_nuki._get_session", return_value=session
+        ):
+            sync_requested_smartlock_codes.call()
+
+        assert [(p["code"], p["smartlockIds"]) for p in session.pushed] == [
+            (333333, ["100"])
+        ]
+
+    def test_without_requests_does_nothing(self):
+        with patch("re_sharing.resources.services_nuki._get_session") as mock_session:
+            result = sync_requested_smartlock_codes.call()
+
+        assert result["smartlocks"] == 0
+        mock_session.assert_not_called()
+
+
+def test_get_existing_keypad_codes_only_returns_codes():
+    session = Mock()
+    session.get.return_value = _response(
+        [_auth("1", 123456), {"id": "2", "type": 0, "name": "App"}]
+    )
+
+    with patch("re_sharing.resources.services_nuki._get_session", return_value=session):
+        codes = _get_existing_keypad_codes("101")
+
+    assert list(codes) == [123456]
+    assert codes[123456]["id"] == "1"
+    assert session.get.call_args.args[0] == f"{NUKI_API_BASE}/smartlock/101/auth"
+
+
+def test_nuki_retry_only_repeats_adding_codes_on_connection_errors():
+    assert NUKI_RETRY.is_retry("GET", 503)
+    assert NUKI_RETRY.is_retry("DELETE", 429)
+    assert not NUKI_RETRY.is_retry("PUT", 503)
+    assert not NUKI_RETRY.is_retry("PUT", 429)
+
+    retry = NUKI_RETRY.increment(
+        method="PUT", url="/smartlock/auth", error=NewConnectionError(None, "refused")
+    )
+
+    assert retry.connect == NUKI_RETRY.connect - 1
+
+
+def test_wait_for_deleted_codes_gives_up_after_timeout():
+    session = FakeNukiSession({"101": [_auth("9", 999999)]}, stale_fetches=100)
+    session.deleted = ["9"]
+
+    with (
+        patch("re_sharing.resources.services_nuki._get_session", return_value=session),
+        patch("re_sharing.resources.services_nuki.NUKI_DELETE_POLL_TIMEOUT", 0),
+    ):
+        codes = _wait_for_deleted_codes("101", ["9"])
+
+    assert list(codes) == [999999]
+
+
+def test_run_per_smartlock_isolates_request_errors():
+    def fetch(smartlock_id):
+        if smartlock_id == "1":
+            raise requests.ConnectionError
+        return smartlock_id
+
+    results = {
+        smartlock_id: (result, error)
+        for smartlock_id, result, error in _run_per_smartlock(
+            fetch, {"1": ("1",), "2": ("2",)}
+        )
+    }
+
+    assert results["2"] == ("2", None)
+    assert results["1"][0] is None
+    assert isinstance(results["1"][1], requests.ConnectionError)
+
+
+def test_run_per_smartlock_raises_other_errors():
+    def fetch(smartlock_id):
+        raise KeyError(smartlock_id)
+
+    with pytest.raises(KeyError):
+        list(_run_per_smartlock(fetch, {"1": ("1",)}))
+
+
+@override_settings(NUKI_PROVISIONING_DAYS=2)
+@freeze_time("2026-03-10 23:30:00+00:00")
+def test_get_provisioning_window_starts_at_local_midnight():
+    # It is already March 11 in Berlin
+    start, end = get_provisioning_window()
+
+    berlin = ZoneInfo("Europe/Berlin")
+    assert start == datetime(2026, 3, 11, tzinfo=berlin)
+    assert end == datetime(2026, 3, 13, tzinfo=berlin)
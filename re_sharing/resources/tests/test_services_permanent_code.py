@@ -257,16 +257,14 @@ class TestCodeGeneration(TestCase):
     """Test code generation function."""
 
     @patch("random.choices")
-    def test_generate_permanent_code_format(self, mock_random):
+    def test_generate_access_code_format(self, mock_random):
         """Test that generated codes follow the expected format."""
-        from re_sharing.resources.services_permanent_code import (
-            _generate_permanent_code,
-        )
+        from re_sharing.resources.services_access_codes import generate_access_code
 
         # Mock to return a valid code (not starting with 12, no zeros)
         mock_random.return_value = ["3", "4", "5", "6", "7", "8"]
 
-        code = _generate_permanent_code()
+        code = generate_access_code()
 
         assert len(code) == 6  # noqa: PLR2004
         assert code == "345678"
@@ -274,11 +272,9 @@ class TestCodeGeneration(TestCase):
         assert "0" not in code
 
     @patch("random.choices")
-    def test_generate_permanent_code_rejects_code_starting_with_12(self, mock_random):
+    def test_generate_access_code_rejects_code_starting_with_12(self, mock_random):
         """Test that codes starting with 12 are regenerated."""
-        from re_sharing.resources.services_permanent_code import (
-            _generate_permanent_code,
-        )
+        from re_sharing.resources.services_access_codes import generate_access_code
 
         # First call returns invalid code starting with 12, second call returns valid
         mock_random.side_effect = [
@@ -286,7 +282,7 @@ class TestCodeGeneration(TestCase):
             ["3", "4", "5", "6", "7", "8"],  # Valid
         ]
 
-        code = _generate_permanent_code()
+        code = generate_access_code()
 
         assert code == "345678"
         assert mock_random.call_count == 2  # noqa: PLR2004
@@ -0,0 +1,183 @@
+from datetime import date
+from datetime import datetime
+from datetime import time
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from re_sharing.organizations.tests.factories import OrganizationGroupFactory
+from re_sharing.resources.services_restrictions import CompiledRestriction
+from re_sharing.resources.services_restrictions import get_restricted_resource_ids
+from re_sharing.resources.services_restrictions import get_restriction_set
+from re_sharing.resources.services_restrictions import get_restriction_sets
+from re_sharing.resources.tests.factories import ResourceFactory
+from re_sharing.resources.tests.factories import ResourceRestrictionFactory
+
+
+class TestCompiledRestriction(TestCase):
+    def setUp(self):
+        # Tuesdays and Sundays from 10:00 to 12:00 in May 2025
+        self.restriction = ResourceRestrictionFactory(
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            days_of_week="1, 6",
+            start_date=date(2025, 5, 1),
+            end_date=date(2025, 5, 31),
+        )
+        self.compiled = CompiledRestriction(self.restriction)
+
+    def test_compiles_weekdays_and_intervals(self):
+        assert self.compiled.weekdays == 0b1000010  # noqa: PLR2004
+        assert self.compiled.intervals == ((2040, 2160), (9240, 9360))
+
+    def test_matches(self):
+        tuesday = date(2025, 5, 6)
+        assert self.compiled.matches(datetime.combine(tuesday, time(10, 0)))
+        assert self.compiled.matches(datetime.combine(tuesday, time(11, 59)))
+        assert not self.compiled.matches(datetime.combine(tuesday, time(12, 0)))
+        assert not self.compiled.matches(datetime.combine(tuesday, time(9, 59)))
+        assert not self.compiled.matches(datetime(2025, 5, 7, 11, 0))  # noqa: DTZ001
+        assert not self.compiled.matches(datetime(2025, 6, 3, 11, 0))  # noqa: DTZ001
+        # Aware datetimes are compared in local time
+        assert self.compiled.matches(
+            timezone.make_aware(datetime.combine(tuesday, time(10, 30)))
+        )
+
+    def test_matches_range(self):
+        assert self.compiled.matches_range(
+            datetime(2025, 5, 6, 9, 0),  # noqa: DTZ001
+            datetime(2025, 5, 6, 10, 1),  # noqa: DTZ001
+        )
+        assert not self.compiled.matches_range(
+            datetime(2025, 5, 6, 12, 0),  # noqa: DTZ001
+            datetime(2025, 5, 11, 10, 0),  # noqa: DTZ001
+        )
+        # Sunday to Tuesday wraps into the next week
+        assert self.compiled.matches_range(
+            datetime(2025, 5, 11, 13, 0),  # noqa: DTZ001
+            datetime(2025, 5, 13, 10, 30),  # noqa: DTZ001
+        )
+        # Only the part of the range within the validity counts
+        assert not self.compiled.matches_range(
+            datetime(2025, 5, 31, 12, 0),  # noqa: DTZ001
+            datetime(2025, 6, 30, 12, 0),  # noqa: DTZ001
+        )
+        assert self.compiled.matches_range(
+            datetime(2025, 4, 1, 0, 0),  # noqa: DTZ001
+            datetime(2025, 6, 30, 0, 0),  # noqa: DTZ001
+        )
+
+    def test_matches_agrees_with_model(self):
+        day = datetime(2025, 5, 1, 0, 0)  # noqa: DTZ001
+        for minutes in range(0, 14 * 24 * 60, 17):
+            dt = day + timezone.timedelta(minutes=minutes)
+            assert self.compiled.matches(dt) == self.restriction.applies_to_datetime(dt)
+
+
+class TestGetRestrictionSets(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.resource = ResourceFactory()
+        self.other_resource = ResourceFactory()
+        self.group = OrganizationGroupFactory()
+        self.restriction = ResourceRestrictionFactory(
+            resources=[self.resource, self.other_resource],
+            start_time=time(8, 0),
+            end_time=time(18, 0),
+            days_of_week="0,1,2,3,4",
+            message="Closed on weekdays",
+            exempt_organization_groups=[self.group],
+        )
+        ResourceRestrictionFactory(resources=[self.resource], is_active=False)
+        self.monday = datetime(2025, 5, 5, 9, 0)  # noqa: DTZ001
+
+    def test_compiles_active_restrictions_per_resource(self):
+        unrestricted_resource = ResourceFactory()
+        with self.assertNumQueries(2):
+            restriction_sets = get_restriction_sets(
+                [self.resource.id, self.other_resource.id, unrestricted_resource.id]
+            )
+
+        assert len(restriction_sets) == 3  # noqa: PLR2004
+        assert not restriction_sets[unrestricted_resource.id]
+        restriction = restriction_sets[self.resource.id].matches(self.monday)
+        assert restriction.message == "Closed on weekdays"
+        assert restriction_sets[self.other_resource.id].matches(self.monday)
+        assert not restriction_sets[self.resource.id].matches(
+            self.monday, organization_group_ids={self.group.id}
+        )
+
+    def test_cached_until_restrictions_change(self):
+        get_restriction_sets([self.resource.id])
+        with self.assertNumQueries(0):
+            assert get_restriction_set([self.resource.id]).matches(self.monday)
+
+        self.restriction.days_of_week = "5,6"
+        self.restriction.save()
+        assert not get_restriction_set([self.resource.id]).matches(self.monday)
+
+        self.restriction.resources.remove(self.resource)
+        self.restriction.days_of_week = "0"
+        self.restriction.save()
+        assert not get_restriction_set([self.resource.id]).matches(self.monday)
+        assert get_restriction_set([self.other_resource.id]).matches(self.monday)
+
+        self.restriction.exempt_organization_groups.clear()
+        assert get_restriction_set([self.other_resource.id]).matches(
+            self.monday, organization_group_ids={self.group.id}
+        )
+
+        self.restriction.delete()
+        assert not get_restriction_set([self.other_resource.id])
+
+
+class TestGetRestrictedResourceIds(TestCase):
+    def setUp(self):
+        self.resource = ResourceFactory()
+        self.restriction = ResourceRestrictionFactory(
+            resources=[self.resource],
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            days_of_week="1,6",
+            start_date=date(2025, 5, 1),
+            end_date=date(2025, 5, 31),
+        )
+        self.compiled = CompiledRestriction(self.restriction)
+
+    def test_agrees_with_compiled_restriction(self):
+        windows = [
+            (datetime(2025, 5, 6, 9, 0), 60),  # noqa: DTZ001
+            (datetime(2025, 5, 6, 9, 0), 61),  # noqa: DTZ001
+            (datetime(2025, 5, 6, 11, 59), 30),  # noqa: DTZ001
+            (datetime(2025, 5, 6, 12, 0), 30),  # noqa: DTZ001
+            (datetime(2025, 5, 10, 23, 0), 12 * 60),  # noqa: DTZ001
+            (datetime(2025, 5, 11, 12, 0), 24 * 60),  # noqa: DTZ001
+            (datetime(2025, 5, 31, 23, 0), 16 * 60),  # noqa: DTZ001
+            (datetime(2025, 4, 29, 10, 0), 60),  # noqa: DTZ001
+            (datetime(2025, 4, 30, 11, 0), 3 * 24 * 60),  # noqa: DTZ001
+        ]
+        for start, minutes in windows:
+            start = timezone.make_aware(start)  # noqa: PLW2901
+            end = start + timezone.timedelta(minutes=minutes)
+            restricted = self.resource.id in {
+                row["resource_id"] for row in get_restricted_resource_ids(start, end)
+            }
+            assert restricted == self.compiled.matches_range(start, end), start
+
+    def test_ignores_inactive_and_exempt_restrictions(self):
+        from re_sharing.organizations.tests.factories import OrganizationFactory
+
+        start = timezone.make_aware(datetime(2025, 5, 6, 10, 0))  # noqa: DTZ001
+        end = start + timezone.timedelta(hours=1)
+        group = OrganizationGroupFactory()
+        organization = OrganizationFactory()
+        organization.organization_groups.add(group)
+        self.restriction.exempt_organization_groups.add(group)
+
+        assert get_restricted_resource_ids(start, end).exists()
+        assert not get_restricted_resource_ids(start, end, [organization.id]).exists()
+
+        self.restriction.is_active = False
+        self.restriction.save()
+        assert not get_restricted_resource_ids(start, end).exists()
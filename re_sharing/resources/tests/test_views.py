@@ -28,6 +28,7 @@ from re_sharing.resources.views import list_resources_view
 from re_sharing.resources.views import planner_view
 from re_sharing.resources.views import show_resource_view
 from re_sharing.users.tests.factories import UserFactory
+from re_sharing.utils.models import BookingStatus
 
 
 def make_test_image(name="test.jpg"):
@@ -93,6 +94,27 @@ class ResourceListViewTest(TestCase):
         # Check status code of the response
         assert response.status_code == HTTPStatus.OK
 
+    def test_list_resources_view_next_free_slots(self):
+        resource = ResourceFactory(
+            name="Free room", type=Resource.ResourceTypeChoices.ROOM, is_private=False
+        )
+        start_date = (timezone.localdate() + timedelta(days=3)).isoformat()
+        request = self.factory.get(
+            reverse("resources:list-resources"),
+            {"mode": "next_free", "start_date": start_date, "duration": "90"},
+            HTTP_HX_REQUEST="true",
+        )
+        request.user = self.user
+        response = list_resources_view(request)
+
+        content = response.content.decode()
+        assert response.status_code == HTTPStatus.OK
+        assert "Free room" in content
+        assert (
+            f"?resource={resource.slug}&startdate={start_date}"
+            "&starttime=07:00&endtime=08:30"
+        ) in content
+
 
 class PlannerViewTest(TestCase):
     def setUp(self):
@@ -348,6 +370,102 @@ class ResourceIcalFeedTest(TestCase):
         assert self.resource.name in content
         assert "Booking schedule for" in content
 
+    def test_ical_feed_includes_days_window(self):
+        response = self.client.get(
+            reverse(
+                "resources:daily-calendar", kwargs={"resource_slug": self.resource.slug}
+            ),
+            {"days": 8},
+        )
+        content = response.content.decode()
+        assert self.today_booking.organization.name in content
+        assert self.future_booking.organization.name in content
+        assert self.past_booking.organization.name not in content
+
+    def test_ical_feed_not_modified(self):
+        url = reverse(
+            "resources:daily-calendar", kwargs={"resource_slug": self.resource.slug}
+        )
+        response = self.client.get(url)
+
+        # the resource and the savepoints of the request transaction
+        with self.assertNumQueries(3):
+            response = self.client.get(url, headers={"If-None-Match": response["ETag"]})
+
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    def test_ical_feed_changes_with_bookings(self):
+        url = reverse(
+            "resources:daily-calendar", kwargs={"resource_slug": self.resource.slug}
+        )
+        etag = self.client.get(url)["ETag"]
+
+        self.today_booking.status = BookingStatus.CANCELLED
+        self.today_booking.save()
+        response = self.client.get(url, headers={"If-None-Match": etag})
+
+        assert response.status_code == HTTPStatus.OK
+        assert response["ETag"] != etag
+        assert self.today_booking.organization.name not in response.content.decode()
+
+    def test_location_ical_feed(self):
+        other_resource = ResourceFactory()
+        other_booking = BookingFactory(
+            resource=other_resource, start_date=timezone.now().date()
+        )
+
+        response = self.client.get(
+            reverse(
+                "resources:location-calendar",
+                kwargs={"location_slug": self.resource.location.slug},
+            )
+        )
+
+        content = response.content.decode()
+        assert self.today_booking.organization.name in content
+        assert other_booking.organization.name not in content
+
+    def test_organization_ical_feed(self):
+        organization = self.future_booking.organization
+
+        response = self.client.get(
+            reverse(
+                "resources:organization-calendar",
+                kwargs={"organization_uuid": organization.uuid},
+            ),
+            {"days": 8},
+        )
+
+        content = response.content.decode()
+        assert organization.name in content
+        assert self.resource.name in content
+
+    def test_organization_ical_feed_is_not_found_by_slug(self):
+        organization = self.future_booking.organization
+
+        response = self.client.get(
+            f"/resources/organizations/{organization.slug}/calendar.ics"
+        )
+
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_organization_ical_feed_ignores_bookings_of_others(self):
+        organization = self.future_booking.organization
+        url = reverse(
+            "resources:organization-calendar",
+            kwargs={"organization_uuid": organization.uuid},
+        )
+        etag = self.client.get(url)["ETag"]
+
+        BookingFactory(
+            resource=ResourceFactory(),
+            start_date=timezone.now().date(),
+            status=BookingStatus.CONFIRMED,
+        )
+
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
 
 # ---------------------------------------------------------------------------
 # Manager resource views
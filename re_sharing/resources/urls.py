@@ -1,5 +1,7 @@
 from django.urls import path
 
+from .views import LocationIcalFeed
+from .views import OrganizationIcalFeed
 from .views import ResourceIcalFeed
 from .views import get_compensations
 from .views import list_resources_view
@@ -66,6 +68,16 @@ urlpatterns = [
         manager_delete_resource_image_view,
         name="manager-delete-resource-image",
     ),
+    path(
+        "locations/<slug:location_slug>/calendar.ics",
+        LocationIcalFeed(),
+        name="location-calendar",
+    ),
+    path(
+        "organizations/<uuid:organization_uuid>/calendar.ics",
+        OrganizationIcalFeed(),
+        name="organization-calendar",
+    ),
     path(
         "<slug:resource_slug>/daily-calendar.ics",
         ResourceIcalFeed(),
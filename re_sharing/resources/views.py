@@ -1,3 +1,4 @@
+import hashlib
 from datetime import date
 from datetime import datetime
 from datetime import time
@@ -6,6 +7,7 @@ from datetime import timedelta
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.sites.models import Site
+from django.core.cache import cache
 from django.db.models import Q
 from django.http import HttpRequest
 from django.http import HttpResponse
@@ -13,6 +15,9 @@ from django.shortcuts import get_object_or_404
 from django.shortcuts import redirect
 from django.shortcuts import render
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.http import quote_etag
 from django.utils.translation import gettext_lazy as _
 from django.views.decorators.http import require_http_methods
 from django_ical.views import ICalFeed
@@ -27,14 +32,32 @@ from re_sharing.resources.models import Compensation
 from re_sharing.resources.models import Location
 from re_sharing.resources.models import Resource
 from re_sharing.resources.models import ResourceImage
-from re_sharing.resources.models import ResourceRestriction
 from re_sharing.resources.services import filter_resources
+from re_sharing.resources.services import find_free_slots
+from re_sharing.resources.services import get_bookings_version
 from re_sharing.resources.services import get_user_accessible_locations
 from re_sharing.resources.services import planner
 from re_sharing.resources.services import show_resource
+from re_sharing.resources.services_restrictions import get_restriction_set
+from re_sharing.utils.cache import CacheNamespace
 from re_sharing.utils.models import BookingStatus
 
 
+def _parse_search_start(start_date, start_time):
+    """Return the aware start of a free slot search, or None to start now."""
+    if not start_date:
+        return None
+    try:
+        return timezone.make_aware(
+            datetime.combine(
+                date.fromisoformat(start_date),
+                time.fromisoformat(start_time) if start_time else time.min,
+            )
+        )
+    except ValueError:
+        return None
+
+
 @require_http_methods(["GET"])
 def list_resources_view(request):
     persons_count = request.GET.get("persons_count")
@@ -43,12 +66,25 @@ def list_resources_view(request):
     duration = request.GET.get("duration", "60")  # Default to 60 minutes (1 hour)
     location_slug = request.GET.get("location")
     resource_type = request.GET.get("type", "room")  # Default to room
+    # In "next_free" mode the earliest free slots from the given date are shown
+    next_free_mode = request.GET.get("mode") == "next_free"
 
     # Combine date and time into datetime string if both are provided
     start_datetime = None
     if start_date and start_time:
         start_datetime = f"{start_date}T{start_time}"
 
+    free_slots = None
+    if next_free_mode:
+        free_slots = find_free_slots(
+            request.user,
+            duration,
+            persons_count,
+            location_slug,
+            resource_type,
+            start=_parse_search_start(start_date, start_time),
+        )
+
     resources = filter_resources(
         request.user,
         persons_count,
@@ -100,6 +136,8 @@ def list_resources_view(request):
         "selected_date": start_date,
         "selected_time": start_time,
         "selected_end_time": selected_end_time,
+        "next_free_mode": next_free_mode,
+        "free_slots": free_slots,
     }
     if request.headers.get("HX-Request"):
         return render(request, "resources/list_resources.html#resource-list", context)
@@ -223,21 +261,13 @@ def get_compensations(request, selected_compensation=None):
     # Check if there are any active restrictions that apply to this resource,
     # organization, and datetime
     booking_datetime = datetime.combine(start_date, start_time)
-
-    # Get all active restrictions that apply to this resource
-    restrictions = ResourceRestriction.objects.filter(
-        is_active=True, resources=resource
+    restriction = get_restriction_set([resource.id]).matches(
+        booking_datetime, organization_group_ids={group.id for group in org_groups}
     )
-
-    # Check if any of the restrictions apply to this organization and datetime
     restriction_message = None
-    for restriction in restrictions:
-        if restriction.applies_to_organization(
-            organization
-        ) and restriction.applies_to_datetime(booking_datetime):
-            bookable = False
-            restriction_message = restriction.message
-            break
+    if restriction:
+        bookable = False
+        restriction_message = restriction.message
 
     compensations = (
         Compensation.objects.filter(is_active=True)
@@ -263,13 +293,89 @@ def get_compensations(request, selected_compensation=None):
     )
 
 
-class ResourceIcalFeed(ICalFeed):
-    """ICS calendar feed for a specific resource showing daily bookings."""
+ICAL_FEED_MAX_DAYS = 92
+# The keys contain the ETag of the feed, which covers all its inputs
+ICAL_FEED_CACHE = CacheNamespace("ical_feed", timeout=60 * 60)
+
+
+class BookingsIcalFeed(ICalFeed):
+    """
+    ICS calendar feed of the confirmed bookings of a resource, starting today.
+
+    Subclasses feed the bookings of other objects by setting the model, the field
+    and URL parameter it is looked up by, the lookup from a booking to the object
+    and the lookup from a resource to it (None to use the resources of the feed's
+    bookings).
+
+    The number of days is taken from the "days" parameter (default: today only).
+    The serialized calendar is cached, and ETag and Last-Modified are derived from
+    the booking versions of the feed's resources, so polling calendar clients get a
+    304 until a booking of the feed changes or the day changes.
+    """
 
     timezone = "UTC"
+    model = Resource
+    lookup_field = "slug"
+    lookup_url_kwarg = "resource_slug"
+    booking_lookup = "resource"
+    resource_lookup = "pk"
+
+    def get_object(self, request, **kwargs):
+        obj = get_object_or_404(
+            self.model, **{self.lookup_field: kwargs[self.lookup_url_kwarg]}
+        )
+        try:
+            days = int(request.GET.get("days", 1))
+        except ValueError:
+            days = 1
+        obj.feed_start_date = timezone.localdate()
+        obj.feed_days = min(max(days, 1), ICAL_FEED_MAX_DAYS)
+        return obj
+
+    def get_feed_bookings(self, obj):
+        return Booking.objects.filter(**{self.booking_lookup: obj})
+
+    def get_feed_version(self, obj):
+        if self.resource_lookup is None:
+            resources = Resource.objects.filter(
+                id__in=self.get_feed_bookings(obj).values("resource_id")
+            )
+        else:
+            resources = Resource.objects.filter(**{self.resource_lookup: obj})
+        return get_bookings_version(resources)
+
+    def __call__(self, request, *args, **kwargs):
+        obj = self.get_object(request, *args, **kwargs)
+        version, changed_at = self.get_feed_version(obj)
+        etag = quote_etag(
+            hashlib.md5(  # noqa: S324
+                f"{type(self).__name__}:{obj.pk}:{obj.feed_start_date}:"
+                f"{obj.feed_days}:{version}".encode()
+            ).hexdigest()
+        )
+        # The feed also changes when the day changes
+        start_of_day = timezone.make_aware(
+            datetime.combine(obj.feed_start_date, time.min)
+        )
+        last_modified = max(changed_at or start_of_day, start_of_day).timestamp()
 
-    def get_object(self, request, resource_slug):
-        return get_object_or_404(Resource, slug=resource_slug)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified)
+        )
+        if response is None:
+            cache_key = ICAL_FEED_CACHE.key(etag)
+            content = cache.get(cache_key)
+            if content is None:
+                response = HttpResponse()
+                self.get_feed(obj, request).write(response, "utf-8")
+                content = response.content
+                cache.set(cache_key, content, ICAL_FEED_CACHE.timeout)
+            response = HttpResponse(content, content_type=self.feed_type.mime_type)
+            filename = self.file_name(obj)
+            response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
 
     def file_name(self, obj):
         return f"{obj.slug}.ics"
@@ -281,11 +387,16 @@ class ResourceIcalFeed(ICalFeed):
         return f"Booking schedule for {obj.name}"
 
     def items(self, obj):
-        return Booking.objects.filter(
-            resource=obj,
-            start_date=timezone.now().date(),
-            status=BookingStatus.CONFIRMED,
-        ).order_by("start_date", "start_time")
+        return (
+            self.get_feed_bookings(obj)
+            .filter(
+                start_date__gte=obj.feed_start_date,
+                start_date__lt=obj.feed_start_date + timedelta(days=obj.feed_days),
+                status=BookingStatus.CONFIRMED,
+            )
+            .select_related("organization", "resource")
+            .order_by("start_date", "start_time")
+        )
 
     def item_title(self, item):
         if item.organization.public_name:
@@ -299,6 +410,7 @@ class ResourceIcalFeed(ICalFeed):
         return item.timespan.upper
 
     def item_description(self, item):
+        # get_current() is cached by the sites framework after the first call
         domain = Site.objects.get_current().domain
         return f"https://{domain}{item.get_absolute_url()}"
 
@@ -307,6 +419,45 @@ class ResourceIcalFeed(ICalFeed):
         return f"https://{domain}{item.get_absolute_url()}"
 
 
+class ResourceIcalFeed(BookingsIcalFeed):
+    """ICS calendar feed for a specific resource showing daily bookings."""
+
+    def get_feed_version(self, obj):
+        # The counters of the resource are loaded already
+        return str(obj.bookings_version), obj.bookings_changed_at
+
+
+class LocationIcalFeed(BookingsIcalFeed):
+    """ICS calendar feed of the bookings of all resources of a location."""
+
+    model = Location
+    lookup_url_kwarg = "location_slug"
+    booking_lookup = "resource__location"
+    resource_lookup = "location"
+
+    def item_title(self, item):
+        return f"{item.resource.name}: {super().item_title(item)}"
+
+
+class OrganizationIcalFeed(BookingsIcalFeed):
+    """
+    ICS calendar feed of the bookings of an organization.
+
+    The feed is public, so it is looked up by the random UUID of the organization,
+    which only the organization is told, rather than by its slug.
+    """
+
+    model = Organization
+    lookup_field = "uuid"
+    lookup_url_kwarg = "organization_uuid"
+    booking_lookup = "organization"
+    # The bookings of an organization can be on any resource
+    resource_lookup = None
+
+    def item_title(self, item):
+        return item.resource.name
+
+
 # ---------------------------------------------------------------------------
 # Manager resource views
 # ---------------------------------------------------------------------------
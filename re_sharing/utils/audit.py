@@ -0,0 +1,58 @@
+"""
+Batch counterpart of the django-auditlog signal receivers.
+
+QuerySet.bulk_create(), update() and delete() bypass the model signals auditlog
+relies on, so the log entries for bulk operations are written here with a single
+INSERT instead of one per instance.
+"""
+
+from auditlog import get_logentry_model
+from auditlog.cid import get_cid
+from auditlog.context import auditlog_disabled
+from auditlog.diff import model_instance_diff
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import pre_save
+from django.utils.encoding import smart_str
+
+
+def bulk_log_changes(action, instance_pairs):
+    """
+    Write one log entry for every (old, new) pair that has changes.
+
+    Like in auditlog's model_instance_diff(), old is None for created instances and
+    new is None for deleted instances. The actor of an active set_actor() block is
+    attached through auditlog's own pre_save receiver, as for single saves.
+    """
+    if auditlog_disabled.get():
+        return []
+
+    log_entry_model = get_logentry_model()
+    cid = get_cid()
+    log_entries = []
+    for old, new in instance_pairs:
+        changes = model_instance_diff(
+            old, new, use_json_for_changes=settings.AUDITLOG_STORE_JSON_CHANGES
+        )
+        if not changes:
+            continue
+
+        instance = new if new is not None else old
+        log_entry = log_entry_model(
+            content_type=ContentType.objects.get_for_model(instance),
+            object_pk=str(instance.pk),
+            object_id=instance.pk if isinstance(instance.pk, int) else None,
+            object_repr=smart_str(instance),
+            action=action,
+            changes=changes,
+            cid=cid,
+        )
+        pre_save.send(
+            sender=log_entry_model,
+            instance=log_entry,
+            raw=False,
+            using=None,
+            update_fields=None,
+        )
+        log_entries.append(log_entry)
+    return log_entry_model.objects.bulk_create(log_entries)
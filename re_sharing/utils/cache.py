@@ -0,0 +1,88 @@
+"""
+Namespaced, versioned keys in the cache shared by all processes.
+
+Every cached feature uses a CacheNamespace. Its keys contain the version of the
+namespace (and of a scope within it, e.g. a location), so invalidating only
+replaces a version and the outdated entries expire on their own. The versions
+are stored in the cache as well, so an invalidation in one process reaches all the
+others as long as the cache backend is shared.
+
+A new version is the current time rather than the old version plus one: the
+database cache increments with a read and a separate write, so two processes
+invalidating at once could both write the same version, and a page rendered in
+between would be kept under it. Setting a fresh version is a single write.
+
+Namespaces list the topics they depend on; invalidate_caches() is called by the
+model hooks of resources and restrictions. Caches built from bookings use a
+scope or the bookings_version of the resources instead.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+RESOURCES = "resources"
+RESTRICTIONS = "restrictions"
+
+_namespaces = []
+
+
+def _new_version():
+    # Versions are the current time, so a version key that was culled or cleared
+    # never falls back to a version whose entries may still be cached
+    return time.time_ns()
+
+
+class CacheNamespace:
+    """The keys of one cached feature, invalidated together."""
+
+    def __init__(self, name, timeout=DEFAULT_TIMEOUT, invalidated_by=()):
+        self.name = name
+        self.timeout = timeout
+        self.invalidated_by = frozenset(invalidated_by)
+        _namespaces.append(self)
+
+    def __repr__(self):
+        return f"<CacheNamespace {self.name}>"
+
+    def _version_key(self, scope=None):
+        if scope is None:
+            return f"{self.name}:version"
+        return f"{self.name}:version:{scope}"
+
+    def version(self, scope=None):
+        """Return the version of the namespace, or of a scope within it."""
+        return cache.get_or_set(self._version_key(scope), _new_version, None)
+
+    def invalidate(self, scope=None):
+        """Invalidate all keys of the namespace, or only those of a scope."""
+        cache.set(self._version_key(scope), _new_version(), None)
+
+    def key(self, *parts, scope=None):
+        """
+        Return the cache key of the parts in the current version.
+
+        Compute the key once and use it for both reading and writing an entry, so a
+        value computed before an invalidation is not stored under the new version.
+        """
+        version_keys = [self._version_key()]
+        if scope is not None:
+            version_keys.append(self._version_key(scope))
+        versions = cache.get_many(version_keys)
+        missing = {key: _new_version() for key in version_keys if key not in versions}
+        if missing:
+            cache.set_many(missing, None)
+            versions.update(missing)
+        prefix = [self.name, *(str(versions[key]) for key in version_keys)]
+        if scope is not None:
+            prefix.insert(2, str(scope))
+        return ":".join([*prefix, *(str(part) for part in parts)])
+
+
+def invalidate_caches(*topics):
+    """Invalidate the namespaces depending on any of the topics."""
+    topics = set(topics)
+    for namespace in _namespaces:
+        if not namespace.invalidated_by.isdisjoint(topics):
+            namespace.invalidate()
@@ -0,0 +1,62 @@
+from django.db.models import Q
+from django_extensions.db.fields import AutoSlugField
+
+SLUG_ALLOCATED_ATTRIBUTE = "_slug_allocated_in_bulk"
+
+
+class BulkAutoSlugField(AutoSlugField):
+    """
+    AutoSlugField that can allocate unique slugs for many unsaved instances at once.
+
+    bulk_create() calls pre_save() for every row, which makes AutoSlugField probe the
+    database once per instance. Instances that went through allocate_slugs() keep the
+    slug that was allocated for them instead.
+    """
+
+    def get_original_slug(self, model_instance):
+        populate_from = self._populate_from
+        if not isinstance(populate_from, list | tuple):
+            populate_from = (populate_from,)
+        slugify_function = getattr(
+            model_instance, "slugify_function", self.slugify_function
+        )
+        slug = self.separator.join(
+            self.slugify_func(
+                self.get_slug_fields(model_instance, lookup_value),
+                slugify_function=slugify_function,
+            )
+            for lookup_value in populate_from
+        )
+        self.slug_len = self.max_length
+        if self.slug_len:
+            slug = slug[: self.slug_len]
+        return self._slug_strip(slug)
+
+    def allocate_slugs(self, model_instances):
+        """Set a unique slug on every instance, using a single database query."""
+        original_slugs = [
+            self.get_original_slug(model_instance) for model_instance in model_instances
+        ]
+        query = Q()
+        for original_slug in set(original_slugs):
+            query |= Q(**{f"{self.attname}__startswith": original_slug})
+        taken_slugs = set(
+            self.model._default_manager.filter(query).values_list(  # noqa: SLF001
+                self.attname, flat=True
+            )
+        )
+
+        for model_instance, original_slug in zip(
+            model_instances, original_slugs, strict=True
+        ):
+            for slug in self.slug_generator(original_slug, 2):
+                if slug and slug not in taken_slugs:
+                    break
+            taken_slugs.add(slug)
+            setattr(model_instance, self.attname, slug)
+            setattr(model_instance, SLUG_ALLOCATED_ATTRIBUTE, True)
+
+    def create_slug(self, model_instance, add):
+        if getattr(model_instance, SLUG_ALLOCATED_ATTRIBUTE, False):
+            return getattr(model_instance, self.attname)
+        return super().create_slug(model_instance, add)
@@ -0,0 +1,36 @@
+from django.db.models import Q
+
+KEYSET_PAGE_SIZE = 100
+
+
+def get_keyset_page(queryset, after=None, page_size=None):
+    """
+    Return a page of the queryset and the cursor of the following page.
+
+    The queryset must be ordered by a single field followed by the primary key,
+    e.g. order_by("created", "id"). Pages continue after the object whose primary
+    key is the cursor, so neither OFFSET nor COUNT queries are needed and every
+    page is an index range scan. The cursor is None on the last page.
+    """
+    page_size = page_size or KEYSET_PAGE_SIZE
+    ordering_field = (queryset.query.order_by or ["pk"])[0]
+    if after:
+        try:
+            cursor_value = (
+                queryset.model._default_manager.filter(pk=after)  # noqa: SLF001
+                .values_list(ordering_field, flat=True)
+                .first()
+            )
+        except ValueError:
+            cursor_value = None
+        if cursor_value is None:
+            return [], None
+        queryset = queryset.filter(
+            Q(**{f"{ordering_field}__gt": cursor_value})
+            | Q(**{ordering_field: cursor_value, "pk__gt": after})
+        )
+
+    objects = list(queryset[: page_size + 1])
+    if len(objects) > page_size:
+        return objects[:page_size], objects[page_size - 1].pk
+    return objects, None
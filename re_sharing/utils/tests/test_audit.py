@@ -0,0 +1,43 @@
+import copy
+
+from auditlog.context import set_actor
+from auditlog.models import LogEntry
+from django.test import TestCase
+
+from re_sharing.bookings.tests.factories import BookingFactory
+from re_sharing.users.tests.factories import UserFactory
+from re_sharing.utils.audit import bulk_log_changes
+from re_sharing.utils.models import BookingStatus
+
+
+class TestBulkLogChanges(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.bookings = [
+            BookingFactory(status=BookingStatus.PENDING),
+            BookingFactory(status=BookingStatus.PENDING),
+        ]
+        LogEntry.objects.all().delete()
+
+    def test_logs_changes_with_actor_in_one_query(self):
+        pairs = []
+        for booking in self.bookings:
+            old = copy.copy(booking)
+            booking.status = BookingStatus.CONFIRMED
+            pairs.append((old, booking))
+
+        with set_actor(self.user), self.assertNumQueries(1):
+            log_entries = bulk_log_changes(LogEntry.Action.UPDATE, pairs)
+
+        assert len(log_entries) == len(self.bookings)
+        for log_entry in LogEntry.objects.all():
+            assert log_entry.actor == self.user
+            assert log_entry.changes["status"] == ["1", "2"]
+
+    def test_skips_instances_without_changes(self):
+        pairs = [(booking, booking) for booking in self.bookings]
+
+        log_entries = bulk_log_changes(LogEntry.Action.UPDATE, pairs)
+
+        assert log_entries == []
+        assert not LogEntry.objects.exists()
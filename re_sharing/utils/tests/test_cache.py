@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from re_sharing.resources.tests.factories import ResourceFactory
+from re_sharing.utils.cache import RESOURCES
+from re_sharing.utils.cache import RESTRICTIONS
+from re_sharing.utils.cache import CacheNamespace
+from re_sharing.utils.cache import invalidate_caches
+
+TEST_CACHE = CacheNamespace("test", invalidated_by=[RESOURCES])
+
+
+class TestCacheNamespace(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.namespace = TEST_CACHE
+
+    def test_invalidate_changes_keys(self):
+        key = self.namespace.key("a", 1)
+        assert key == self.namespace.key("a", 1)
+        assert key.startswith("test:")
+        assert key.endswith(":a:1")
+
+        self.namespace.invalidate()
+
+        assert self.namespace.key("a", 1) != key
+
+    def test_invalidate_scope(self):
+        key = self.namespace.key("page", scope="north")
+        other_key = self.namespace.key("page", scope="south")
+        version = self.namespace.version(scope="north")
+
+        self.namespace.invalidate(scope="north")
+
+        assert self.namespace.version(scope="north") > version
+        assert self.namespace.key("page", scope="north") != key
+        assert self.namespace.key("page", scope="south") == other_key
+
+        # Invalidating the namespace covers all scopes
+        self.namespace.invalidate()
+        assert self.namespace.key("page", scope="south") != other_key
+
+    def test_cleared_versions_do_not_repeat(self):
+        key = self.namespace.key("a")
+        self.namespace.invalidate()
+        cache.delete("test:version")
+
+        assert self.namespace.key("a") != key
+        assert self.namespace.version() > int(key.split(":")[1]) + 1
+
+    def test_invalidate_caches_by_topic(self):
+        key = self.namespace.key("a")
+
+        invalidate_caches(RESTRICTIONS)
+        assert self.namespace.key("a") == key
+
+        invalidate_caches(RESOURCES)
+        assert self.namespace.key("a") != key
+
+    def test_resource_changes_invalidate(self):
+        key = self.namespace.key("a")
+
+        ResourceFactory()
+
+        assert self.namespace.key("a") != key
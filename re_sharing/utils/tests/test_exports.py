@@ -0,0 +1,66 @@
+import io
+import zipfile
+from decimal import Decimal
+from unittest.mock import patch
+from xml.etree import ElementTree as ET
+
+from django.test import SimpleTestCase
+
+from re_sharing.utils.exports import export_response
+from re_sharing.utils.exports import stream_csv
+from re_sharing.utils.exports import stream_xlsx
+
+SPREADSHEET_NS = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def read_xlsx_rows(content):
+    with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+        assert workbook.testzip() is None
+        sheet = ET.fromstring(workbook.read("xl/worksheets/sheet1.xml"))  # noqa: S314
+    return [
+        [
+            "".join(cell.itertext()) or None
+            for cell in row.iterfind("s:c", SPREADSHEET_NS)
+        ]
+        for row in sheet.iterfind("s:sheetData/s:row", SPREADSHEET_NS)
+    ]
+
+
+class TestStreamCsv(SimpleTestCase):
+    def test_yields_one_line_per_row(self):
+        lines = list(stream_csv(["Name", "Amount"], iter([["a, b", Decimal("1.50")]])))
+
+        assert lines == ["Name,Amount\r\n", '"a, b",1.50\r\n']
+
+
+class TestStreamXlsx(SimpleTestCase):
+    def test_writes_readable_workbook(self):
+        rows = [["Room <1>", 2, Decimal("10.50"), None], ["bad\x00text", 0, "", True]]
+
+        content = b"".join(stream_xlsx(["Resource", "Count", "Amount", "x"], rows))
+
+        assert read_xlsx_rows(content) == [
+            ["Resource", "Count", "Amount", "x"],
+            ["Room <1>", "2", "10.50", None],
+            ["badtext", "0", None, "1"],
+        ]
+
+    @patch("re_sharing.utils.exports.XLSX_FLUSH_SIZE", 1024)
+    def test_streams_large_sheets_in_chunks(self):
+        rows = ([f"row {i}", i] for i in range(20000))
+
+        chunks = list(stream_xlsx(["Name", "Number"], rows))
+
+        assert len(chunks) > 3  # noqa: PLR2004
+        assert len(read_xlsx_rows(b"".join(chunks))) == 20001  # noqa: PLR2004
+
+
+class TestExportResponse(SimpleTestCase):
+    def test_sets_content_type_and_filename(self):
+        response = export_response("xlsx", "report", ["a"], iter([[1]]))
+
+        assert response.streaming
+        assert response["Content-Type"].startswith(
+            "application/vnd.openxmlformats-officedocument"
+        )
+        assert response["Content-Disposition"] == 'attachment; filename="report.xlsx"'
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from re_sharing.bookings.models import Booking
+from re_sharing.bookings.tests.factories import BookingFactory
+from re_sharing.utils.pagination import get_keyset_page
+
+
+class TestGetKeysetPage(TestCase):
+    def setUp(self):
+        start = timezone.now() + timedelta(days=1)
+        # pairs of bookings share the same timespan, so the id breaks the tie
+        self.bookings = [
+            BookingFactory(
+                timespan=(
+                    start + timedelta(days=day // 2),
+                    start + timedelta(days=day // 2, hours=1),
+                )
+            )
+            for day in range(7)
+        ]
+
+    def test_pages_cover_all_objects_in_order(self):
+        queryset = Booking.objects.order_by("timespan", "id")
+
+        pages = []
+        after = None
+        while True:
+            page, after = get_keyset_page(queryset, after, page_size=3)
+            pages.append(page)
+            if after is None:
+                break
+
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert [booking for page in pages for booking in page] == list(queryset)
+
+    def test_each_page_uses_constant_queries(self):
+        queryset = Booking.objects.order_by("created", "id")
+        _first_page, after = get_keyset_page(queryset, page_size=2)
+
+        with self.assertNumQueries(2):
+            second_page, _after = get_keyset_page(queryset, after, page_size=2)
+
+        assert second_page == list(queryset)[2:4]
+
+    def test_unknown_cursor_returns_empty_page(self):
+        queryset = Booking.objects.order_by("created", "id")
+
+        assert get_keyset_page(queryset, "0") == ([], None)
+        assert get_keyset_page(queryset, "invalid") == ([], None)